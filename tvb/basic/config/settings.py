@@ -73,6 +73,20 @@ class LibraryProfile():
         return tmp_path
     
     
+    @ClassProperty
+    @staticmethod
+    def TVB_CACHE_FOLDER():
+        """
+        Represents a folder where results which are slow to compute, such as
+        the geodesic distances over a surface, are kept under a hash of their
+        inputs. Content of this folder can be deleted at any time.
+        """
+        tmp_path = os.path.join(LibraryProfile.TVB_STORAGE, "CACHE")
+        if not os.path.exists(tmp_path):
+            os.makedirs(tmp_path)
+        return tmp_path
+    
+    
     @ClassProperty
     @staticmethod
     def TVB_LOG_FOLDER():
@@ -165,7 +165,10 @@ class Enumerate(Sequence):
         else:
             #Bypass default since that only accepts arrays for multiple selects
             setattr(inst, '_' + self.trait.name, self.to_json(value))
-            self.trait.value = value
+            #The trait is shared by all instances, a bound one holding the 
+            #default of those created after.
+            if not self.trait.bound:
+                self.trait.value = value
 
 
 class Dict(Sequence):
@@ -35,8 +35,10 @@ class SimulationState(MappedType):
     Simulation State, prepared for H5 file storage.
     """  
     
-    # History Array
+    # History Array, of the coupling variables only
     history = arrays.FloatArray(required=False)
+    # Full state of the simulation at current_step
+    current_state = arrays.FloatArray(required=False)
     # Simulator step number
     current_step = basic.Integer()
     # Array with _stock array for every monitor configured in current simulation.
@@ -71,6 +73,7 @@ class SimulationState(MappedType):
         Prepare a state for storage from a Simulator object.
         """
         self.history = simulator_algorithm.history
+        self.current_state = simulator_algorithm.current_state
         self.current_step = simulator_algorithm.current_step
         
         i = 1
@@ -89,6 +92,7 @@ class SimulationState(MappedType):
         Populate a Simulator object from current stored-state.
         """
         simulator_algorithm.history = self.history 
+        simulator_algorithm.current_state = self.current_state
         simulator_algorithm.current_step = self.current_step
         
         i = 1
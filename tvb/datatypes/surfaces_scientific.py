@@ -30,10 +30,17 @@ Scientific methods for the Surfaces datatype.
 
 """
 
+import os
+import shutil
+import hashlib
+import tempfile
+import multiprocessing
 import numpy
 import scipy.sparse as sparse
+from scipy.spatial import cKDTree
 import tvb.datatypes.surfaces_data as surfaces_data
 import tvb.basic.traits.util as util
+from tvb.basic.config.settings import TVBSettings as cfg
 from tvb.basic.logger.builder import get_logger
 LOG = get_logger(__name__)
 
@@ -47,6 +54,338 @@ except ImportError:
 
 
 
+#-------------------------------- matrix cache --------------------------------#
+#Sparse matrices which are slow to compute, such as geodesic distances, are
+#kept in cfg.TVB_CACHE_FOLDER, in a folder named by a hash of their inputs 
+#holding the .npy files of their components, which are memory-mapped when 
+#loaded. Dense arrays, such as lead fields, are kept as a single .npy file.
+#Setting cfg.TVB_CACHE_FOLDER to None disables the cache.
+
+def cache_key(*inputs):
+    """
+    A hash of the inputs, arrays by their dtype, shape and data and anything 
+    else by its repr.
+    """
+    key = hashlib.sha1()
+    for value in inputs:
+        if isinstance(value, numpy.ndarray):
+            key.update(str(value.dtype) + str(value.shape))
+            key.update(numpy.ascontiguousarray(value).data)
+        else:
+            key.update(repr(value))
+    return key.hexdigest()
+
+
+def load_cached_matrix(name):
+    """
+    Return the sparse matrix cached under name, or None if there isn't one.
+    """
+    cache_folder = getattr(cfg, "TVB_CACHE_FOLDER", None)
+    if cache_folder is None:
+        return None
+    path = os.path.join(cache_folder, name)
+    if not os.path.isdir(path):
+        return None
+
+    def load(component, mmap_mode="c"):
+        return numpy.load(os.path.join(path, component + ".npy"), mmap_mode=mmap_mode)
+
+    try:
+        matrix_type = getattr(sparse, str(load("format", None)) + "_matrix")
+        matrix = matrix_type((load("data"), load("indices"), load("indptr")),
+                             shape=tuple(load("shape", None)))
+    except (IOError, ValueError, AttributeError), exc:
+        LOG.warning("Ignoring the unreadable cache entry %s: %s" % (path, exc))
+        return None
+    LOG.info("Loaded %s from the cache" % name)
+    return matrix
+
+
+def cache_matrix(name, matrix):
+    """
+    Cache the CSR or CSC sparse matrix under name.
+    """
+    cache_folder = getattr(cfg, "TVB_CACHE_FOLDER", None)
+    if cache_folder is None:
+        return
+    #Written to a temporary folder, then renamed, so a half written entry is 
+    #never read, including by another process computing the same matrix.
+    tmp_path = tempfile.mkdtemp(prefix=name + ".", dir=cache_folder)
+    try:
+        numpy.save(os.path.join(tmp_path, "format.npy"), numpy.array(matrix.format))
+        numpy.save(os.path.join(tmp_path, "shape.npy"), numpy.array(matrix.shape))
+        for component in ("data", "indices", "indptr"):
+            numpy.save(os.path.join(tmp_path, component + ".npy"), getattr(matrix, component))
+        os.rename(tmp_path, os.path.join(cache_folder, name))
+    except (IOError, OSError), exc:
+        LOG.warning("Failed to cache %s: %s" % (name, exc))
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def load_cached_array(name):
+    """
+    Return the array cached under name, memory-mapped read-only, or None if
+    there isn't one.
+    """
+    cache_folder = getattr(cfg, "TVB_CACHE_FOLDER", None)
+    if cache_folder is None:
+        return None
+    path = os.path.join(cache_folder, name + ".npy")
+    if not os.path.isfile(path):
+        return None
+    try:
+        array = numpy.load(path, mmap_mode="r")
+    except (IOError, ValueError), exc:
+        LOG.warning("Ignoring the unreadable cache entry %s: %s" % (path, exc))
+        return None
+    LOG.info("Loaded %s from the cache" % name)
+    return array
+
+
+def cache_array(name, array):
+    """
+    Cache the dense array under name.
+    """
+    cache_folder = getattr(cfg, "TVB_CACHE_FOLDER", None)
+    if cache_folder is None:
+        return
+    tmp_file, tmp_path = tempfile.mkstemp(prefix=name + ".", dir=cache_folder)
+    try:
+        with os.fdopen(tmp_file, "wb") as array_file:
+            numpy.save(array_file, array)
+        os.rename(tmp_path, os.path.join(cache_folder, name + ".npy"))
+    except (IOError, OSError), exc:
+        LOG.warning("Failed to cache %s: %s" % (name, exc))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def geodesic_distance_matrix(vertices, triangles, max_dist, processes=None):
+    """
+    A sparse matrix of the geodesic distance from each vertex to all vertices
+    within max_dist of them on the surface given by vertices and triangles,
+    read from the cache if it's been computed before, otherwise computed by
+    blocked_geodesic_distance_matrix() with the given number of processes.
+    """
+    vertices = vertices.astype(numpy.float64)
+    triangles = triangles.astype(numpy.int32)
+    name = "geodesic-distance-" + cache_key(vertices, triangles, float(max_dist), "blocked")
+    dist = load_cached_matrix(name)
+    if dist is None:
+        dist = blocked_geodesic_distance_matrix(vertices, triangles, max_dist, processes)
+        cache_matrix(name, dist)
+    return dist
+#------------------------------------------------------------------------------#
+
+
+
+#------------------------ blocked geodesic distances --------------------------#
+class GeodesicDistanceWorker(object):
+    """
+    Computes the geodesic distances from blocks of source vertices to all the
+    vertices within max_dist of them. For each source, gdist.compute_gdist() is
+    run over only the triangles having a vertex within max_dist plus the 
+    longest edge of it, which hold every path shorter than max_dist, so the 
+    work per source is bounded by the density of the mesh rather than growing
+    with its size, as it does for gdist.local_gdist_matrix().
+    """
+
+    def __init__(self, vertices, triangles, max_dist):
+        self.vertices = vertices.astype(numpy.float64)
+        self.triangles = triangles.astype(numpy.int32)
+        self.max_dist = max_dist
+        number_of_vertices = self.vertices.shape[0]
+        number_of_triangles = self.triangles.shape[0]
+        self.tree = cKDTree(self.vertices)
+        edges = numpy.concatenate([self.vertices[self.triangles[:, k]] - 
+                                   self.vertices[self.triangles[:, k - 1]] for k in range(3)])
+        self.radius = max_dist + numpy.sqrt(numpy.sum(edges**2, axis=1)).max()
+        #The triangles of each vertex, as the rows of a CSR matrix.
+        vertex_triangles = sparse.csr_matrix((numpy.ones(self.triangles.size),
+                                              (self.triangles.ravel(), 
+                                               numpy.repeat(numpy.arange(number_of_triangles), 3))),
+                                             shape=(number_of_vertices, number_of_triangles))
+        self.triangles_indptr = vertex_triangles.indptr
+        self.triangles_indices = vertex_triangles.indices
+
+
+    def near_triangles(self, vertices):
+        """The triangles of the given vertices."""
+        starts = self.triangles_indptr[vertices]
+        lengths = self.triangles_indptr[vertices + 1] - starts
+        offsets = numpy.repeat(starts - numpy.cumsum(lengths) + lengths, lengths)
+        return numpy.unique(self.triangles_indices[offsets + numpy.arange(lengths.sum())])
+
+
+    def __call__(self, block):
+        """
+        The distances from the sources start to stop of block, as the number
+        of vertices within max_dist of each source, and their indices and 
+        distances.
+        """
+        start, stop = block
+        counts, indices, distances = [], [], []
+        for source in range(start, stop):
+            near = numpy.array(self.tree.query_ball_point(self.vertices[source], self.radius))
+            triangles = self.triangles[self.near_triangles(near)]
+            vertices = numpy.unique(triangles)
+            dist = gdist.compute_gdist(self.vertices[vertices],
+                                       numpy.searchsorted(vertices, triangles).astype(numpy.int32),
+                                       source_indices=numpy.searchsorted(vertices, [source]).astype(numpy.int32),
+                                       max_distance=self.max_dist)
+            #Like local_gdist_matrix, no entries for the distance of a vertex to itself.
+            within = (dist <= self.max_dist) & (dist > 0.0)
+            counts.append(within.sum())
+            indices.append(vertices[within].astype(numpy.int32))
+            distances.append(dist[within])
+        return (numpy.array(counts, dtype=numpy.int32), numpy.concatenate(indices), 
+                numpy.concatenate(distances))
+
+
+#The GeodesicDistanceWorker of each process of the pool.
+_geodesic_worker = None
+
+def _init_geodesic_worker(vertices, triangles, max_dist):
+    global _geodesic_worker
+    _geodesic_worker = GeodesicDistanceWorker(vertices, triangles, max_dist)
+
+def _geodesic_distance_block(block):
+    return _geodesic_worker(block)
+
+
+def blocked_geodesic_distance_matrix(vertices, triangles, max_dist, processes=None,
+                                     block_memory=2**26):
+    """
+    The sparse matrix of geodesic distances of gdist.local_gdist_matrix(), 
+    computed for blocks of source vertices by a pool of processes, logging 
+    its progress.
+
+    ``processes``: the size of the pool, by default the number of CPUs, with 
+        1 computing the blocks in this process.
+    ``block_memory``: a bound on the bytes of the distances of a block, as 
+        estimated from the number of vertices within max_dist of a sample of
+        vertices. Beyond the surface, each process holds a block at a time, 
+        while the results accumulate to twice the size of the final matrix
+        as they're assembled. 
+
+    Rather than the distances a little beyond max_dist which 
+    local_gdist_matrix() can keep, only those up to max_dist are kept, which
+    makes the matrix symmetric.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    worker = GeodesicDistanceWorker(vertices, triangles, max_dist)
+    number_of_vertices = worker.vertices.shape[0]
+
+    sample = numpy.linspace(0, number_of_vertices - 1, min(number_of_vertices, 100)).astype(int)
+    per_source = numpy.mean([len(near) for near in worker.tree.query_ball_point(worker.vertices[sample], max_dist)])
+    block_size = min(block_memory // int(per_source * 12), #int32 index, float64 distance
+                     -(-number_of_vertices // (8 * processes))) #several blocks per process
+    block_size = max(block_size, 1)
+    blocks = [(start, min(start + block_size, number_of_vertices))
+              for start in range(0, number_of_vertices, block_size)]
+    LOG.info("Computing geodesic distances within %s mm of %d vertices, in %d blocks by %d processes"
+             % (max_dist, number_of_vertices, len(blocks), processes))
+
+    pool = None
+    if processes == 1:
+        results = (worker(block) for block in blocks)
+    else:
+        pool = multiprocessing.Pool(processes, _init_geodesic_worker, (vertices, triangles, max_dist))
+        results = pool.imap(_geodesic_distance_block, blocks)
+    counts, indices, distances = [], [], []
+    try:
+        for k, (block_counts, block_indices, block_distances) in enumerate(results):
+            counts.append(block_counts)
+            indices.append(block_indices)
+            distances.append(block_distances)
+            if (10 * (k + 1)) // len(blocks) > (10 * k) // len(blocks):
+                LOG.info("Computed geodesic distances of %d of %d vertices" % (blocks[k][1], number_of_vertices))
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    indptr = numpy.zeros((number_of_vertices + 1,), dtype=numpy.int64)
+    numpy.cumsum(numpy.concatenate(counts), out=indptr[1:])
+    return sparse.csc_matrix((numpy.concatenate(distances), numpy.concatenate(indices), indptr),
+                             shape=(number_of_vertices, number_of_vertices))
+#------------------------------------------------------------------------------#
+
+
+
+
+class RegionMappingOperator(object):
+    """
+    Maps between nodes, such as the vertices of a cortical surface, and the
+    regions they're grouped into by an index vector, such as a region mapping,
+    giving each node's region. As every node belongs to exactly one region, 
+    rather than a dense (nodes x regions) matrix this keeps just the index 
+    vector and the number of nodes in each region, summing over the nodes 
+    of each region with ``numpy.bincount`` and expanding from regions to nodes
+    with ``numpy.take``.
+
+    """
+
+    def __init__(self, mapping, number_of_regions=None):
+        """
+        ``mapping``: a vector with the index of each node's region.
+        ``number_of_regions``: defaults to one more than the largest index. 
+
+        """
+        self.mapping = numpy.asarray(mapping, dtype=numpy.intp).reshape((-1,))
+        self.number_of_nodes = self.mapping.shape[0]
+        if number_of_regions is None:
+            number_of_regions = self.mapping.max() + 1
+        self.number_of_regions = int(number_of_regions)
+        self.nodes_per_region = numpy.bincount(self.mapping, minlength=self.number_of_regions)
+
+
+    def sum(self, data, axis=0):
+        """
+        Sum data, with nodes along axis, over the nodes of each region, the
+        result having regions in place of the nodes. 
+        """
+        data = numpy.rollaxis(numpy.asarray(data), axis, data.ndim)
+        nodes = data.reshape((-1, self.number_of_nodes))
+        result = numpy.empty((nodes.shape[0], self.number_of_regions))
+        for k in range(nodes.shape[0]):
+            result[k] = numpy.bincount(self.mapping, weights=nodes[k], 
+                                       minlength=self.number_of_regions)
+        result = result.reshape(data.shape[:-1] + (self.number_of_regions,))
+        return numpy.rollaxis(result, result.ndim - 1, axis)
+
+
+    def average(self, data, axis=0):
+        """
+        Average data, with nodes along axis, over the nodes of each region, 
+        regions without any nodes averaging to zero.
+        """
+        shape = [1] * data.ndim
+        shape[axis] = self.number_of_regions
+        nodes_per_region = numpy.maximum(self.nodes_per_region, 1).reshape(shape)
+        return self.sum(data, axis) / nodes_per_region
+
+
+    def expand(self, data, axis=0):
+        """
+        Give each node the value, along axis, of its region. 
+        """
+        return numpy.take(data, self.mapping, axis=axis)
+
+
+    def matrix(self, average=False):
+        """
+        The equivalent (regions x nodes) sparse matrix, summing over the nodes
+        of each region, or, if average, averaging over them. Its transpose
+        expands from regions to nodes.
+        """
+        values = numpy.ones((self.number_of_nodes,))
+        if average:
+            values /= self.nodes_per_region[self.mapping]
+        return sparse.csr_matrix((values, (self.mapping, numpy.arange(self.number_of_nodes))),
+                                 shape=(self.number_of_regions, self.number_of_nodes))
+
+
 
 class SurfaceScientific(surfaces_data.SurfaceData):
     """ This class exists to add scientific methods to Surface """
@@ -54,9 +393,6 @@ class SurfaceScientific(surfaces_data.SurfaceData):
     __tablename__ = None
     _vertex_neighbours = None
     _vertex_triangles = None
-    _vertex_mapping = None
-    _region_sum = None
-    _region_average = None
     _triangle_centres = None
     _triangle_angles = None
     _triangle_areas = None
@@ -155,12 +491,14 @@ class SurfaceScientific(surfaces_data.SurfaceData):
         return dist
 
 
-    def compute_geodesic_distance_matrix(self, max_dist):
+    def compute_geodesic_distance_matrix(self, max_dist, processes=None):
         """
         Calculate a sparse matrix of the geodesic distance from each vertex to 
         all vertices within max_dist of them on the surface, 
 
         ``max_dist``: find the distance to vertices out as far as max_dist.
+        ``processes``: the number of processes computing it, by default one
+            for each CPU.
 
         NOTE: Compute time increases rapidly with max_dist and the memory 
         efficiency of the sparse matrices decreases, so, don't use too large a 
@@ -174,9 +512,7 @@ class SurfaceScientific(surfaces_data.SurfaceData):
         #    LOG.error("%s: The geodesic distance library didn't load" % repr(self))
         #    return
 
-        dist = gdist.local_gdist_matrix(self.vertices.astype(numpy.float64),
-                                  self.triangles.astype(numpy.int32),
-                                  max_distance = max_dist)
+        dist = geodesic_distance_matrix(self.vertices, self.triangles, max_dist, processes)
 
         self.geodesic_distance_matrix = dist
 
@@ -609,9 +945,8 @@ class LocalConnectivityScientific(surfaces_data.LocalConnectivityData):
             LOG.error(msg)
             raise Exception(msg)
 
-        self.matrix = gdist.local_gdist_matrix(self.surface.vertices.astype(numpy.float64),
-                           self.surface.triangles.astype(numpy.int32),
-                           max_distance=self.cutoff)
+        self.matrix = geodesic_distance_matrix(self.surface.vertices, self.surface.triangles,
+                                               self.cutoff)
 
 
 class CortexScientific(surfaces_data.CortexData, SurfaceScientific):
@@ -621,6 +956,7 @@ class CortexScientific(surfaces_data.CortexData, SurfaceScientific):
     #TODO: Prob. should implement these in the @property way...
     region_areas = None
     region_orientation = None
+    _region_mapping_operator = None
 
 
     def configure(self):
@@ -629,7 +965,7 @@ class CortexScientific(surfaces_data.CortexData, SurfaceScientific):
         set during initialisation.
         """
         super(CortexScientific, self).configure()
-        self.region_average = self.region_mapping
+        self._region_mapping_operator = None
 
         if self.region_orientation is None: #.size == 0
             self.compute_region_orientation()
@@ -665,10 +1001,20 @@ class CortexScientific(surfaces_data.CortexData, SurfaceScientific):
         LOG.info("Computing local connectivity matrix")
         #TODO: Better to put this in configure, then callers job, if change cutoff, to explicit call compute...matrix 
         loc_con_cutoff = self.local_connectivity.cutoff
+        equation = self.local_connectivity.equation
+        name = "local-connectivity-" + cache_key(self.vertices.astype(numpy.float64),
+                                                 self.triangles.astype(numpy.int32),
+                                                 float(loc_con_cutoff),
+                                                 equation.__class__.__name__,
+                                                 sorted(equation.parameters.items()))
         self.compute_geodesic_distance_matrix(max_dist = loc_con_cutoff)
-
-        self.local_connectivity.matrix = self.geodesic_distance_matrix.copy()
-        self.local_connectivity.compute() #Evaluate equation based distance
+        matrix = load_cached_matrix(name)
+        if matrix is None:
+            self.local_connectivity.matrix = self.geodesic_distance_matrix.copy()
+            self.local_connectivity.compute() #Evaluate equation based distance
+            cache_matrix(name, self.local_connectivity.matrix)
+        else:
+            self.local_connectivity.matrix = matrix
         self.local_connectivity.trait["matrix"].log_debug(owner=self.__class__.__name__+".local_connectivity")
 
         #HACK FOR DEBUGGING CAUSE TRAITS REPORTS self.local_connectivity.trait["matrix"] AS BEING EMPTY...
@@ -708,82 +1054,43 @@ class CortexScientific(surfaces_data.CortexData, SurfaceScientific):
                                                             padding])
 
 
-    #----------------------------- region_average -----------------------------#
-    def _get_region_average(self):
-        """
-        An array that ...
+    #------------------------- region_mapping_operator ------------------------#
+    @property
+    def region_mapping_operator(self):
         """
-        return self._region_average
-
-    def _set_region_average(self, spatial_mask):
-        """ 
-        .d..
+        A RegionMappingOperator for the region_mapping, averaging activity over
+        the vertices of each region and expanding regions' values to their
+        vertices.
         """
-
-        self.region_sum =  spatial_mask
-
-        nodes_per_area = numpy.sum(self.region_sum, axis=1)[:, numpy.newaxis]
-        self._region_average =  self.region_sum / nodes_per_area
-        #import pdb; pdb.set_trace()
-
-        util.log_debug_array(LOG, self._region_average, "region_average",
-                             owner=self.__class__.__name__)
-
-    region_average = property(fget=_get_region_average, 
-                              fset=_set_region_average)
-    #--------------------------------------------------------------------------#
+        if self._region_mapping_operator is None:
+            self._region_mapping_operator = RegionMappingOperator(self.region_mapping)
+        return self._region_mapping_operator
 
 
-    #------------------------------- region_sum -------------------------------#
-    def _get_region_sum(self):
-        """
-        An array that ...
+    @property
+    def region_average(self):
         """
-        return self._region_sum
-
-    def _set_region_sum(self, spatial_mask):
-        """ 
-         Set self._region_average attribute based on region mapping...
+        A sparse (regions x vertices) matrix averaging over each region.
         """
+        return self.region_mapping_operator.matrix(average=True)
 
-        self.vertex_mapping = spatial_mask
-
-        self._region_sum = self.vertex_mapping.T
-
-        util.log_debug_array(LOG, self._region_sum, "region_sum",
-                             owner=self.__class__.__name__)
-
-    region_sum = property(fget=_get_region_sum, 
-                          fset=_set_region_sum)
-    #--------------------------------------------------------------------------#
 
-
-    #----------------------------- vertex_mapping -----------------------------#
-    def _get_vertex_mapping(self):
+    @property
+    def region_sum(self):
         """
-        A two dimensional array that can be used, via matrix multiplication, to
-        map a vector of length number_of_regions to a vector of length 
-        number_of_vertices.
+        A sparse (regions x vertices) matrix summing over each region.
         """
-        return self._vertex_mapping
+        return self.region_mapping_operator.matrix()
 
-    def _set_vertex_mapping(self, spatial_mask):
-        """ 
-        Set self._region_average attribute based on region mapping...
-        """
-        number_of_nodes = self.region_mapping.shape[0] #TODO: need to support non-cortical regions here
-        number_of_areas = len(numpy.unique(spatial_mask)) #TODO: need to support non-cortical regions here
-        #import pdb; pdb.set_trace()
-        vertex_mapping = numpy.zeros((number_of_nodes, number_of_areas))
-        vertex_mapping[numpy.arange(number_of_nodes), spatial_mask] = 1
 
-        self._vertex_mapping = vertex_mapping
-
-        util.log_debug_array(LOG, self._vertex_mapping, "vertex_mapping",
-                             owner=self.__class__.__name__)
-
-    vertex_mapping = property(fget=_get_vertex_mapping, 
-                              fset=_set_vertex_mapping)
+    @property
+    def vertex_mapping(self):
+        """
+        A sparse (vertices x regions) matrix that can be used, via matrix 
+        multiplication, to map a vector of length number_of_regions to a vector
+        of length number_of_vertices.
+        """
+        return self.region_mapping_operator.matrix().T
     #--------------------------------------------------------------------------#
 
     #TODO: May be better to have these return values for assignment to the
@@ -792,15 +1099,16 @@ class CortexScientific(surfaces_data.CortexData, SurfaceScientific):
     def compute_region_areas(self):
         """
         """
-        regions = numpy.unique(self.region_mapping)
-        region_surface_area = numpy.zeros((len(regions), 1))
-        avt = numpy.array(self.vertex_triangles)
+        number_of_regions = self.region_mapping_operator.number_of_regions
+        #Each (triangle, region) pair, for the regions of a triangle's vertices.
+        triangle_regions = self.region_mapping_operator.mapping[self.triangles]
+        pairs = numpy.unique(numpy.arange(self.number_of_triangles)[:, numpy.newaxis] * number_of_regions +
+                             triangle_regions)
         #NOTE: Slightly overestimates as it counts overlapping border triangles,
         #      but, not really a problem provided triangle-size << region-size.
-        for k in regions:
-            regs = map(set, avt[self.region_mapping == k])
-            region_triangles = set.union(*regs)
-            region_surface_area[k] = self.triangle_areas[list(region_triangles)].sum()
+        region_surface_area = numpy.bincount(pairs % number_of_regions,
+                                             weights=self.triangle_areas[pairs // number_of_regions, 0],
+                                             minlength=number_of_regions)[:, numpy.newaxis]
 
         util.log_debug_array(LOG, region_surface_area, "region_areas",
                              owner=self.__class__.__name__)
@@ -810,13 +1118,14 @@ class CortexScientific(surfaces_data.CortexData, SurfaceScientific):
     def compute_region_orientation(self):
         """
         """
-        regions = numpy.unique(self.region_mapping)
-        average_orientation = numpy.zeros((len(regions), 3))
+        operator = self.region_mapping_operator
+        #Non-cortical regions, without vertices, are left without orientation.
+        normals = numpy.zeros((operator.number_of_nodes, 3))
+        normals[:self.number_of_vertices] = self.vertex_normals
         #Average orientation of the region
-        for k in regions:
-            orient = self.vertex_normals[self.region_mapping == k, :]
-            avg_orient = numpy.mean(orient, axis=0)
-            average_orientation[k, :] =  avg_orient / numpy.sqrt(numpy.sum(avg_orient**2))
+        average_orientation = operator.average(normals, axis=0)
+        norms = numpy.sqrt(numpy.sum(average_orientation**2, axis=1))[:, numpy.newaxis]
+        average_orientation /= numpy.where(norms > 0.0, norms, 1.0)
 
         util.log_debug_array(LOG, average_orientation, "region_orientation",
                              owner=self.__class__.__name__)
@@ -351,15 +351,22 @@ class device_handler(object):
             self.nspr  .cpu[..., idx] = sim.integrator.noise.device_info.nspr
         self.mmpr  .cpu[..., idx] = sim.model.device_info.mmpr
 
-        # sim's history shape is (horizon, n_svars, n_nodes, n_modes)
+        # sim's history shape is (horizon, n_cvars, n_nodes, n_modes) and
+        # its current state's is (n_svars, n_nodes, n_modes)
 
         # our state's shape is  ('n_node', 'n_svar', 'n_thr'))
         # and we fold modes into svars
-        state = sim.history[sim.current_step].transpose((1, 0, 2))
+        state = sim.current_state.transpose((1, 0, 2))
         self.x     .cpu[..., idx] = state.reshape((-1, prod(state.shape[-2:])))
 
         # and our history's shape is ('horizon', 'n_node', 'n_cvar', 'n_thr'))
-        history = sim.history[:, sim.model.cvar].transpose((0, 2, 1, 3))
+        # which can't be filled from the sim's per-node ring buffers or
+        # from an ensemble
+        if sim.history_packing is not None or sim.ensemble_shape:
+            msg = ("%r: the device backend needs the 'uniform' history_layout "
+                   "of a single simulation, not an ensemble" % sim)
+            raise ValueError(msg)
+        history = sim.history.transpose((0, 2, 1, 3))
         with_modes_folded = history.shape[:2] + (prod(history.shape[-2:]),)
         self.hist  .cpu[..., idx] = history.reshape(with_modes_folded)
        
@@ -112,6 +112,62 @@ class Coupling(core.Type):
         pass
 
 
+    def pre(self, x_i, x_j):
+        """
+        The part of the coupling function evaluated on each connection, prior
+        to weighting by g_ij and summing over the incoming connections of a
+        node. Together with post() it provides an edge-wise form of the
+        coupling, such that
+
+        ::
+
+            coupling(g_ij, x_i, x_j) == post((g_ij * pre(x_i, x_j)).sum(axis=0))
+
+        which is what the Simulator's sparse coupling engine relies on. Here
+        x_i and x_j are the target's current and the source's delayed state,
+        with any leading dimension enumerating connections.
+
+        """
+        raise NotImplementedError
+
+
+    def post(self, gx):
+        """
+        The part of the coupling function applied to the weighted sum, gx, of
+        pre() over the incoming connections of each node. See pre().
+
+        """
+        raise NotImplementedError
+
+
+    def sources(self, x_j):
+        """
+        A factorised form of the coupling function, in which it depends on
+        the source's delayed state only through a few functions of it that
+        can be evaluated once per node, rather than once per connection. 
+        These are returned as a tuple and, with combine(), must satisfy
+
+        ::
+
+            sums = [(g_ij * s).sum(axis=0) for s in sources(x_j)]
+            coupling(g_ij, x_i, x_j) == combine(x_i, sums, g_ij.sum(axis=0))
+
+        which is what the Simulator's 'lags' coupling engine relies on.
+
+        """
+        raise NotImplementedError
+
+
+    def combine(self, x_i, sums, row_sums):
+        """
+        Produce the coupling from the target's current state, x_i, the 
+        weighted sums over incoming connections of each of the sources(), and 
+        the sum of the incoming weights of each node. See sources().
+
+        """
+        raise NotImplementedError
+
+
 class coupling_device_info(object):
     """
     Utility class that allows Coupling subclass to annotate their requirements
@@ -188,6 +244,22 @@ class Linear(Coupling):
         input = (g_ij * x_j).sum(axis=0)
         return self.a * input + self.b
 
+
+    def pre(self, x_i, x_j):
+        return x_j
+
+
+    def post(self, gx):
+        return self.a * gx + self.b
+
+
+    def sources(self, x_j):
+        return (x_j,)
+
+
+    def combine(self, x_i, sums, row_sums):
+        return self.post(sums[0])
+
     device_info = coupling_device_info(
         pars = [a, b],
         kernel = """
@@ -241,6 +313,22 @@ class Scaling(Coupling):
         input = (g_ij * x_j).sum(axis=0)
         return self.scaling_factor * input
 
+
+    def pre(self, x_i, x_j):
+        return x_j
+
+
+    def post(self, gx):
+        return self.scaling_factor * gx
+
+
+    def sources(self, x_j):
+        return (x_j,)
+
+
+    def combine(self, x_i, sums, row_sums):
+        return self.post(sums[0])
+
     device_info = coupling_device_info(
         pars = [scaling_factor],
         kernel = """
@@ -323,6 +411,23 @@ class Sigmoidal(Coupling):
             numpy.exp(-self.pi_on_sqrt3 * ((input - self.midpoint) / self.sigma))))
         return sig
 
+
+    def pre(self, x_i, x_j):
+        return x_j
+
+
+    def post(self, gx):
+        return self.cmin + ((self.cmax - self.cmin) / (1.0 +
+            numpy.exp(-self.pi_on_sqrt3 * ((gx - self.midpoint) / self.sigma))))
+
+
+    def sources(self, x_j):
+        return (x_j,)
+
+
+    def combine(self, x_i, sums, row_sums):
+        return self.post(sums[0])
+
     device_info = coupling_device_info(
         pars = [cmin, cmax, midpoint, sigma],
         kernel = """
@@ -366,6 +471,30 @@ class Difference(Coupling):
 
         return self.a*(g_ij*(x_j - x_i)).sum(axis=0)
 
+
+    def pre(self, x_i, x_j):
+        return x_j - x_i
+
+
+    def post(self, gx):
+        return self.a * gx
+
+
+    def sources(self, x_j):
+        return (x_j,)
+
+
+    def combine(self, x_i, sums, row_sums):
+        r"""
+        Factorised difference coupling, the sum over x_i only needing the 
+        incoming weights of each node:
+
+            .. math::
+                a (\sum_j^N g_ij x_j - x_i \sum_j^N g_ij)
+
+        """
+        return self.a * (sums[0] - x_i * row_sums)
+
     device_info = coupling_device_info(
         pars = [a],
         kernel = """
@@ -400,6 +529,31 @@ class Kuramoto(Coupling):
 
         return self.a*(g_ij*sin(x_j - x_i)).sum(axis=0)
 
+
+    def pre(self, x_i, x_j):
+        return numpy.sin(x_j - x_i)
+
+
+    def post(self, gx):
+        return self.a * gx
+
+
+    def sources(self, x_j):
+        return (numpy.sin(x_j), numpy.cos(x_j))
+
+
+    def combine(self, x_i, sums, row_sums):
+        r"""
+        Factorised Kuramoto coupling, using the identity 
+        :math:`\sin(x_j - x_i) = \sin x_j \cos x_i - \cos x_j \sin x_i`
+        so sines and cosines are only evaluated once per node:
+
+            .. math::
+                a (\cos x_i \sum_j^N g_ij \sin x_j - \sin x_i \sum_j^N g_ij \cos x_j)
+
+        """
+        return self.a * (numpy.cos(x_i) * sums[0] - numpy.sin(x_i) * sums[1])
+
     device_info = coupling_device_info(
         pars = [a],
         kernel = """
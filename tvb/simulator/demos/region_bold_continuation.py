@@ -90,14 +90,16 @@ except OSError: # os.stat will give OSError if it doesn't find the file
     title('initial simulation')
     xlabel('time (s)')
 
-    # now, save the state: sim history, bold stock & noise generator state
+    # now, save the state: sim history & current state, bold stock & noise generator state
     history = sim.history.copy()
+    current_state = sim.current_state.copy()
     bold1 = sim.monitors[1]._interim_stock.copy()
     bold2 = sim.monitors[1]._stock.copy()
     rng = sim.integrator.noise.random_stream.get_state()
 
     # save to file (sorry this is cryptic for the moment)
-    savez('sim_cryo.npz', history=history, bold1=bold1, bold2=bold2)
+    savez('sim_cryo.npz', history=history, current_state=current_state,
+          current_step=sim.current_step, bold1=bold1, bold2=bold2)
     save('rng_%s_%d_%d_%.30g.npy' % ((rng[0],) + rng[2:]), rng[1])
 
 
@@ -148,6 +150,8 @@ rng_state = [rng[0], load(rng_name)] + rng[1:]
 # set the new simulator with the old brain state
 
 sim.history[:] = cryo['history']
+sim.current_state[:] = cryo['current_state']
+sim.current_step = int(cryo['current_step'])
 sim.monitors[1]._stock[:] = cryo['bold2']
 sim.monitors[1]._interim_stock[:] = cryo['bold1']
 
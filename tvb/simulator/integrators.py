@@ -35,9 +35,11 @@ will be consistent with Monitor periods corresponding to any of [4096, 2048, 102
 """
 
 # From standard python libraries
+import inspect
 
 # Third party python libraries
 import numpy
+import scipy.linalg
 
 #The Virtual Brain
 import tvb.basic.traits.core as core
@@ -65,14 +67,38 @@ class Integrator(core.Type):
         computer simulation of stochastic differential equations*, Phys. Rev. A
         40: 3381, 1989.
 
+    .. [4] J. R. Dormand and P. J. Prince, *A family of embedded Runge-Kutta
+        formulae*, J. of Computational and Applied Mathematics 6(1): 19--26,
+        1980.
+
+    .. [5] A. Roessler, *Runge-Kutta methods for the strong approximation of
+        solutions of stochastic differential equations*, SIAM J. on Numerical
+        Analysis 48(3): 922--952, 2010.
+
+    .. [6] S. M. Cox and P. C. Matthews, *Exponential time differencing for
+        stiff systems*, J. of Computational Physics 176(2): 430--455, 2002.
+
+    .. [7] U. M. Ascher, S. J. Ruuth and B. T. R. Wetton, *Implicit-explicit
+        methods for time-dependent partial differential equations*, SIAM J.
+        on Numerical Analysis 32(3): 797--823, 1995.
+
     .. #Currently there seems to be a clash betwen traits and autodoc, autodoc
     .. #can't find the methods of the class, the class specific names below get
     .. #us around this...
     .. automethod:: Integrator.__init__
     .. automethod:: Integrator.scheme
+    .. automethod:: Integrator.workspace
+    .. automethod:: Integrator.evaluate
+    .. automethod:: Integrator.stage
+
+    The schemes keep their intermediate arrays, and the derivatives, in
+    workspace arrays allocated on the first step of a simulation and reused by
+    the following ones, passing them to the dfun of Models accepting an
+    ``out`` argument (see Model.dfun). Only the next state, which the
+    Simulator hands on to its monitors, is a new array each step.
 
     """
-    _base_classes = ['Integrator', 'IntegratorStochastic', 'RungeKutta4thOrderDeterministic']
+    _base_classes = ['Integrator', 'IntegratorStochastic', 'IntegratorSemiLinear']
 
     dt = basic.Float(
         label = "Integration-step size (ms)", 
@@ -92,6 +118,8 @@ class Integrator(core.Type):
         """Integrators are intialized using their integration step, dt."""
         super(Integrator, self).__init__(**kwargs) 
         LOG.debug(str(kwargs))
+        self._workspace = {}
+        self._out_support = {}
 
 
     def __repr__(self):
@@ -120,6 +148,65 @@ class Integrator(core.Type):
 
         pass
 
+
+    def workspace(self, name, like):
+        """
+        The integrator's array called name, of the shape and dtype of the array
+        like, allocated when it's first asked for or when like's shape changes.
+        Its content is whatever it was last given.
+        """
+        array = self._workspace.get(name)
+        if array is None or array.shape != like.shape or array.dtype != like.dtype:
+            array = numpy.empty(like.shape, dtype=like.dtype)
+            self._workspace[name] = array
+        return array
+
+
+    def accepts_out(self, dfun):
+        """Whether dfun takes an out argument, see Model.dfun."""
+        function = getattr(dfun, "__func__", dfun)
+        if function not in self._out_support:
+            try:
+                self._out_support[function] = "out" in inspect.getargspec(function).args
+            except TypeError:
+                self._out_support[function] = False
+        return self._out_support[function]
+
+
+    def evaluate(self, dfun, X, coupling, local_coupling, name):
+        """
+        The derivative dfun(X, coupling, local_coupling), in the workspace
+        array called name: written there by dfun itself when it accepts an
+        out argument, copied there from its result otherwise.
+        """
+        out = self.workspace(name, X)
+        if self.accepts_out(dfun):
+            return dfun(X, coupling, local_coupling, out=out)
+        out[...] = dfun(X, coupling, local_coupling)
+        return out
+
+
+    def add_stimulus(self, X_next, stimulus):
+        """Add dt * stimulus to X_next, in place, unless it's nil."""
+        if numpy.isscalar(stimulus):
+            if stimulus != 0.0:
+                X_next += self.dt * stimulus
+        else:
+            X_next += numpy.multiply(self.dt, stimulus,
+                                     out=self.workspace("stimulus", stimulus))
+        return X_next
+
+
+    def stage(self, dfun, X, coupling, local_coupling, stimulus, name):
+        """
+        The derivative of a stage of a Runge-Kutta scheme, evaluate()'s, plus
+        the stimulus, which like the coupling is constant over the step.
+        """
+        derivative = self.evaluate(dfun, X, coupling, local_coupling, name)
+        if not (numpy.isscalar(stimulus) and stimulus == 0.0):
+            derivative += stimulus
+        return derivative
+
 class integrator_device_info(object):
     """
     Utility class that allows Integrator subclass to annotate their requirements
@@ -249,13 +336,20 @@ class HeunDeterministic(Integrator):
         cf. Equation 1.11, page 283.
 
         """
-        #import pdb; pdb.set_trace()
-        inter = X + self.dt * (dfun(X, coupling, local_coupling)  + stimulus)
+        dX1 = self.evaluate(dfun, X, coupling, local_coupling, "dX1")
+
+        inter = self.workspace("inter", X)
+        numpy.add(dX1, stimulus, out=inter)
+        inter *= self.dt
+        inter += X
 
-        dX = (dfun(X, coupling, local_coupling) +
-              dfun(inter, coupling, local_coupling)) * self.dt / 2.0
+        dX2 = self.evaluate(dfun, inter, coupling, local_coupling, "dX2")
 
-        return X + dX + self.dt * stimulus
+        X_next = dX1 + dX2
+        X_next *= self.dt
+        X_next /= 2.0
+        X_next += X
+        return self.add_stimulus(X_next, stimulus)
 
 
     device_info = integrator_device_info(
@@ -321,15 +415,24 @@ class HeunStochastic(IntegratorStochastic):
         """
 
         noise = self.noise.generate(X.shape)
+        noise *= self.noise.gfun(X)
 
-        #import pdb; pdb.set_trace()
-        inter = (X + self.dt * dfun(X, coupling, local_coupling) +
-                 self.noise.gfun(X) * noise + self.dt * stimulus)
+        dX1 = self.evaluate(dfun, X, coupling, local_coupling, "dX1")
 
-        dX = (dfun(X, coupling, local_coupling) + 
-              dfun(inter, coupling, local_coupling)) * self.dt / 2.0
+        inter = self.workspace("inter", X)
+        numpy.multiply(dX1, self.dt, out=inter)
+        inter += X
+        inter += noise
+        self.add_stimulus(inter, stimulus)
 
-        return X + dX + self.noise.gfun(X) * noise + self.dt * stimulus
+        dX2 = self.evaluate(dfun, inter, coupling, local_coupling, "dX2")
+
+        X_next = dX1 + dX2
+        X_next *= self.dt
+        X_next /= 2.0
+        X_next += X
+        X_next += noise
+        return self.add_stimulus(X_next, stimulus)
 
     device_info = integrator_device_info(
         pars = ['dt'],
@@ -395,9 +498,9 @@ class EulerDeterministic(Integrator):
 
         """
 
-        dX = dfun(X, coupling, local_coupling) * self.dt
-
-        return X + dX + self.dt * stimulus
+        X_next = self.evaluate(dfun, X, coupling, local_coupling, "dX1") * self.dt
+        X_next += X
+        return self.add_stimulus(X_next, stimulus)
 
     device_info = integrator_device_info(
         pars = ['dt'],
@@ -455,10 +558,12 @@ class EulerStochastic(IntegratorStochastic):
         """
 
         noise = self.noise.generate(X.shape)
+        noise *= self.noise.gfun(X)
 
-        dX = dfun(X, coupling, local_coupling) * self.dt 
-
-        return X + dX + self.noise.gfun(X) * noise + self.dt * stimulus
+        X_next = self.evaluate(dfun, X, coupling, local_coupling, "dX1") * self.dt
+        X_next += X
+        X_next += noise
+        return self.add_stimulus(X_next, stimulus)
 
     device_info = integrator_device_info(
         pars = ['dt'],
@@ -495,8 +600,6 @@ class RungeKutta4thOrderDeterministic(Integrator):
 
         super(RungeKutta4thOrderDeterministic, self).__init__(**kwargs)
 
-        self.you_have_been_warned = False
-
         LOG.debug("%s: inited." % repr(self))
 
 
@@ -517,30 +620,605 @@ class RungeKutta4thOrderDeterministic(Integrator):
             k_3 &= f(t_n + h/2, y_n + h k_2 / 2) \\
             k_4 &= f(t_n + h, y_n + h k_3)
 
+        The delayed coupling, and the stimulus, are taken to be constant over
+        the step, their values at :math:`t_n` being used by all four stages.
+        Without coupling, e.g. for the local dynamics of a model, coupling is
+        zero.
 
         """
 
-        if (not self.you_have_been_warned) and (coupling != None):
-            msg = "%s: Does NOT support coupling. Just to check local dynamics"
-            LOG.warning(msg%str(self))
-            self.you_have_been_warned = True
-
-        coupling = numpy.zeros(X.shape)
+        if coupling is None:
+            coupling = self.workspace("coupling", X)
+            coupling.fill(0.0)
 
         dt = self.dt
         dt2 = dt / 2.0
         dt6 = dt / 6.0
-        #import pdb; pdb.set_trace()
-        k1 = dfun(X, coupling, local_coupling)
-        k2 = dfun(X + dt2 * k1, coupling, local_coupling)
-        k3 = dfun(X + dt2 * k2, coupling, local_coupling)
-        k4 = dfun(X + dt * k3, coupling, local_coupling)
+        #y => the intermediate states, and scratch space for the sum of the k
+        y = self.workspace("y", X)
+        k1 = self.stage(dfun, X, coupling, local_coupling, stimulus, "k1")
+        numpy.multiply(dt2, k1, out=y)
+        y += X
+        k2 = self.stage(dfun, y, coupling, local_coupling, stimulus, "k2")
+        numpy.multiply(dt2, k2, out=y)
+        y += X
+        k3 = self.stage(dfun, y, coupling, local_coupling, stimulus, "k3")
+        numpy.multiply(dt, k3, out=y)
+        y += X
+        k4 = self.stage(dfun, y, coupling, local_coupling, stimulus, "k4")
+
+        X_next = 2.0 * k2
+        X_next += k1
+        numpy.multiply(2.0, k3, out=y)
+        X_next += y
+        X_next += k4
+        X_next *= dt6
+        X_next += X
+        return X_next
+
+
+
+class DormandPrince5thOrderDeterministic(Integrator):
+    """
+    The explicit Runge-Kutta method of order 5 of Dormand and Prince [4]_,
+    whose embedded method of order 4 gives an estimate of the local error of
+    each step, at the cost of a seventh evaluation of dfun. It's used with a
+    fixed step: the estimate, of the last step, is kept in error_estimate for
+    checking that dt is small enough.
+
+    .. #Currently there seems to be a clash betwen traits and autodoc, autodoc
+    .. #can't find the methods of the class, the class specific names below get
+    .. #us around this...
+    .. automethod:: DormandPrince5thOrderDeterministic.__init__
+    .. automethod:: DormandPrince5thOrderDeterministic.scheme
+
+    """
+
+    #The Butcher tableau: the coefficients of the stages, the last stage being
+    #at the 5th order solution, and the difference between the weights of the
+    #5th and 4th order solutions.
+    _stages = [[],
+               [1.0 / 5.0],
+               [3.0 / 40.0, 9.0 / 40.0],
+               [44.0 / 45.0, -56.0 / 15.0, 32.0 / 9.0],
+               [19372.0 / 6561.0, -25360.0 / 2187.0, 64448.0 / 6561.0, -212.0 / 729.0],
+               [9017.0 / 3168.0, -355.0 / 33.0, 46732.0 / 5247.0, 49.0 / 176.0,
+                -5103.0 / 18656.0],
+               [35.0 / 384.0, 0.0, 500.0 / 1113.0, 125.0 / 192.0, -2187.0 / 6784.0,
+                11.0 / 84.0]]
+    _error_weights = [71.0 / 57600.0, 0.0, -71.0 / 16695.0, 71.0 / 1920.0,
+                      -17253.0 / 339200.0, 22.0 / 525.0, -1.0 / 40.0]
+
+    def __init__(self, **kwargs):
+        """
+        Wisdom... and plagiarism.
+
+        """
+
+        LOG.info("%s: initing..." % str(self))
+
+        super(DormandPrince5thOrderDeterministic, self).__init__(**kwargs)
+
+        #The estimate of the local error of the last step, an array like the
+        #state, and its largest magnitude.
+        self.error_estimate = None
+        self.max_error_estimate = None
+
+        LOG.debug("%s: inited." % repr(self))
+
+
+    def combine(self, X, weights, k, out):
+        """X + dt * sum(weights * k), into out, X being 0 if it's None."""
+        term = self.workspace("term", out)
+        if X is None:
+            out.fill(0.0)
+        else:
+            out[...] = X
+        for weight, k_i in zip(weights, k):
+            if weight != 0.0:
+                numpy.multiply(k_i, self.dt * weight, out=term)
+                out += term
+        return out
+
+
+    def scheme(self, X, dfun, coupling=None, local_coupling=0.0, stimulus=0.0):
+        r"""
+        With the coefficients :math:`a_{ij}` and the weights :math:`b_j` and
+        :math:`b^*_j` of [4]_, Table 2,
+
+        .. math::
+            k_i &= f(t_n + c_i h, y_n + h \sum_{j<i} a_{ij} k_j) \\
+            y_{n+1} &= y_n + h \sum_j b_j k_j \\
+            e_{n+1} &= h \sum_j (b_j - b^*_j) k_j
+
+        where, the method having the First Same As Last property, the last
+        stage is evaluated at :math:`y_{n+1}`. As for the 4th order
+        Runge-Kutta method, the delayed coupling and the stimulus are taken
+        to be constant over the step.
+
+        """
+
+        if coupling is None:
+            coupling = self.workspace("coupling", X)
+            coupling.fill(0.0)
+
+        y = self.workspace("y", X)
+        k = []
+        for i, weights in enumerate(self._stages):
+            if i == 0:
+                y_i = X
+            elif i == len(self._stages) - 1:
+                X_next = y_i = self.combine(X, weights, k, numpy.empty_like(X))
+            else:
+                y_i = self.combine(X, weights, k, y)
+            k.append(self.stage(dfun, y_i, coupling, local_coupling, stimulus, "k%d" % i))
+
+        self.error_estimate = self.combine(None, self._error_weights, k,
+                                           self.workspace("error_estimate", X))
+        self.max_error_estimate = numpy.abs(self.error_estimate).max()
+        return X_next
+
+
+
+class RungeKuttaAdditiveStochastic(IntegratorStochastic):
+    """
+    The stochastic Runge-Kutta method SRA1 of [5]_, of strong order 1.5 for
+    additive noise, and of order 2 for the deterministic part, where Heun's
+    method is of strong order 1.0. It draws, besides the increment of the
+    noise, its integral over the step (see Noise.time_integral). With
+    multiplicative noise, the noise being taken at the start of the step,
+    it's of strong order 0.5, as is Euler-Maruyama: see MilsteinStochastic.
+
+    .. #Currently there seems to be a clash betwen traits and autodoc, autodoc
+    .. #can't find the methods of the class, the class specific names below get
+    .. #us around this...
+    .. automethod:: RungeKuttaAdditiveStochastic.__init__
+    .. automethod:: RungeKuttaAdditiveStochastic.scheme
+
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Wisdom... and plagiarism.
+
+        """
+
+        LOG.info("%s: initing..." % str(self))
+
+        super(RungeKuttaAdditiveStochastic, self).__init__(**kwargs)
+
+        LOG.debug("%s: inited." % repr(self))
+
+
+    def scheme(self, X, dfun, coupling, local_coupling, stimulus):
+        r"""
+        From [5]_, Table 5.1, for noise not depending on time:
+
+        .. math::
+            H &= X_n + \frac{3}{4} dt \, dX(X_n) +
+                 \frac{3}{2} g(X_n) \frac{I_{(1,0)}}{dt} \\
+            X_{n+1} &= X_n + dt (\frac{1}{3} dX(X_n) + \frac{2}{3} dX(H)) +
+                       g(X_n) \Delta W
+
+        where :math:`\Delta W` is the increment of the noise and
+        :math:`I_{(1,0)}` its integral over the step. The delayed coupling and
+        the stimulus are taken to be constant over the step.
+
+        """
+
+        noise = self.noise.generate(X.shape)
+        g_x = self.noise.gfun(X)
+
+        dX1 = self.stage(dfun, X, coupling, local_coupling, stimulus, "dX1")
+
+        inter = self.workspace("inter", X)
+        numpy.multiply(self.noise.time_integral(noise), 1.5 / self.dt, out=inter)
+        inter *= g_x
+        inter += X
+        term = self.workspace("term", X)
+        numpy.multiply(dX1, 0.75 * self.dt, out=term)
+        inter += term
+
+        dX2 = self.stage(dfun, inter, coupling, local_coupling, stimulus, "dX2")
+
+        X_next = dX2 * 2.0
+        X_next += dX1
+        X_next *= self.dt / 3.0
+        X_next += X
+        noise *= g_x
+        X_next += noise
+        return X_next
+
+    device_info = integrator_device_info(
+        pars = ['dt'],
+        kernel = """
+        float dt = P(0);
+
+        // compute noise term
+        noise_gfun(gx, x, nspr);
+
+        // first stage, and the second stage's state in DX2/dx2; a single
+        // noise variate being drawn per step, its integral over the step is
+        // taken to be dt*NS/2, which makes the scheme of strong order 1.0
+        model_dfun(dx1, x, mmpr, input);
+        for (int i_svar=0; i_svar<n_svar; i_svar++)
+            DX2(i_svar) = X(i_svar) + 0.75*(dt*(DX1(i_svar) + STIM(i_svar)) + GX(i_svar)*NS(i_svar));
+
+        // second stage, aliasing as for Heun's method
+        model_dfun(dx2, dx2, mmpr, input);
+
+        // next step
+        for (int i_svar=0; i_svar<n_svar; i_svar++)
+            X(i_svar) += dt*((DX1(i_svar) + 2.0*DX2(i_svar))/3.0 + STIM(i_svar)) + GX(i_svar)*NS(i_svar);
+        """)
+
+
+
+class MilsteinStochastic(IntegratorStochastic):
+    """
+    The derivative free Milstein scheme of [1]_, of strong order 1.0 for
+    multiplicative noise, where the Euler-Maruyama and Heun schemes are of
+    strong order 0.5, with the drift of Heun's scheme, of order 2 for the
+    deterministic part. The derivative of the noise function is approximated
+    by a difference, at the cost of a second evaluation of Noise.gfun, that's
+    skipped for Additive noise, to which the scheme then reduces to Heun's.
+    The noise of each state variable being independent, the scheme needs no
+    multiple stochastic integrals.
+
+    .. #Currently there seems to be a clash betwen traits and autodoc, autodoc
+    .. #can't find the methods of the class, the class specific names below get
+    .. #us around this...
+    .. automethod:: MilsteinStochastic.__init__
+    .. automethod:: MilsteinStochastic.scheme
+
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Wisdom... and plagiarism.
+
+        """
+
+        LOG.info("%s: initing..." % str(self))
+
+        super(MilsteinStochastic, self).__init__(**kwargs)
+
+        LOG.debug("%s: inited." % repr(self))
+
+
+    def scheme(self, X, dfun, coupling, local_coupling, stimulus):
+        r"""
+        From [1]_, Equation 11.1.3, page 374, with the drift of [2]_:
+
+        .. math::
+            X_{n+1} &= X_n + (dX(X_n) + dX(\tilde{X}_{n+1})) dt / 2 +
+                       g(X_n) \Delta W + \frac{1}{2 \sqrt{dt}}
+                       (g(\Upsilon) - g(X_n)) (\Delta W^2 - dt) \\
+            \tilde{X}_{n+1} &= X_n + dX(X_n) \, dt + g(X_n) \Delta W \\
+            \Upsilon &= X_n + dX(X_n) \, dt + g(X_n) \sqrt{dt}
+
+        where :math:`\Delta W` is the increment of the noise. The correction
+        of the Ito integral being for white noise, it's left out for coloured
+        noise.
+
+        """
+
+        noise = self.noise.generate(X.shape)
+        g_x = self.noise.gfun(X)
+
+        dX1 = self.stage(dfun, X, coupling, local_coupling, stimulus, "dX1")
+
+        #Euler-Maruyama step, the predictor of the drift
+        inter = self.workspace("inter", X)
+        numpy.multiply(dX1, self.dt, out=inter)
+        inter += X
+
+        X_next = numpy.empty_like(X)
+        if not (isinstance(self.noise, tvb.simulator.noise.Additive) or
+                self.noise.ntau > 0.0):
+            sqrt_dt = numpy.sqrt(self.dt)
+            support = self.workspace("support", X)
+            numpy.multiply(g_x, sqrt_dt, out=support)
+            support += inter
+            X_next[...] = self.noise.gfun(support)
+            X_next -= g_x
+            X_next *= noise**2 - self.dt
+            X_next /= 2.0 * sqrt_dt
+        else:
+            X_next.fill(0.0)
+
+        noise *= g_x
+        inter += noise
+        dX2 = self.stage(dfun, inter, coupling, local_coupling, stimulus, "dX2")
+
+        dX2 += dX1
+        dX2 *= self.dt / 2.0
+        X_next += dX2
+        X_next += X
+        X_next += noise
+        return X_next
+
+    device_info = integrator_device_info(
+        pars = ['dt'],
+        kernel = """
+        float dt = P(0);
+        float sqrt_dt = sqrt(dt);
+
+        model_dfun(dx1, x, mmpr, input);
+        noise_gfun(gx, x, nspr);
+
+        // predictor in DX2/dx2, the first half of the drift, the noise and the
+        // g(x) part of the correction in X, then the supporting value in
+        // DX1/dx1, which is no longer needed
+        for (int i_svar=0; i_svar<n_svar; i_svar++)
+        {
+            DX2(i_svar) = X(i_svar) + dt*(DX1(i_svar) + STIM(i_svar)) + GX(i_svar)*NS(i_svar);
+            X(i_svar) += dt*(DX1(i_svar) + STIM(i_svar))/2.0 + GX(i_svar)*NS(i_svar)
+                       - GX(i_svar)*(NS(i_svar)*NS(i_svar) - dt)/(2.0*sqrt_dt);
+            DX1(i_svar) = DX2(i_svar) + GX(i_svar)*(sqrt_dt - NS(i_svar));
+        }
+
+        // noise function at the supporting value
+        noise_gfun(gx, dx1, nspr);
+        for (int i_svar=0; i_svar<n_svar; i_svar++)
+            X(i_svar) += GX(i_svar)*(NS(i_svar)*NS(i_svar) - dt)/(2.0*sqrt_dt);
+
+        // second half of the drift, aliasing as for Heun's method
+        model_dfun(dx1, dx2, mmpr, input);
+        for (int i_svar=0; i_svar<n_svar; i_svar++)
+            X(i_svar) += dt*(DX1(i_svar) + STIM(i_svar))/2.0;
+        """)
+
+
+
+class IntegratorSemiLinear(Integrator):
+    r"""
+    The IntegratorSemiLinear class is a base class for the integration methods
+    of semi-linear equations,
+
+        .. math::
+            \dot{X} = L X + N(X)
+
+    where the linear operator :math:`L` of the Model (see
+    Model.linear_operator), holding its stiff terms, is taken exactly or
+    implicitly, and the rest :math:`N(X) = dX(X) - L X`, the nonlinear and
+    coupling terms, explicitly. The step is then no longer bounded by the
+    decay rates of the linear terms, but by the nonlinear terms only.
+
+    The schemes are written as
+
+        .. math::
+            X_{n+1} = X_n + \sum_i M_i \, dX(X^{(i)})
+
+    with matrices :math:`M_i`, acting on the state of each node, computed from
+    :math:`dt L` when it changes, so that a step costs the evaluations of dfun
+    and the products with the matrices.
+
+    .. automethod:: IntegratorSemiLinear.operators
+    .. automethod:: IntegratorSemiLinear.matrices
+    .. automethod:: IntegratorSemiLinear.phi_functions
+    .. automethod:: IntegratorSemiLinear.apply
+
+    """
 
-        dX = dt6 * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+    def __init__(self, **kwargs):
+        """
+        Wisdom... and plagiarism.
+
+        """
+        super(IntegratorSemiLinear, self).__init__(**kwargs)
+        self._operators = None
+        self._operators_key = None
+
+
+    def operators(self, dfun):
+        """
+        The matrices of the scheme for the linear operator of the Model whose
+        dfun is integrated, computed again when it or dt have changed.
+        """
+        linear_operator = getattr(getattr(dfun, "__self__", None), "linear_operator", None)
+        if linear_operator is not None:
+            linear_operator = linear_operator()
+        if linear_operator is None:
+            msg = "%s: the model doesn't expose its linear operator, see Model.linear_operator."
+            LOG.error(msg % str(self))
+            raise ValueError(msg % str(self))
+        key = (self.dt, linear_operator.shape, linear_operator.tostring())
+        if key != self._operators_key:
+            LOG.debug("%s: computing the matrices of the scheme" % str(self))
+            self._operators = self.matrices(self.dt * numpy.asarray(linear_operator, dtype=numpy.float64))
+            self._operators_key = key
+        return self._operators
+
+
+    def matrices(self, dt_L):
+        """The matrices of the scheme, given :math:`dt L`."""
+        pass
+
+
+    def phi_functions(self, dt_L):
+        r"""
+        The matrix functions :math:`e^{dt L}`, :math:`\varphi_1(dt L)` and
+        :math:`\varphi_2(dt L)`, where :math:`\varphi_1(z) = (e^z - 1) / z`
+        and :math:`\varphi_2(z) = (e^z - 1 - z) / z^2`, from the exponential
+        of an augmented matrix, which holds for singular :math:`L`.
+        """
+        n = dt_L.shape[0]
+        augmented = numpy.zeros((3 * n, 3 * n))
+        augmented[:n, :n] = dt_L
+        augmented[:n, n:2 * n] = augmented[n:2 * n, 2 * n:] = numpy.eye(n)
+        exponential = scipy.linalg.expm(augmented)
+        return exponential[:n, :n], exponential[:n, n:2 * n], exponential[:n, 2 * n:]
+
+
+    def apply(self, matrix, X):
+        """
+        The product of a matrix acting on the state of a node, ordered by
+        state variable then mode, with the state of each node of X, as a new
+        array.
+        """
+        nvar, modes = X.shape[0], X.shape[2]
+        if modes == 1:
+            return numpy.dot(matrix, X.reshape((nvar, -1))).reshape(X.shape)
+        states = X.swapaxes(1, 2).reshape((nvar * modes, -1))
+        shape = (nvar, modes, X.shape[1]) + X.shape[3:]
+        return numpy.dot(matrix, states).reshape(shape).swapaxes(1, 2).copy()
 
-        return X + dX + self.dt * stimulus
 
 
+class ExponentialEulerDeterministic(IntegratorSemiLinear):
+    """
+    The exponential Euler method, or first order exponential time
+    differencing, of [6]_: the linear terms are integrated exactly over the
+    step, with the rest of dfun constant over it. It's of order 1.
+
+    .. #Currently there seems to be a clash betwen traits and autodoc, autodoc
+    .. #can't find the methods of the class, the class specific names below get
+    .. #us around this...
+    .. automethod:: ExponentialEulerDeterministic.__init__
+    .. automethod:: ExponentialEulerDeterministic.scheme
+
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Wisdom... and plagiarism.
+
+        """
+
+        LOG.info("%s: initing..." % str(self))
+
+        super(ExponentialEulerDeterministic, self).__init__(**kwargs)
+
+        LOG.debug("%s: inited." % repr(self))
 
 
+    def matrices(self, dt_L):
+        exponential, phi_1, phi_2 = self.phi_functions(dt_L)
+        return (self.dt * phi_1, )
 
+
+    def scheme(self, X, dfun, coupling, local_coupling, stimulus):
+        r"""
+        From [6]_, Equation 4:
+
+        .. math::
+            X_{n+1} = e^{dt L} X_n + dt \, \varphi_1(dt L) N(X_n)
+                    = X_n + dt \, \varphi_1(dt L) \, dX(X_n)
+
+        """
+        M_1, = self.operators(dfun)
+        dX1 = self.stage(dfun, X, coupling, local_coupling, stimulus, "dX1")
+        X_next = self.apply(M_1, dX1)
+        X_next += X
+        return X_next
+
+
+
+class ExponentialRungeKutta2ndOrderDeterministic(IntegratorSemiLinear):
+    """
+    The exponential time differencing Runge-Kutta method of order 2 of [6]_,
+    which for :math:`L = 0` is Heun's method, and costs, as it does, two
+    evaluations of dfun. The delayed coupling and the stimulus are taken to
+    be constant over the step.
+
+    .. #Currently there seems to be a clash betwen traits and autodoc, autodoc
+    .. #can't find the methods of the class, the class specific names below get
+    .. #us around this...
+    .. automethod:: ExponentialRungeKutta2ndOrderDeterministic.__init__
+    .. automethod:: ExponentialRungeKutta2ndOrderDeterministic.scheme
+
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Wisdom... and plagiarism.
+
+        """
+
+        LOG.info("%s: initing..." % str(self))
+
+        super(ExponentialRungeKutta2ndOrderDeterministic, self).__init__(**kwargs)
+
+        LOG.debug("%s: inited." % repr(self))
+
+
+    def matrices(self, dt_L):
+        exponential, phi_1, phi_2 = self.phi_functions(dt_L)
+        M_1, M_2 = self.dt * phi_1, self.dt * phi_2
+        I = numpy.eye(dt_L.shape[0])
+        return M_1, M_1 - M_2 - numpy.dot(M_2, exponential - I), M_2
+
+
+    def scheme(self, X, dfun, coupling, local_coupling, stimulus):
+        r"""
+        From [6]_, Equation 22:
+
+        .. math::
+            a_n &= X_n + dt \, \varphi_1(dt L) \, dX(X_n) \\
+            X_{n+1} &= a_n + dt \, \varphi_2(dt L) (N(a_n) - N(X_n))
+
+        which, with :math:`N(a_n) - N(X_n) = dX(a_n) - dX(X_n) - L (a_n - X_n)`,
+        is a combination of :math:`dX(X_n)` and :math:`dX(a_n)`.
+
+        """
+        M_1, M_X, M_a = self.operators(dfun)
+        dX1 = self.stage(dfun, X, coupling, local_coupling, stimulus, "dX1")
+        a = self.apply(M_1, dX1)
+        a += X
+        dX2 = self.stage(dfun, a, coupling, local_coupling, stimulus, "dX2")
+        X_next = self.apply(M_X, dX1)
+        X_next += self.apply(M_a, dX2)
+        X_next += X
+        return X_next
+
+
+
+class ImplicitExplicitEulerDeterministic(IntegratorSemiLinear):
+    """
+    The implicit-explicit Euler method of [7]_, which takes the linear terms
+    implicitly and the rest of dfun explicitly. It's of order 1 and, for the
+    linear terms, L-stable: their fast decays are damped rather than
+    resolved, where the exponential methods resolve them exactly.
+
+    .. #Currently there seems to be a clash betwen traits and autodoc, autodoc
+    .. #can't find the methods of the class, the class specific names below get
+    .. #us around this...
+    .. automethod:: ImplicitExplicitEulerDeterministic.__init__
+    .. automethod:: ImplicitExplicitEulerDeterministic.scheme
+
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Wisdom... and plagiarism.
+
+        """
+
+        LOG.info("%s: initing..." % str(self))
+
+        super(ImplicitExplicitEulerDeterministic, self).__init__(**kwargs)
+
+        LOG.debug("%s: inited." % repr(self))
+
+
+    def matrices(self, dt_L):
+        I = numpy.eye(dt_L.shape[0])
+        return (self.dt * numpy.linalg.inv(I - dt_L), )
+
+
+    def scheme(self, X, dfun, coupling, local_coupling, stimulus):
+        r"""
+        From [7]_, the 1st order scheme of Section 2:
+
+        .. math::
+            (1 - dt L) X_{n+1} = X_n + dt N(X_n)
+
+        that is, :math:`X_{n+1} = X_n + dt (1 - dt L)^{-1} dX(X_n)`.
+
+        """
+        M_1, = self.operators(dfun)
+        dX1 = self.stage(dfun, X, coupling, local_coupling, stimulus, "dX1")
+        X_next = self.apply(M_1, dX1)
+        X_next += X
+        return X_next
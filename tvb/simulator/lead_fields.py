@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+
+"""
+The lead fields of the projection monitors.
+
+A lead field maps the activity of the sources of a simulation, its regions or
+vertices, to a set of sensors, as a (sensors x sources) projection matrix. It
+is computed for all the sensors and a block of the sources at a time, the
+blocks sized to bound the memory of the intermediate arrays. The result is
+kept in the cache (see tvb.datatypes.surfaces_scientific), under a hash of the
+sources' positions and orientations, the sensors' locations and the other
+parameters of the forward solution. A simulator configured again, or another
+one with the same geometry, then reads it rather than computing it.
+
+.. [Sarvas_1987] Sarvas, J., *Basic mathematical and electromagnetic
+    concepts of the biomagnetic inverse problem*, Physics in Medicine and
+    Biology, 1987.
+
+"""
+
+# Third party python libraries
+import numpy
+
+#The Virtual Brain
+import tvb.datatypes.surfaces_scientific as surfaces_scientific
+from tvb.simulator.common import get_logger
+LOG = get_logger(__name__)
+
+
+
+def source_blocks(number_of_sensors, number_of_sources, temporaries, block_memory):
+    """
+    Slices of the sources in blocks small enough for the given number of
+    (sensors, block) float64 temporaries to fit in block_memory bytes.
+    """
+    block_size = max(1, int(block_memory // (temporaries * 8 * max(1, number_of_sensors))))
+    for start in range(0, number_of_sources, block_size):
+        yield slice(start, min(start + block_size, number_of_sources))
+
+
+def point_dipole_eeg(sensors, sources, orientations, sigma=1.0, block_memory=2**26):
+    r"""
+    Equation 12 of [Sarvas_1987]_, the potential at the sensors of unit
+    current dipoles at the sources, with the given orientations, in an
+    infinite homogeneous conductor of conductivity sigma
+
+    .. math::
+        V(r) = \frac{Q \cdot (r - r_0)}{4 \pi \sigma |r - r_0|^3}
+
+    """
+    lead_field = numpy.empty((sensors.shape[0], sources.shape[0]))
+    Q_dot_r_0 = numpy.sum(orientations * sources, axis=1)
+    for block in source_blocks(sensors.shape[0], sources.shape[0], 4, block_memory):
+        #|a|**2, a => vectors from the sources to the sensors
+        na2 = numpy.zeros((sensors.shape[0], block.stop - block.start))
+        for k in range(3):
+            na2 += (sensors[:, k, numpy.newaxis] - sources[numpy.newaxis, block, k])**2
+        Q_dot_a = numpy.dot(sensors, orientations[block].T) - Q_dot_r_0[block]
+        lead_field[:, block] = Q_dot_a / (na2 * numpy.sqrt(na2))
+    lead_field /= 4.0 * numpy.pi * sigma
+    return lead_field
+
+
+def spherical_meg(sensors, sources, orientations, block_memory=2**26):
+    """
+    Equation 25 of [Sarvas_1987]_, the magnitude of the magnetic field at the
+    sensors of unit current dipoles at the sources, with the given
+    orientations, in a spherically symmetric conductor. The vectors are held
+    as their three components, each a (sensors, sources) array.
+
+    """
+    #the magnetic constant = 1.25663706 × 10-6 m kg s-2 A-2  (H/m)
+    mu_0 = 1.25663706 #mH/mm #TODO: Think units are wrong, should still be × 10-6
+
+    #r => sensor positions
+    #r_0 => source positions
+    #a => vector from sources_to_sensor
+    #Q => source unit vectors
+    lead_field = numpy.empty((sensors.shape[0], sources.shape[0]))
+    r = [sensors[:, k, numpy.newaxis] for k in range(3)]
+    nr = numpy.sqrt(numpy.sum(sensors**2, axis=1))[:, numpy.newaxis]
+    for block in source_blocks(sensors.shape[0], sources.shape[0], 24, block_memory):
+        r_0 = [sources[numpy.newaxis, block, k] for k in range(3)]
+        Q = [orientations[numpy.newaxis, block, k] for k in range(3)]
+        Q_x_r_0 = cross(Q, r_0)
+        a = [r[k] - r_0[k] for k in range(3)]
+        na = numpy.sqrt(a[0]**2 + a[1]**2 + a[2]**2)
+
+        r_dot_r_0 = numpy.dot(sensors, sources[block].T)
+        F = [a[k] * (nr * a[k] + nr**2 - r_dot_r_0) for k in range(3)]
+        adotr = (a[0] * r[0] + a[1] * r[1] + a[2] * r[2]) / na
+        delF_r = na**2 / nr + adotr + 2.0 * na + 2.0 * nr
+        delF = [delF_r * r[k] - (a[k] + 2.0 * nr + adotr * r_0[k]) for k in range(3)]
+
+        Q_x_r_0_dot_r_delF = sum(Q_x_r_0[k] * (r[k] * delF[k]) for k in range(3))
+        FQ_x_r_0 = cross([F[k] * Q[k] for k in range(3)], r_0)
+        B_r2 = sum(((mu_0 / (4.0 * numpy.pi * F[k]**2)) * 
+                    (FQ_x_r_0[k] - Q_x_r_0_dot_r_delF))**2 for k in range(3))
+        lead_field[:, block] = numpy.sqrt(B_r2)
+    return lead_field
+
+
+def cross(u, v):
+    """The cross product of vectors given as lists of their components."""
+    return [u[1] * v[2] - u[2] * v[1],
+            u[2] * v[0] - u[0] * v[2],
+            u[0] * v[1] - u[1] * v[0]]
+
+
+def lead_field(forward_solution, sensors, sources, orientations, **parameters):
+    """
+    The lead field given by the forward_solution, one of the functions above,
+    for the sensors, sources and orientations, read from the cache if it's
+    been computed before. The parameters are passed on to forward_solution.
+    The returned array is read-only.
+    """
+    sensors = numpy.ascontiguousarray(sensors, dtype=numpy.float64)
+    sources = numpy.ascontiguousarray(sources, dtype=numpy.float64)
+    orientations = numpy.ascontiguousarray(orientations, dtype=numpy.float64)
+    name = "lead-field-" + surfaces_scientific.cache_key(forward_solution.__name__,
+                                                         sensors, sources, orientations,
+                                                         sorted(parameters.items()))
+    projection = surfaces_scientific.load_cached_array(name)
+    if projection is None:
+        LOG.info("Computing the %s lead field of %d sensors and %d sources" %
+                 (forward_solution.__name__, sensors.shape[0], sources.shape[0]))
+        projection = forward_solution(sensors, sources, orientations, **parameters)
+        projection.flags.writeable = False
+        surfaces_scientific.cache_array(name, projection)
+    return projection
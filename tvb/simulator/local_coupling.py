@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+
+"""
+The local coupling operator of surface simulations.
+
+A surface's local connectivity, scaled by its coupling strength, is applied to
+the state of the vertices by each call of a Model's dfun, as
+``local_coupling * V``. The LocalCouplingOperator takes the place of the scipy
+sparse matrix there, so every Model gets it without changes of its own. It
+keeps the matrix as a CSR with int32 indices, optionally in single precision,
+split into blocks of rows with about equal numbers of non-zeros, which a pool
+of threads multiplies into the output arrays, scipy's sparse kernels releasing
+the GIL while they run. The coupling strength scales the rows of the
+products rather than the matrix, whose arrays are used as they are when they
+already have the right types, eg, when memory-mapped from the files a 
+parameter sweep shares between its processes.
+
+"""
+
+# Standard python libraries
+import os
+import sys
+import multiprocessing
+import multiprocessing.pool
+
+# Third party python libraries
+import numpy
+import scipy.sparse as sparse
+try:
+    from scipy.sparse import _sparsetools as sparsetools
+except ImportError:
+    from scipy.sparse import sparsetools
+
+#The Virtual Brain
+from tvb.simulator.common import get_logger
+LOG = get_logger(__name__)
+
+
+#Thread pools shared by the operators of a process, by number of threads, and
+#the process they belong to.
+_thread_pools = {}
+_thread_pools_pid = None
+
+
+def _thread_pool(threads):
+    """
+    Return the shared pool with the given number of threads. The pools of a 
+    parent process are dropped by a forked child, eg a worker of a parameter
+    sweep, which inherits them without their threads, and which starts pools
+    of its own.
+    """
+    global _thread_pools_pid
+    if _thread_pools_pid != os.getpid():
+        _thread_pools.clear()
+        _thread_pools_pid = os.getpid()
+    if threads not in _thread_pools:
+        _thread_pools[threads] = multiprocessing.pool.ThreadPool(threads)
+    return _thread_pools[threads]
+
+
+
+class LocalCouplingOperator(object):
+    """
+    A sparse (nodes x nodes) matrix, applied to arrays with nodes along their
+    first axis by ``operator * array``, or by ``operator.dot(array, out)``.
+
+    The results of ``operator * array`` are new arrays, unless the operator is
+    given a number of ``buffers`` to keep and reuse, one for each of the last
+    that many products of each shape. A product is then written into a buffer
+    only once its previous result is no longer referenced, a RuntimeError 
+    being raised rather than overwriting a result still in use.
+
+    """
+
+    def __init__(self, matrix, scale=1.0, dtype=numpy.float64, threads=0, buffers=0):
+        """
+        ``matrix``: the scipy sparse matrix to apply.
+        ``scale``: a factor for all the rows of the products, or an array of
+            one for each row, as the matrix had been multiplied by it.
+        ``dtype``: of the matrix's values and of the products, numpy.float32
+            halving the memory traffic of the products at the cost of
+            precision.
+        ``threads``: the number of threads applying blocks of rows, 0 for one
+            for each CPU.
+        ``buffers``: the number of products of each shape kept in turn, 0 for
+            a new array for each product.
+
+        """
+        #Copies are only made where the matrix isn't already a canonical CSR
+        #of the given dtype.
+        matrix = sparse.csr_matrix(matrix)
+        if matrix.dtype != dtype:
+            matrix = matrix.astype(dtype)
+        if not matrix.has_canonical_format:
+            matrix = matrix.copy()
+            matrix.sum_duplicates()
+        self.shape = matrix.shape
+        self.dtype = numpy.dtype(dtype)
+        self.indptr = matrix.indptr.astype(numpy.int32, copy=False)
+        self.indices = matrix.indices.astype(numpy.int32, copy=False)
+        self.data = matrix.data
+        self.scale = numpy.asarray(scale, dtype=self.dtype)
+        if self.scale.ndim:
+            self.scale = self.scale.reshape((-1, 1))
+        self.nnz = self.data.shape[0]
+        self.threads = threads or multiprocessing.cpu_count()
+
+        #Blocks of rows with about equal numbers of non-zeros, a few for each
+        #thread to even out the load.
+        number_of_blocks = min(self.shape[0], 4 * self.threads if self.threads > 1 else 1)
+        bounds = numpy.searchsorted(self.indptr, numpy.linspace(0, self.nnz, number_of_blocks + 1))
+        bounds[0], bounds[-1] = 0, self.shape[0]
+        bounds = numpy.unique(bounds)
+        self.blocks = zip(bounds[:-1], bounds[1:])
+
+        self.buffers = buffers
+        self._outputs = {}
+        LOG.debug("%s: %d non-zeros, %s, in %d blocks of rows for %d threads" %
+                  (str(self), self.nnz, self.dtype.name, len(self.blocks), self.threads))
+
+
+    def __str__(self):
+        return "%s(%d x %d)" % (self.__class__.__name__, self.shape[0], self.shape[1])
+
+
+    def _apply_block(self, block, x, out):
+        """Multiply the rows in block into the same rows of out."""
+        start, stop = block
+        indptr = self.indptr[start:stop + 1]
+        indptr = indptr - indptr[0] if indptr[0] else indptr
+        nnz = slice(self.indptr[start], self.indptr[stop])
+        out[start:stop] = 0.0
+        if x.shape[1] == 1:
+            sparsetools.csr_matvec(stop - start, self.shape[1], indptr,
+                                   self.indices[nnz], self.data[nnz],
+                                   x.ravel(), out[start:stop].ravel())
+        else:
+            sparsetools.csr_matvecs(stop - start, self.shape[1], x.shape[1], indptr,
+                                    self.indices[nnz], self.data[nnz],
+                                    x.ravel(), out[start:stop].ravel())
+        out[start:stop] *= self.scale[start:stop] if self.scale.ndim else self.scale
+
+
+    def dot(self, x, out=None):
+        """
+        The product of the matrix with x, an array with nodes along its first
+        axis, into out, if given, which must be a C contiguous array of the
+        operator's dtype.
+        """
+        shape = (self.shape[0],) + x.shape[1:]
+        x = numpy.ascontiguousarray(x, dtype=self.dtype).reshape((x.shape[0], -1))
+        if out is None:
+            out = numpy.empty(shape, dtype=self.dtype)
+        result = out.reshape((shape[0], -1))
+        if len(self.blocks) == 1:
+            self._apply_block(self.blocks[0], x, result)
+        else:
+            _thread_pool(self.threads).map(lambda block: self._apply_block(block, x, result),
+                                           self.blocks)
+        return out
+
+
+    def __mul__(self, x):
+        """
+        The product of the matrix with the array x, as a new array or, if the
+        operator keeps buffers, into the next of them for arrays of x's shape.
+        """
+        if not self.buffers:
+            return self.dot(x)
+        outputs, turn = self._outputs.get(x.shape, (None, 0))
+        if outputs is None:
+            outputs = [numpy.empty((self.shape[0],) + x.shape[1:], dtype=self.dtype)
+                       for _ in range(self.buffers)]
+        #Referenced only by the list and getrefcount's argument when free.
+        elif sys.getrefcount(outputs[turn]) > 2:
+            msg = "%s: the product of %d products ago is still in use, more buffers are needed."
+            LOG.error(msg % (str(self), self.buffers))
+            raise RuntimeError(msg % (str(self), self.buffers))
+        self._outputs[x.shape] = (outputs, (turn + 1) % self.buffers)
+        return self.dot(x, outputs[turn])
+
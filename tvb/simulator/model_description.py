@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+
+"""
+Declarative descriptions of the equations of Models.
+
+A ModelDescription names a model's state variables, parameters and coupling
+terms, and gives its auxiliary variables and the derivatives of its state
+variables as expressions of those. From it are generated both
+
+    - the model's dfun, evaluating each derivative in a single numexpr pass,
+      with the auxiliary variables inlined and the model's scalar parameters
+      frozen in as constants, and
+    - the kernel of the model's dfun for the native backend (see
+      tvb.simulator.backend), reading the parameters with the P(i) macro.
+
+so that the two can't drift apart. The expressions are written in the common
+subset of Python, numexpr and C: numbers, names, the arithmetic operators,
+``**``, comparisons, and the functions in FUNCTIONS, including
+``where(condition, a, b)``.
+
+"""
+
+# Standard python libraries
+import ast
+import operator
+import re
+
+# Third party python libraries
+import numpy
+import numexpr
+
+#The Virtual Brain
+from tvb.simulator.common import get_logger
+LOG = get_logger(__name__)
+
+
+
+#The functions expressions can use, and their names in C.
+FUNCTIONS = {"exp": "exp", "log": "log", "sqrt": "sqrt", "sin": "sin",
+             "cos": "cos", "tan": "tan", "tanh": "tanh", "arctan": "atan",
+             "arcsin": "asin", "arccos": "acos", "abs": "fabs", "where": None}
+
+_OPERATORS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/",
+              ast.Gt: ">", ast.GtE: ">=", ast.Lt: "<", ast.LtE: "<=",
+              ast.Eq: "==", ast.NotEq: "!="}
+
+#The arithmetic of constants, which is done when the expressions are printed.
+_ARITHMETIC = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+               ast.Div: operator.truediv, ast.Pow: operator.pow}
+
+_NUMBER = re.compile(r"^\(?-?[0-9.]+(e[-+]?[0-9]+)?\)?$")
+
+
+
+class ExpressionPrinter(object):
+    """
+    Prints a parsed expression, fully parenthesised, with the names in
+    substitutions replaced by their text. Numbers are printed as floating
+    point literals, so neither numexpr nor C divide them as integers, and the
+    arithmetic of numbers, including those substituted for names, is done
+    rather than printed.
+    """
+
+    def __init__(self, substitutions):
+        self.substitutions = substitutions
+
+
+    def __call__(self, node):
+        if isinstance(node, ast.Expression):
+            return self(node.body)
+        if isinstance(node, ast.Num):
+            return self.number(node.n)
+        if isinstance(node, ast.Name):
+            return self.substitutions.get(node.id, node.id)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            sign = "-" if isinstance(node.op, ast.USub) else "+"
+            operand = self(node.operand)
+            if self.constant(operand) is not None:
+                return self.number(self.constant(operand) * (-1.0 if sign == "-" else 1.0))
+            return "(%s%s)" % (sign, operand)
+        if isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+            left, right = self.constant(self(node.left)), self.constant(self(node.right))
+            if left is not None and right is not None:
+                try:
+                    return self.number(_ARITHMETIC[type(node.op)](left, right))
+                except (ZeroDivisionError, OverflowError, ValueError):
+                    pass
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+            return self.power(node.left, node.right)
+        if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+            return "(%s %s %s)" % (self(node.left), _OPERATORS[type(node.op)], self(node.right))
+        if (isinstance(node, ast.Compare) and len(node.ops) == 1 and
+            type(node.ops[0]) in _OPERATORS):
+            return "(%s %s %s)" % (self(node.left), _OPERATORS[type(node.ops[0])],
+                                   self(node.comparators[0]))
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and
+            node.func.id in FUNCTIONS and not node.keywords):
+            return self.call(node.func.id, [self(arg) for arg in node.args])
+        raise ValueError("Unsupported model expression: %s" % ast.dump(node))
+
+
+    def number(self, value):
+        return "(%r)" % float(value) if value < 0 else "%r" % float(value)
+
+
+    def constant(self, text):
+        """The value of text if it's a printed number, None otherwise."""
+        return float(text.strip("()")) if _NUMBER.match(text) else None
+
+
+    def power(self, base, exponent):
+        return "(%s**%s)" % (self(base), self(exponent))
+
+
+    def call(self, function, arguments):
+        return "%s(%s)" % (function, ", ".join(arguments))
+
+
+
+class CPrinter(ExpressionPrinter):
+    """
+    Prints a parsed expression in C: powers by small integers as products,
+    other powers with pow() and where() as the conditional operator.
+    """
+
+    def power(self, base, exponent):
+        if (isinstance(exponent, ast.Num) and exponent.n in (2, 3) and
+            isinstance(base, ast.Name)):
+            return "(%s)" % "*".join([self(base)] * int(exponent.n))
+        return "pow(%s, %s)" % (self(base), self(exponent))
+
+
+    def call(self, function, arguments):
+        if function == "where":
+            return "(%s ? %s : %s)" % tuple(arguments)
+        return "%s(%s)" % (FUNCTIONS[function], ", ".join(arguments))
+
+
+
+class ModelDescription(object):
+    """
+    The equations of a Model, see the module's docstring.
+
+    ``state_variables``: the names of the state variables, in the order of
+        the state array.
+    ``parameters``: the names of the model's attributes the equations use,
+        its traited parameters and any derived ones.
+    ``derivatives``: the expressions of the derivatives of the state
+        variables, in the same order.
+    ``auxiliaries``: (name, expression) pairs of intermediate variables, each
+        expression able to use the ones before it.
+    ``coupling``: the names of the long range coupling terms, one for each of
+        the model's coupling variables.
+    ``local_coupling``: (name, state variable) pairs, for the local coupling
+        of state variables, ``local_coupling * state_variable``. On the
+        device, which doesn't simulate surfaces, they are 0.
+
+    .. automethod:: ModelDescription.dfun
+    .. automethod:: ModelDescription.kernel
+
+    """
+
+    def __init__(self, state_variables, parameters, derivatives, auxiliaries=(),
+                 coupling=(), local_coupling=()):
+        if len(derivatives) != len(state_variables):
+            msg = "A model description needs one derivative for each of its %d state variables."
+            raise ValueError(msg % len(state_variables))
+        self.state_variables = list(state_variables)
+        self.parameters = list(parameters)
+        self.derivatives = [ast.parse(expression.strip(), mode="eval") for expression in derivatives]
+        self.auxiliaries = [(name, ast.parse(expression.strip(), mode="eval"))
+                            for name, expression in auxiliaries]
+        self.coupling = list(coupling)
+        self.local_coupling = list(local_coupling)
+        self._kernel = None
+
+
+    def dfun(self, model):
+        """
+        A dfun(state_variables, coupling, local_coupling=0.0, out=None) for the
+        model, which must have all the description's parameters, with the ones
+        that are scalars frozen in. The function's ``current(model)`` tells
+        whether the model's parameters are still the ones it was made with.
+        """
+        frozen = dict((name, getattr(model, name)) for name in self.parameters)
+        substitutions = {}
+        arrays = {}
+        for name, value in frozen.items():
+            if value is None:
+                msg = "%s: parameter %s isn't set, the model must be configured."
+                raise ValueError(msg % (model.__class__.__name__, name))
+            if numpy.size(value) == 1:
+                substitutions[name] = ExpressionPrinter({}).number(numpy.ravel(value)[0])
+            else:
+                arrays[name] = value
+        printer = ExpressionPrinter(substitutions)
+        for name, expression in self.auxiliaries:
+            substitutions[name] = printer(expression)
+        expressions = [printer(expression) for expression in self.derivatives]
+        state_variables = list(enumerate(self.state_variables))
+        coupling = list(enumerate(self.coupling))
+        local_coupling = self.local_coupling
+
+        def dfun(state_variables_, coupling_, local_coupling_=0.0, out=None):
+            names = dict(arrays)
+            for i, name in state_variables:
+                names[name] = state_variables_[i]
+            for i, name in coupling:
+                names[name] = coupling_[i]
+            for name, state_variable in local_coupling:
+                names[name] = local_coupling_ * names[state_variable]
+            if out is None:
+                return numpy.array([numexpr.evaluate(expression, local_dict=names)
+                                    for expression in expressions])
+            for i, expression in enumerate(expressions):
+                numexpr.evaluate(expression, local_dict=names, out=out[i])
+            return out
+
+        dfun.expressions = expressions
+        dfun.current = lambda model: all(getattr(model, name) is value
+                                         for name, value in frozen.items())
+        LOG.debug("%s: generated dfun %s" % (model.__class__.__name__, expressions))
+        return dfun
+
+
+    def kernel(self):
+        """The model_dfun code of the native backend's kernels."""
+        if self._kernel is None:
+            printer = CPrinter({})
+            lines = ["", "        // read parameters"]
+            declarations = [(name, "P(%d)" % i) for i, name in enumerate(self.parameters)]
+            declarations += [(None, "// state variables")]
+            declarations += [(name, "X(%d)" % i) for i, name in enumerate(self.state_variables)]
+            declarations += [(None, "// coupling")]
+            declarations += [(name, "I(%d)" % i) for i, name in enumerate(self.coupling)]
+            declarations += [(name, "0.0") for name, _ in self.local_coupling]
+            declarations += [(None, "// aux variables")]
+            declarations += [(name, printer(expression)) for name, expression in self.auxiliaries]
+            last = max(i for i, (name, _) in enumerate(declarations) if name is not None)
+            first = True
+            for i, (name, value) in enumerate(declarations):
+                if name is None:
+                    if i < last:
+                        lines.append("\n        " + value)
+                else:
+                    lines.append("        %s %s = %s%s" % ("float" if first else "    ,", name,
+                                                          value, " ;" if i == last else ""))
+                    first = False
+            lines.append("\n        // derivatives")
+            for i, expression in enumerate(self.derivatives):
+                lines.append("        DX(%d) = %s;" % (i, printer(expression)))
+            self._kernel = "\n".join(lines) + "\n        "
+        return self._kernel
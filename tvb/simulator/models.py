@@ -43,6 +43,7 @@ import tvb.datatypes.lookup_tables as lookup_tables
 import tvb.basic.traits.core as core
 import tvb.basic.traits.types_basic as basic
 import tvb.simulator.noise as noise_module
+from tvb.simulator.model_description import ModelDescription
 
 
 LOG = get_logger(__name__)
@@ -61,6 +62,10 @@ class Model(core.Type):
     .. #us around this...
     .. automethod:: Model.__init__
     .. automethod:: Model.dfun
+    .. automethod:: Model.stack_derivatives
+    .. automethod:: Model.evaluate_description
+    .. automethod:: Model.linear_operator
+    .. automethod:: Model.scalar_parameters
     .. automethod:: Model.update_derived_parameters
 
     """
@@ -78,6 +83,9 @@ class Model(core.Type):
         NOTE: Dispersion is computed based on ``state_variable_range``.""",
         order = 42**42) #NOTE: Hoping this order will always make it last...
 
+    #The ModelDescription of the equations of models whose dfun and device
+    #kernel are generated from one, see tvb.simulator.model_description.
+    description = None
 
     def __init__(self, **kwargs):
         """
@@ -91,12 +99,15 @@ class Model(core.Type):
         #self._state_variables = None
         self._nvar = None
         self.number_of_modes = 1 #NOTE: Models without modes can ignore this.
+        self._description_dfun = None
 
 
     def configure(self):
         """  """
         super(Model, self).configure()
         self.update_derived_parameters() 
+        if self.description is not None:
+            self._description_dfun = self.description.dfun(self)
 
 
     def __repr__(self):
@@ -184,16 +195,74 @@ class Model(core.Type):
         return initial_conditions
 
 
-    def dfun(self, state_variables, coupling, local_coupling=0.0):
+    def dfun(self, state_variables, coupling, local_coupling=0.0, out=None):
         """
         Defines the dynamic equations. That is, the derivative of the 
         state-variables given their current state ``state_variables``, the past 
         state from other regions of the brain currently arriving ``coupling``, 
         and the current state of the "local" neighbourhood ``local_coupling``.
 
+        When an array ``out``, of the shape of ``state_variables``, is given
+        the derivative is written into it and it is returned, otherwise a new
+        array is returned. The Integrators pass their own preallocated arrays
+        to models accepting ``out``, and copy the result of those that don't.
+
         """
         pass
 
+
+    def stack_derivatives(self, out, *derivatives):
+        """
+        The derivatives of the state variables, in order, as a single array:
+        written into ``out`` if it's given, a new array otherwise.
+        """
+        if out is None:
+            return numpy.array(derivatives)
+        for k, derivative in enumerate(derivatives):
+            out[k] = derivative
+        return out
+
+
+    def evaluate_description(self, state_variables, coupling, local_coupling=0.0, out=None):
+        """
+        The dfun generated from the model's description, with the parameters
+        frozen in when the model was configured. It's generated again when
+        a parameter has been set since, but not when one has been modified
+        in place.
+        """
+        if self._description_dfun is None or not self._description_dfun.current(self):
+            self._description_dfun = self.description.dfun(self)
+        return self._description_dfun(state_variables, coupling, local_coupling, out)
+
+
+    def linear_operator(self):
+        """
+        The linear part of dfun, for the semi-linear integrators, which take
+        it exactly or implicitly and the rest of dfun, its nonlinear and
+        coupling terms, explicitly (see integrators.IntegratorSemiLinear).
+        It's the matrix acting on the state of a node, of shape (nvar *
+        number_of_modes, nvar * number_of_modes), the state being ordered by
+        state variable then mode. Models whose linear part is stiff opt in by
+        overriding this; None means the model doesn't expose it.
+        """
+        return None
+
+
+    def scalar_parameters(self, *names):
+        """
+        The values of the named parameters, which must be single values, as
+        floats. For the parts of models, such as linear_operator, that don't
+        support parameters varying over the nodes.
+        """
+        values = []
+        for name in names:
+            value = numpy.asarray(getattr(self, name))
+            if value.size != 1:
+                msg = "%s: parameter %s must be a single value, not of shape %s."
+                raise ValueError(msg % (str(self), name, str(value.shape)))
+            values.append(float(value.ravel()[0]))
+        return values
+
     def stationary_trajectory(self, 
             coupling=numpy.array([[0.0]]), 
             initial_conditions=None,
@@ -261,11 +330,12 @@ class model_device_info(object):
 
     """
 
-    def __init__(self, pars=[], kernel=""):
+    def __init__(self, pars=[], kernel="", description=None):
         """
         Make a model_device_info instance with a list of trait attributes
         corresponding to the mass model parameters, and a kernel which is
         a string of code required to implement the model's dfun on device.
+        Alternatively, both are taken from the ModelDescription description.
 
         The order of the parameters MUST identify the order of the parameters
         in the array returned by the mmpr property and thus the order in
@@ -280,6 +350,9 @@ class model_device_info(object):
 
         self._pars = pars
         self._kernel = kernel
+        self._description = description
+        if description is not None:
+            self._pars = description.parameters
 
     @property
     def n_mmpr(self):
@@ -344,6 +417,8 @@ class model_device_info(object):
 
     @property
     def kernel(self):
+        if self._description is not None:
+            return self._description.kernel()
         return self._kernel
 
     def __get__(self, inst, ownr):
@@ -547,7 +622,23 @@ class WilsonCowan(Model):
         LOG.debug('%s: inited.' % repr(self))
 
 
-    def dfun(self, state_variables, coupling, local_coupling=0.0):
+    description = ModelDescription(
+        state_variables = ["E", "I"],
+        parameters = ["c_1", "c_2", "c_3", "c_4", "tau_e", "tau_i", "a_e",
+                      "theta_e", "a_i", "theta_i", "r_e", "r_i", "k_e", "k_i"],
+        coupling = ["c_0"],
+        local_coupling = [("lc_E", "E")],
+        auxiliaries = [
+            ("x_e", "c_1 * E - c_2 * I + c_0 + lc_E"),
+            ("x_i", "c_3 * E - c_4 * I"),
+            ("s_e", "1.0 / (1.0 + exp(-a_e * (x_e - theta_e)))"),
+            ("s_i", "1.0 / (1.0 + exp(-a_i * (x_i - theta_i)))")],
+        derivatives = [
+            "(-E + (k_e - r_e * E) * s_e) / tau_e",
+            "(-I + (k_i - r_i * I) * s_i) / tau_i"])
+
+
+    def dfun(self, state_variables, coupling, local_coupling=0.0, out=None):
         r"""
 
         .. math::
@@ -555,66 +646,9 @@ class WilsonCowan(Model):
             \phi(x) &= \frac{c}{1-exp(-a (x-b))}
 
         """
+        return self.evaluate_description(state_variables, coupling, local_coupling, out)
 
-        E = state_variables[0, :]
-        I = state_variables[1, :]
-
-        c_0 = coupling[0, :]
-
-        x_e = self.c_1 * E - self.c_2 * I + c_0 + local_coupling * E
-        x_i = self.c_3 * E - self.c_4 * I
-
-        s_e = 1.0 / (1.0 + numpy.exp(-self.a_e * (x_e - self.theta_e)))
-        s_i = 1.0 / (1.0 + numpy.exp(-self.a_i * (x_i - self.theta_i)))
-
-        dE = (-E + (self.k_e - self.r_e * E) * s_e) / self.tau_e
-        dI = (-I + (self.k_i - self.r_i * I) * s_i) / self.tau_i
-
-        derivative = numpy.array([dE, dI])
-
-        return derivative
-
-    # info for device_data
-    device_info = model_device_info(
-
-        pars=[ c_1, c_2, c_3, c_4, tau_e, tau_i, a_e, theta_e, 
-               a_i, theta_i, r_e, r_i, k_e, k_i ],
-
-        kernel="""
-        // read parameters
-        float c_1     = P(0)
-            , c_2     = P(1)
-            , c_3     = P(2)
-            , c_4     = P(3)
-            , tau_e   = P(4)
-            , tau_i   = P(5)
-            , a_e     = P(6)
-            , theta_e = P(7)
-            , a_i     = P(8)
-            , theta_i = P(9)
-            , r_e     = P(10)
-            , r_i     = P(11)
-            , k_e     = P(12)
-            , k_i     = P(13)
-
-        // state variables
-            , e = X(0)
-            , i = X(1)
-
-        // aux variables
-            , c_0 = I(0)
-
-            , x_e = c_1 * e - c_2 * i + c_0
-            , x_i = c_3 * e - c_4 * i
-
-            , s_e = 1.0 / (1.0 + exp(-a_e * (x_e - theta_e)))
-            , s_i = 1.0 / (1.0 + exp(-a_i * (x_i - theta_i)));
-
-        // set derivatives
-        DX(0) = (-e + (k_e - r_e * e) * s_e) / tau_e;
-        DX(1) = (-i + (k_i - r_i * i) * s_i) / tau_e;
-        """
-        )
+    device_info = model_device_info(description=description)
 
 class ReducedSetFitzHughNagumo(Model):
     r"""
@@ -828,7 +862,7 @@ class ReducedSetFitzHughNagumo(Model):
         self.update_derived_parameters()
 
 
-    def dfun(self, state_variables, coupling, local_coupling=0.0):
+    def dfun(self, state_variables, coupling, local_coupling=0.0, out=None):
         r"""
 
         .. math::
@@ -871,9 +905,28 @@ class ReducedSetFitzHughNagumo(Model):
 
         dbeta = (alpha - self.b * beta + self.n_i) / self.tau
 
-        derivative = numpy.array([dxi, deta, dalpha, dbeta])
-        #import pdb; pdb.set_trace()
-        return derivative
+        return self.stack_derivatives(out, dxi, deta, dalpha, dbeta)
+
+
+    def linear_operator(self):
+        """
+        The linear terms of dfun, including those of the coupling between
+        the modes.
+        """
+        K11, K12, K21, tau, b = self.scalar_parameters("K11", "K12", "K21", "tau", "b")
+        I = numpy.eye(self.number_of_modes)
+        L = numpy.zeros((4, self.number_of_modes, 4, self.number_of_modes))
+        L[0, :, 0] = tau * I + K11 * (self.Aik.T - I) + K12 * I
+        L[0, :, 1] = -tau * I
+        L[0, :, 2] = -K12 * self.Bik.T
+        L[1, :, 0] = I / tau
+        L[1, :, 1] = -b / tau * I
+        L[2, :, 0] = K21 * self.Cik.T
+        L[2, :, 2] = tau * I - K21 * I
+        L[2, :, 3] = -tau * I
+        L[3, :, 2] = I / tau
+        L[3, :, 3] = -b / tau * I
+        return L.reshape((4 * self.number_of_modes, 4 * self.number_of_modes))
 
 
     def update_derived_parameters(self):
@@ -1280,7 +1333,7 @@ class ReducedSetHindmarshRose(Model):
         self.update_derived_parameters()
 
 
-    def dfun(self, state_variables, coupling, local_coupling=0.0):
+    def dfun(self, state_variables, coupling, local_coupling=0.0, out=None):
         r"""
         The dynamic equations were taken from [SJ_2008]_, ...
 
@@ -1327,10 +1380,32 @@ class ReducedSetHindmarshRose(Model):
 
         dgamma = self.r * self.s * alpha - self.r * gamma - self.n_i
 
-        derivative = numpy.array([dxi, deta, dtau, dalpha, dbeta, dgamma])
+        return self.stack_derivatives(out, dxi, deta, dtau, dalpha, dbeta, dgamma)
 
 
-        return derivative
+    def linear_operator(self):
+        """
+        The linear terms of dfun, including those of the coupling between
+        the modes.
+        """
+        K11, K12, K21, r, s = self.scalar_parameters("K11", "K12", "K21", "r", "s")
+        I = numpy.eye(self.number_of_modes)
+        L = numpy.zeros((6, self.number_of_modes, 6, self.number_of_modes))
+        L[0, :, 0] = K11 * (self.A_ik.T - I) + K12 * I
+        L[0, :, 1] = I
+        L[0, :, 2] = -I
+        L[0, :, 3] = -K12 * self.B_ik.T
+        L[1, :, 1] = -I
+        L[2, :, 0] = r * s * I
+        L[2, :, 2] = -r * I
+        L[3, :, 0] = K21 * self.C_ik.T
+        L[3, :, 3] = -K21 * I
+        L[3, :, 4] = I
+        L[3, :, 5] = -I
+        L[4, :, 4] = -I
+        L[5, :, 3] = r * s * I
+        L[5, :, 5] = -r * I
+        return L.reshape((6 * self.number_of_modes, 6 * self.number_of_modes))
 
 
     def update_derived_parameters(self):
@@ -1739,7 +1814,27 @@ class JansenRit(Model):
         LOG.debug('%s: inited.' % repr(self))
 
 
-    def dfun(self, state_variables, coupling, local_coupling=0.0):
+    #NOTE: Where the exp()s overflow, to inf, the sigmoids are 0, which neither
+    #      numexpr nor C warn about, so unlike numpy they don't need guarding.
+    description = ModelDescription(
+        state_variables = ["y0", "y1", "y2", "y3", "y4", "y5"],
+        parameters = ["A", "B", "a", "b", "v0", "nu_max", "r", "J", "a_1", "a_2",
+                      "a_3", "a_4", "mu"],
+        coupling = ["c_0"],
+        auxiliaries = [
+            ("sigm_y1_y2", "2.0 * nu_max / (1.0 + exp(r * (v0 - (y1 - y2))))"),
+            ("sigm_y0_1", "2.0 * nu_max / (1.0 + exp(r * (v0 - (a_1 * J * y0))))"),
+            ("sigm_y0_3", "2.0 * nu_max / (1.0 + exp(r * (v0 - (a_3 * J * y0))))")],
+        derivatives = [
+            "y3",
+            "y4",
+            "y5",
+            "A * a * sigm_y1_y2 - 2.0 * a * y3 - a**2 * y0",
+            "A * a * (mu + a_2 * J * sigm_y0_1 + c_0) - 2.0 * a * y4 - a**2 * y1",
+            "B * b * (a_4 * J * sigm_y0_3) - 2.0 * b * y5 - b**2 * y2"])
+
+
+    def dfun(self, state_variables, coupling, local_coupling=0.0, out=None):
         r"""
         The dynamic equations were taken from [JR_1995]_
 
@@ -1771,92 +1866,24 @@ class JansenRit(Model):
 
 
         """
-        #NOTE: We could speed up this model by making the number below smaller,
-        #      because the exp() dominate runtime, though we'd need to validate
-        #      the trade-off in numerical accuracy...
-        magic_exp_number = 709
-
-        y0 = state_variables[0, :]
-        y1 = state_variables[1, :]
-        y2 = state_variables[2, :]
-        y3 = state_variables[3, :]
-        y4 = state_variables[4, :]
-        y5 = state_variables[5, :]
-
-        c_0 = coupling[0, :]
-
-        #p_min = self.p_min
-        #p_max = self.p_max
-        #p = p_min + (p_max - p_min) * numpy.random.uniform()
-
-        #NOTE: We were getting numerical overflow in the three exp()s below...
-        temp = self.r * (self.v0 - (y1 - y2))
-        sigm_y1_y2 = numpy.where(temp > magic_exp_number, 0.0, 2.0 * self.nu_max / (1.0 + numpy.exp(temp)))
+        return self.evaluate_description(state_variables, coupling, local_coupling, out)
 
-        temp = self.r * (self.v0 - (self.a_1 * self.J * y0))
-        sigm_y0_1  = numpy.where(temp > magic_exp_number, 0.0, 2.0 * self.nu_max / (1.0 + numpy.exp(temp)))
 
-        temp = self.r * (self.v0 - (self.a_3 * self.J * y0))
-        sigm_y0_3 = numpy.where(temp > magic_exp_number, 0.0, 2.0 * self.nu_max / (1.0 + numpy.exp(temp)))
-
-        dy0 = y3
-        dy3 = self.A * self.a * sigm_y1_y2 - 2.0 * self.a * y3 - self.a**2 * y0
-        dy1 = y4
-        dy4 = self.A * self.a * (self.mu + self.a_2 * self.J * sigm_y0_1 + c_0) - 2.0 * self.a * y4 - self.a**2 * y1
-        dy2 = y5
-        dy5 = self.B * self.b * (self.a_4 * self.J * sigm_y0_3) - 2.0 * self.b * y5 - self.b**2 * y2
-
-        derivative = numpy.array([dy0, dy1, dy2, dy3, dy4, dy5])
-
-        return derivative
-
-    device_info = model_device_info(
-
-        pars = [ A, B, a, b, v0, nu_max, r, J, a_1, a_2, a_3, a_4, 
-                 p_min, p_max, mu],
-
-        kernel="""
-        // read parameters
-        float A      = P(0)
-            , B      = P(1)
-            , a      = P(2)
-            , b      = P(3)
-            , v0     = P(4)
-            , nu_max = P(5)
-            , r      = P(6)
-            , J      = P(7)
-            , a_1    = P(8)
-            , a_2    = P(9)
-            , a_3    = P(10)
-            , a_4    = P(11)
-            , p_min  = P(12)
-            , p_max  = P(13)
-            , mu     = P(14)
-
-        // state variables
-            , y0 = X(0)
-            , y1 = X(1)
-            , y2 = X(2)
-            , y3 = X(3)
-            , y4 = X(4)
-            , y5 = X(5)
-            , y6 = X(6)
-
-        // aux variables
-            , c_0 = I(0)
-            , sigm_y1_y2 = 2.0 * nu_max / (1.0 + exp( r * (v0 - (y1 - y2)) ))
-            , sigm_y0_1  = 2.0 * nu_max / (1.0 + exp( r * (v0 - (a_1 * J * y0))))
-            , sigm_y0_3  = 2.0 * nu_max / (1.0 + exp( r * (v0 - (a_3 * J * y0))));
-
-        // derivatives
-        DX(0) = y3;
-        DX(1) = y4;
-        DX(2) = y5;
-        DX(3) = A * a * sigm_y1_y2 - 2.0 * a * y3 - a*a*y0;
-        DX(4) = A * a * (mu + a_2 * J * sigm_y0_1 + c_0) - 2.0 * a * y4 - a*a*y1;
-        DX(5) = B * b * (a_4 + J * sigm_y0_3) - 2.0 * b * y5 - b*b*y2;
+    def linear_operator(self):
         """
-    )
+        The linear terms of dfun, those of the second order synaptic kernels
+        of the three populations, whose decay sets the step of the explicit
+        schemes.
+        """
+        a, b = self.scalar_parameters("a", "b")
+        L = numpy.zeros((6, 6))
+        L[0, 3] = L[1, 4] = L[2, 5] = 1.0
+        L[3, 0], L[3, 3] = -a**2, -2.0 * a
+        L[4, 1], L[4, 4] = -a**2, -2.0 * a
+        L[5, 2], L[5, 5] = -b**2, -2.0 * b
+        return L
+
+    device_info = model_device_info(description=description)
 
 
 class Generic2dOscillator(Model):
@@ -2105,8 +2132,17 @@ class Generic2dOscillator(Model):
         LOG.debug("%s: inited." % repr(self))
 
 
-    def dfun(self, state_variables, coupling, local_coupling=0.0,
-             ev=numexpr.evaluate):
+    description = ModelDescription(
+        state_variables = ["V", "W"],
+        parameters = ["tau", "I", "a", "b", "c", "d", "e", "f", "beta", "alpha"],
+        coupling = ["c_0"],
+        local_coupling = [("lc_0", "V")],
+        derivatives = [
+            "d * tau * (alpha * W - f * V**3 + e * V**2 + I + c_0 + lc_0)",
+            "d * (a + b * V + c * V**2 - beta * W) / tau"])
+
+
+    def dfun(self, state_variables, coupling, local_coupling=0.0, out=None):
         r"""
         The two state variables :math:`V` and :math:`W` are typically considered 
         to represent a function of the neuron's membrane potential, such as the 
@@ -2124,66 +2160,9 @@ class Generic2dOscillator(Model):
         long-range connectivity and stimulation.
 
         """
+        return self.evaluate_description(state_variables, coupling, local_coupling, out)
 
-        V = state_variables[0, :]
-        W = state_variables[1, :]
-
-        #[State_variables, nodes]
-        c_0 = coupling[0, :]
-        
-        tau = self.tau
-        I = self.I
-        a = self.a
-        b = self.b
-        c = self.c
-        d = self.d
-        e = self.e
-        f = self.f
-        beta  = self.beta
-        alpha = self.alpha
-
-        lc_0 = local_coupling*V
-
-        
-        #if not hasattr(self, 'derivative'):
-        #    self.derivative = numpy.empty((2,)+V.shape)
-        
-        ## numexpr       
-        dV = ev('d * tau * (alpha * W - f * V**3 + e * V**2 + I + c_0 + lc_0)')
-        dW = ev('d * (a + b * V + c * V**2 - beta * W) / tau')
-        
-        ## regular ndarray operation
-        ##dV = tau * (W - 0.5* V**3.0 + 3.0 * V**2 + I + c_0 + lc_0)
-        ##dW = d * (a + b * V + c * V**2 - W) / tau
-
-        self.derivative = numpy.array([dV, dW])
-        
-        return self.derivative
-
-    device_info = model_device_info(
-        pars = [tau, a, b, c, d, I],
-        kernel="""
-
-        // read parameters
-        float tau  = P(0)
-            , a    = P(1)
-            , b    = P(2)
-            , c    = P(3)
-            , d    = P(4)
-            , I    = P(5)
-
-        // state variables
-            , v    = X(0)
-            , w    = X(1)
-
-        // aux variables
-            , c_0  = I(0)   ;
-
-        // derivatives
-        DX(0) = d * (tau * (w - v*v*v + 3.0*v*v + I + c_0));
-        DX(1) = d * ((a + b*v + c*v*v - w) / tau);
-        """
-        )
+    device_info = model_device_info(description=description)
 
 
 class BrunelWang(Model):
@@ -2628,7 +2607,7 @@ class BrunelWang(Model):
         self.dfun = dikt[fnname]
 
 
-    def dfun(self, state_variables, coupling, local_coupling=0.0):
+    def dfun(self, state_variables, coupling, local_coupling=0.0, out=None):
         r"""
         .. math::           
              \tau_e*\dot{\nu_e}(t) &= -\nu_e(t) + \phi_e \\
@@ -2764,8 +2743,7 @@ class BrunelWang(Model):
         dA = dE / vtau_e
 
 
-        derivative = numpy.array([dA, dI, dE])
-        return derivative
+        return self.stack_derivatives(out, dA, dI, dE)
 
 
     def update_derived_parameters(self):
@@ -2995,7 +2973,22 @@ class WongWang(Model):
         self.update_derived_parameters()
 
 
-    def dfun(self, state_variables, coupling, local_coupling=0.0):
+    description = ModelDescription(
+        state_variables = ["s1", "s2"],
+        parameters = ["a", "b", "d", "gamma", "tau_s", "J11", "J12", "J21", "J22",
+                      "I_o", "I_1", "I_2"],
+        coupling = ["c_0"],
+        auxiliaries = [
+            ("x1", "J11 * s1 - J12 * s2 + I_o + I_1"),
+            ("x2", "J21 * s2 - J22 * s1 + I_o + I_2"),
+            ("H1", "(a * x1 - b) / (1 - exp(-d * (a * x1 - b)))"),
+            ("H2", "(a * x2 - b) / (1 - exp(-d * (a * x2 - b)))")],
+        derivatives = [
+            "- (s1 / tau_s) + (1 - s1) * H1 * gamma",
+            "- (s2 / tau_s) + (1 - s2) * H2 * gamma"])
+
+
+    def dfun(self, state_variables, coupling, local_coupling=0.0, out=None):
         r"""
         These dynamic equations, taken from [WW_2006]_, ...
 
@@ -3010,27 +3003,7 @@ class WongWang(Model):
         where :math:`i=` 1, 2 labels the selective population.
 
         """
-        # add global coupling?
-
-        s1 = state_variables[0, :]
-        s2 = state_variables[1, :]
-
-        c_0 = coupling[0]
-
-        x1 = self.J11 * s1 - self.J12 * s2 + self.I_o + self.I_1
-        x2 = self.J21 * s2 - self.J22 * s1 + self.I_o + self.I_2
-
-        H1 = (self.a * x1 - self.b) / (1 - numpy.exp(-self.d * (self.a * x1 - \
-            self.b)))
-        H2 = (self.a * x2 - self.b) / (1 - numpy.exp(-self.d * (self.a * x2 - \
-            self.b)))
-
-        ds1 = - (s1 / self.tau_s) + (1 - s1) * H1 * self.gamma 
-        ds2 = - (s2 / self.tau_s) + (1 - s2) * H2 * self.gamma 
-
-        derivative = numpy.array([ds1, ds2])
-
-        return derivative
+        return self.evaluate_description(state_variables, coupling, local_coupling, out)
 
 
     def update_derived_parameters(self):
@@ -3041,39 +3014,7 @@ class WongWang(Model):
         self.I_1 = self.J_ext * self.mu_o * (1 + self.c / 100)
         self.I_2 = self.J_ext * self.mu_o * (1 - self.c / 100)
 
-    """
-    device_info = model_device_info(
-        pars = [ a , b , d , gamma , tau_s , tau_ampa , J11 , J22 , J12 , 
-                    J21 , J_ext , I_o , sigma_noise , mu_o , c, 'I_1', 'I_2' ],
-        kernel = " ""
-
-        // read parameters
-        float a = P(0)
-            , b = P(1)
-            , d = P(2)
-            , gamma = P(3)
-            , tau_s = P(4)
-            , tau_ampa = P(5)
-            , J11 = P(6)
-            , J22 = P(7)
-            , J12 = P(8)
-            , J21 = P(9)
-            , J_ext = P(10)
-            , I_o = P(11)
-            , sigma_noise = P(12)
-            , mu_o = P(13)
-            , c = P(14)
-            , I_1 = P(15)
-            , I_2 = P(16)
-
-        // state variables
-            , s1 = X(0)
-            , s2 = X(1)
-
-        // aux variables
-            , 
-      //#  "" ")
-    """
+    device_info = model_device_info(description=description)
 
 class Kuramoto(Model):
     """
@@ -3159,7 +3100,7 @@ class Kuramoto(Model):
         LOG.debug("%s: inited." % repr(self))
 
 
-    def dfun(self, state_variables, coupling, local_coupling=0.0,
+    def dfun(self, state_variables, coupling, local_coupling=0.0, out=None,
              ev=numexpr.evaluate, sin=numpy.sin, pi2=numpy.pi*2):
         r"""
         The :math:`\theta` variable is the phase angle of the oscillation.
@@ -3182,14 +3123,16 @@ class Kuramoto(Model):
         #                   TODO CHECKME FIXME ME ME
         I = coupling[0, :] + sin(local_coupling*theta)
 
-        if not hasattr(self, 'derivative'):
-            self.derivative = numpy.empty((1,)+theta.shape)
+        if out is None:
+            if not hasattr(self, 'derivative'):
+                self.derivative = numpy.empty((1,)+theta.shape)
+            out = self.derivative
 
         # phase update 
-        self.derivative[0] = self.omega + I
+        out[0] = self.omega + I
 
         # all this pi makeh me have great hungary, can has sum NaN?
-        return self.derivative
+        return out
 
     device_info = model_device_info(
         pars = [omega],
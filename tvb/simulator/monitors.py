@@ -56,6 +56,8 @@ LOG = get_logger(__name__)
 import tvb.datatypes.sensors as sensors_module
 import tvb.datatypes.arrays as arrays
 import tvb.datatypes.projections as projections
+import tvb.datatypes.surfaces_scientific as surfaces_scientific
+import tvb.simulator.lead_fields as lead_fields
 
 import tvb.basic.traits.util as util
 import tvb.basic.traits.types_basic as basic
@@ -82,8 +84,8 @@ class Monitor(core.Type):
     .. automethod:: Monitor.record
 
     """
-    ## Temporary hide monitors from the UI, as these 2 are not functional (at least not with the default parameters).
-    _base_classes = ['Monitor', 'BoldMultithreaded', 'BalloonWindkesselAccordingToKJFristonEtAl2003NeuroImage']
+    ## Hide the base classes from the UI, and temporarily BoldMultithreaded, as it is not functional (at least not with the default parameters).
+    _base_classes = ['Monitor', 'AveragingMonitor', 'ProjectionMonitor', 'BoldMultithreaded']
 
     period = basic.Float(
         label = "Sampling period (ms)",
@@ -320,8 +322,8 @@ class SpatialAverage(Monitor):
         """
         Initialise a SpatialAverage monitor from the base Monitor class. Add an
         additional place holder attribute, specific to this Monitor, for the
-        array which averages nodes of the simulation to the new set of
-        time-series specified by the spatial_mask.
+        RegionMappingOperator which averages nodes of the simulation to the new
+        set of time-series specified by the spatial_mask.
 
         """
         LOG.info("%s: initing..." % str(self))
@@ -379,18 +381,10 @@ class SpatialAverage(Monitor):
 
         util.log_debug_array(LOG, self.spatial_mask, "spatial_mask", owner=self.__class__.__name__)
 
-        spatial_sum = numpy.zeros((number_of_nodes, number_of_areas))
-        spatial_sum[numpy.arange(number_of_nodes), self.spatial_mask] = 1
-
-        spatial_sum = spatial_sum.T
-
-        util.log_debug_array(LOG, spatial_sum, "spatial_sum")
-
-        nodes_per_area = numpy.sum(spatial_sum, axis=1)[:, numpy.newaxis]
-        self.spatial_mean = spatial_sum / nodes_per_area
-
-        util.log_debug_array(LOG, self.spatial_mean, "spatial_mean", owner=self.__class__.__name__)
-        #import pdb; pdb.set_trace()
+        if simulator.surface is not None and self.spatial_mask is simulator.surface.region_mapping:
+            self.spatial_mean = simulator.surface.region_mapping_operator
+        else:
+            self.spatial_mean = surfaces_scientific.RegionMappingOperator(self.spatial_mask, number_of_areas)
 
 
     def record(self, step, state):
@@ -403,8 +397,8 @@ class SpatialAverage(Monitor):
         """
         if step % self.istep == 0:
             time = step * self.dt
-            monitored_state = numpy.dot(self.spatial_mean, state[self.voi, :])
-            return [time, monitored_state.transpose((1, 0, 2))]
+            monitored_state = self.spatial_mean.average(state[self.voi, :], axis=1)
+            return [time, monitored_state]
 
 
 
@@ -441,65 +435,235 @@ class GlobalAverage(Monitor):
 
 
 
-class TemporalAverage(Monitor):
+class AveragingMonitor(Monitor):
     """
-    Monitors the averaged value for the model's variable/s of interest over all
-    the nodes at each sampling period. Time steps that are not modulo ``istep``
-    are stored temporarily in the ``_stock`` attribute and then that temporary
-    store is averaged and returned when time step is modulo ``istep``.
+    Base class of the Monitors returning, at each sampling period, something
+    of the temporal average of the state over that period. Rather than storing
+    the state of every integration step of the period, they add what they 
+    need of it into a running sum, the ``_stock``, which is divided by 
+    ``istep`` and reset at the end of the period.
+
+    Subclasses define what is added to the running sum, by reduce(), and what
+    is returned of the average, by sample().
 
     .. #Currently there seems to be a clash betwen traits and autodoc, autodoc
     .. #can't find the methods of the class, the class specific names below get
     .. #us around this...
-    .. automethod:: TemporalAverage.__init__
-    .. automethod:: TemporalAverage.config_for_sim
-    .. automethod:: TemporalAverage.record
+    .. automethod:: AveragingMonitor.config_for_sim
+    .. automethod:: AveragingMonitor.stock_size
+    .. automethod:: AveragingMonitor.reduce
+    .. automethod:: AveragingMonitor.sample
+    .. automethod:: AveragingMonitor.record
 
     """
-    _ui_name = "Temporal average"
-
-
-    def __init__(self, **kwargs):
-        """Initialise a TemporalAverage monitor from the base Monitor class."""
-        LOG.info("%s: initing..." % str(self))
-        super(TemporalAverage, self).__init__(**kwargs)
-        LOG.debug("%s: inited." % repr(self))
 
 
     def config_for_sim(self, simulator):
         """
         Set the monitor's variables of interest based on the model
         specification. Calculates the number of integration steps (isteps)
-        between returns by the record method. And initialises the stock array
+        between returns by the record method. And initialises the running sum
         over which the temporal averaging will be performed.
 
         """
-        super(TemporalAverage, self).config_for_sim(simulator)
+        super(AveragingMonitor, self).config_for_sim(simulator)
 
-        stock_size = (self.istep, self.voi.shape[0],
-                      simulator.number_of_nodes,
-                      simulator.model.number_of_modes)
+        stock_size = self.stock_size(simulator)
         LOG.debug("%s: stock_size is %s" % (str(self), str(stock_size)))
 
         self._stock = numpy.zeros(stock_size)
 
 
+    def stock_size(self, simulator):
+        """The shape of the running sum, that of the variables of interest."""
+        return (self.voi.shape[0], simulator.number_of_nodes,
+                simulator.model.number_of_modes) + simulator.ensemble_shape
+
+
+    def reduce(self, step, state):
+        """What of the state, at the integration step, is added to the running sum."""
+        return state[self.voi, :]
+
+
+    def sample(self, average):
+        """What is returned of the temporal average of the reduced state."""
+        return average
+
+
     def record(self, step, state):
         """
         Records if integration step corresponds to sampling period, Otherwise
-        just update the monitor's stock. When the step corresponds to the sample
-        period, the ``_stock`` is averaged over time for return. 
+        just adds to the monitor's running sum. When the step corresponds to 
+        the sample period, the average is taken from the running sum, which is
+        then reset.
 
         """
-        self._stock[((step % self.istep) - 1), :] = state[self.voi, :]
+        self._stock += self.reduce(step, state)
         if step % self.istep == 0:
-            avg_stock = numpy.mean(self._stock, axis=0)
+            average = self._stock / self.istep
+            self._stock[:] = 0.0
             time = (step - self.istep / 2.0) * self.dt
-            return [time, avg_stock]
+            return [time, self.sample(average)]
+
+
+
+class ProjectionMonitor(AveragingMonitor):
+    """
+    Base class of the Monitors projecting the temporal average of activity at
+    the nodes of the simulation to a set of sensors, through the 
+    ``projection_matrix`` given by subclasses. If there are multiple variables
+    of interest or modes they're assumed to sum sensibly to a single source, 
+    and they're summed before being added to the running sum, which is then
+    just one value per node. That sum is a SourceActivity shared by all the 
+    projection monitors of a simulator with the same variables of interest,
+    so it's computed once per integration step however many there are.
+
+    Lead fields vary smoothly over the sources, so that for a high resolution
+    surface a low rank approximation of the projection_matrix, within a small
+    projection_tolerance, can be applied as two thin matrix products at a 
+    fraction of the cost of the (sensors x vertices) one.
+
+    .. #Currently there seems to be a clash betwen traits and autodoc, autodoc
+    .. #can't find the methods of the class, the class specific names below get
+    .. #us around this...
+    .. automethod:: ProjectionMonitor.config_for_sim
+    .. automethod:: ProjectionMonitor.stock_size
+    .. automethod:: ProjectionMonitor.reduce
+    .. automethod:: ProjectionMonitor.compress_projection
+    .. automethod:: ProjectionMonitor.sample
+
+    """
+
+    projection_tolerance = basic.Float(
+        label = "Projection tolerance",
+        default = 0.0,
+        order = -1, #Hidden, a performance option rather than a scientific one.
+        doc = """The error allowed in a low rank approximation of the 
+        projection matrix, by truncated singular value decomposition, relative
+        to the matrix in the Frobenius norm. The approximation is used if it's
+        cheaper to apply than the matrix. With 0.0 the matrix is applied as it
+        is.""")
+
+
+    def config_for_sim(self, simulator):
+        """
+        As for the AveragingMonitor, and find the simulator's SourceActivity 
+        for the monitor's variables of interest, or add it.
+
+        """
+        super(ProjectionMonitor, self).config_for_sim(simulator)
+
+        reductions = getattr(simulator, "monitor_reductions", {})
+        key = (SourceActivity, tuple(self.voi))
+        if key not in reductions:
+            reductions[key] = SourceActivity(self.voi)
+        self._sources = reductions[key]
+
+        #The projection_matrix, set by subclasses after this, is compressed 
+        #when it's first applied.
+        self._projection = None
+        self.projection_error = 0.0
+
+
+    def stock_size(self, simulator):
+        """A single source at each node."""
+        return (1, simulator.number_of_nodes, 1)
+
 
+    def reduce(self, step, state):
+        """The sum over the variables of interest and modes."""
+        return self._sources(step, state)
 
 
-class EEG(Monitor):
+    def compress_projection(self):
+        """
+        Return the factors (left, right) of the lowest rank approximation of
+        the projection_matrix within the projection_tolerance, or None if it
+        isn't cheaper to apply than the matrix, setting projection_error to
+        its relative error.
+
+        """
+        self.projection_error = 0.0
+        if self.projection_tolerance <= 0.0:
+            return None
+
+        number_of_sensors, number_of_sources = self.projection_matrix.shape
+        U, s, Vt = numpy.linalg.svd(self.projection_matrix, full_matrices=False)
+        #Relative error of the rank k approximation for k = 0, 1, ...
+        residual = numpy.sqrt(numpy.cumsum((s**2)[::-1])[::-1] / numpy.sum(s**2))
+        rank = numpy.sum(residual > self.projection_tolerance)
+        if rank * (number_of_sensors + number_of_sources) >= number_of_sensors * number_of_sources:
+            LOG.info("%s: no approximation of the projection matrix within %g has a rank below %d" %
+                     (str(self), self.projection_tolerance, rank))
+            return None
+
+        self.projection_error = residual[rank] if rank < s.shape[0] else 0.0
+        LOG.info("%s: projection matrix approximated by rank %d of %d, with a relative error of %g" %
+                 (str(self), rank, s.shape[0], self.projection_error))
+        return (U[:, :rank] * s[:rank], numpy.ascontiguousarray(Vt[:rank]))
+
+
+    def sample(self, average):
+        """The projection of the average to the sensors."""
+        if self._projection is None:
+            self._projection = self.compress_projection() or ()
+        if self._projection:
+            left, right = self._projection
+            projection = numpy.dot(left, numpy.dot(right, average[0]))
+        else:
+            projection = numpy.dot(self.projection_matrix, average[0])
+        return projection[numpy.newaxis]
+
+
+
+class SourceActivity(object):
+    """
+    The sum over the given variables of interest and modes of the state, which
+    is the activity of the sources of the projection monitors. It's computed at
+    the first call of an integration step and returned again by the other 
+    calls of that step.
+    """
+
+    def __init__(self, voi):
+        self.voi = voi
+        self._step = None
+        self._activity = None
+
+
+    def __call__(self, step, state):
+        if step != self._step:
+            state = state[self.voi, :]
+            self._activity = state.sum(axis=0).sum(axis=1)[numpy.newaxis, :, numpy.newaxis]
+            self._step = step
+        return self._activity
+
+
+
+class TemporalAverage(AveragingMonitor):
+    """
+    Monitors the averaged value for the model's variable/s of interest over all
+    the nodes at each sampling period. Time steps that are not modulo ``istep``
+    are added to a running sum in the ``_stock`` attribute, which is averaged
+    and returned when time step is modulo ``istep``.
+
+    .. #Currently there seems to be a clash betwen traits and autodoc, autodoc
+    .. #can't find the methods of the class, the class specific names below get
+    .. #us around this...
+    .. automethod:: TemporalAverage.__init__
+
+    """
+    _ui_name = "Temporal average"
+
+
+    def __init__(self, **kwargs):
+        """Initialise a TemporalAverage monitor from the base Monitor class."""
+        LOG.info("%s: initing..." % str(self))
+        super(TemporalAverage, self).__init__(**kwargs)
+        LOG.debug("%s: inited." % repr(self))
+
+
+
+class EEG(ProjectionMonitor):
     """
     Monitors the temporally averaged value for the models variable of interest
     projected to sensors on the head surface at each sampling period.
@@ -511,7 +675,6 @@ class EEG(Monitor):
     .. #us around this...
     .. automethod:: EEG.__init__
     .. automethod:: EEG.config_for_sim
-    .. automethod:: EEG.record
 
     """
     #_ui_name = "EEG (ONLY FOR reg13 SURFACE + o52r00_irp2008 CORTEX-ONLY CONNECTIVITY (74))"
@@ -587,31 +750,6 @@ class EEG(Monitor):
         if (self.projection_matrix is None or simulator.number_of_nodes != self.projection_matrix.shape[1]):
             raise Exception("Incompatible Monitor EEG Projection Matrix with simulation nodes!! Expected length:" 
                             + str(simulator.number_of_nodes))
-        stock_size = (self.istep, self.voi.shape[0],
-                      simulator.number_of_nodes,
-                      simulator.model.number_of_modes)
-        LOG.debug("%s: stock_size is %s" % (str(self), str(stock_size)))
-
-        self._stock = numpy.zeros(stock_size)
-        #import pdb; pdb.set_trace()
-
-
-    def record(self, step, state):
-        """ 
-        Records if integration step corresponds to sampling period. Otherwise
-        just update the monitor's stock.
-
-        """
-        self._stock[((step % self.istep) - 1), :] = state[self.voi, :]
-        if step % self.istep == 0:
-            time = (step - self.istep / 2.0) * self.dt
-            avg_stock = numpy.mean(self._stock, axis=0)
-            #If there are multiple variables or modes we assume they can be 
-            #sensibly summed to form a single source...
-            avg_stock = avg_stock.sum(axis=0)[numpy.newaxis,:,:] #state-variables
-            avg_stock = avg_stock.sum(axis=2)[:,:,numpy.newaxis] #modes
-            eeg = numpy.dot(self.projection_matrix, avg_stock)
-            return [time, eeg.transpose((1, 0, 2))]
 
 
 
@@ -710,7 +848,7 @@ class EEG(Monitor):
 
 #TODO: Once OpenMEEG is operational, dump the sphericals they're a hacky mess...
 
-class SphericalEEG(Monitor):
+class SphericalEEG(ProjectionMonitor):
     """
     Monitors the temporally averaged value for the models variable of interest 
     projected to sensors on the head surface at each sampling period.  
@@ -726,7 +864,6 @@ class SphericalEEG(Monitor):
     .. #us around this...
     .. automethod:: SphericalEEG.__init__
     .. automethod:: SphericalEEG.config_for_sim
-    .. automethod:: SphericalEEG.record
 
     """
     _ui_name = "Spherical EEG"
@@ -769,9 +906,8 @@ class SphericalEEG(Monitor):
 
     def config_for_sim(self, simulator):
         """
-        Equation 12 of [Sarvas_1987]_
-
-        TODO: add equations...
+        Equation 12 of [Sarvas_1987]_, see lead_fields.point_dipole_eeg(), with
+        the sensors moved onto a sphere enclosing the sources.
 
         """
         super(SphericalEEG, self).config_for_sim(simulator)
@@ -802,49 +938,16 @@ class SphericalEEG(Monitor):
         sensor_locations = sensor_locations + centre
 
         #should check all sensors positions are > r_0, and that sensors positions lie on sphere...
-        #import pdb; pdb.set_trace()
-        #a = sensor_locations - r_0
-        #na = numpy.sqrt(numpy.sum(a**2, axis=1))[:, numpy.newaxis]
-        #nr = numpy.sqrt(numpy.sum(sensor_locations**2, axis=1))[:, numpy.newaxis]
-        #Shouldn't have to loop, but I'm tired...
-        V_r = numpy.zeros((sensor_locations.shape[0], r_0.shape[0]))
-        for sensor_k in numpy.arange(sensor_locations.shape[0]):
-            a = sensor_locations[sensor_k, :] - r_0
-            na = numpy.sqrt(numpy.sum(a**2, axis=1))[:, numpy.newaxis]
-            #import pdb; pdb.set_trace()
-            V_r[sensor_k, :] = numpy.sum(Q * (a / na**3), axis=1 ) / (4.0 * numpy.pi * sigma)
-
-        self.projection_matrix = V_r
+        self.projection_matrix = lead_fields.lead_field(lead_fields.point_dipole_eeg,
+                                                        sensor_locations, r_0, Q, sigma=sigma)
 
         util.log_debug_array(LOG, self.projection_matrix, "projection_matrix", 
                              owner=self.__class__.__name__)
 
-        stock_size = (self.istep, self.voi.shape[0],
-                      simulator.number_of_nodes,
-                      simulator.model.number_of_modes)
-        LOG.debug("%s: stock_size is %s" % (str(self), str(stock_size)))
-
-        self._stock = numpy.zeros(stock_size)
-        #import pdb; pdb.set_trace()
-
-
-    def record(self, step, state):
-        """ Records if integration step corresponds to sampling period. """
-        self._stock[((step % self.istep) - 1), :] = state[self.voi, :]
-        if step % self.istep == 0:
-            time = (step - self.istep / 2.0) * self.dt
-            avg_stock = numpy.mean(self._stock, axis=0)
-            #If there are multiple variables or modes we assume they can be 
-            #sensibly summed to form a single source...
-            avg_stock = avg_stock.sum(axis=0)[numpy.newaxis,:,:] #state-variables
-            avg_stock = avg_stock.sum(axis=2)[:,:,numpy.newaxis] #modes
-            eeg = numpy.dot(self.projection_matrix, avg_stock)
-            return [time, eeg.transpose((1, 0, 2))]
-
 
 
 
-class SphericalMEG(Monitor):
+class SphericalMEG(ProjectionMonitor):
     """
     Monitors the temporally averaged value for the models variable of interest 
     projected to sensors on the head surface at each sampling period.
@@ -854,7 +957,6 @@ class SphericalMEG(Monitor):
     .. #us around this...
     .. automethod:: SphericalMEG.__init__
     .. automethod:: SphericalMEG.config_for_sim
-    .. automethod:: SphericalMEG.record
 
     """
     _ui_name = "Spherical MEG"
@@ -891,19 +993,12 @@ class SphericalMEG(Monitor):
 
     def config_for_sim(self, simulator):
         """
-        Equation 25 of [Sarvas_1987]_
-
-        TODO: add equation...
+        Equation 25 of [Sarvas_1987]_, see lead_fields.spherical_meg(), with
+        the sensors moved onto a sphere enclosing the sources.
 
         """
         super(SphericalMEG, self).config_for_sim(simulator)
 
-        #the magnetic constant = 1.25663706 × 10-6 m kg s-2 A-2  (H/m)
-        mu_0 = 1.25663706 #mH/mm #TODO: Think units are wrong, should still be × 10-6
-
-        #parameter to
-        #sigma = 1.0
-
         #r => sensor positions
         #r_0 => source positions
         #a => vector from sources_to_sensor
@@ -927,62 +1022,12 @@ class SphericalMEG(Monitor):
         sensor_locations = sensor_locations + centre
 
         #should check all sensor_locations are > r_0
-        #import pdb; pdb.set_trace()
-        #a = sensor_locations - r_0
-        #na = numpy.sqrt(numpy.sum(a**2, axis=1))[:, numpy.newaxis]
-        #nr = numpy.sqrt(numpy.sum(sensor_locations**2, axis=1))[:, numpy.newaxis]
-        #Shouldn't have to loop, but I'm tired...
-
-        #import pdb; pdb.set_trace()
-
-        B_r = numpy.zeros((sensor_locations.shape[0], r_0.shape[0], 3))
-        for sensor_k in numpy.arange(sensor_locations.shape[0]):
-            a = sensor_locations[sensor_k,:] - r_0
-            na = numpy.sqrt(numpy.sum(a**2, axis=1))[:, numpy.newaxis]
-            rsk = sensor_locations[sensor_k,:][numpy.newaxis, :]
-            nr = numpy.sqrt(numpy.sum(rsk**2, axis=1))[:, numpy.newaxis]
-
-            F = a * (nr * a + nr**2 - numpy.sum(r_0 * rsk, axis=1)[:, numpy.newaxis])
-            adotr = numpy.sum((a / na) * rsk, axis=1)[:, numpy.newaxis]
-            delF = ((na**2 / nr + adotr + 2.0 * na + 2.0 * nr) * rsk - 
-                    (a + 2.0 * nr + adotr * r_0))
-
-            B_r[sensor_k, :] = ((mu_0 / (4.0 * numpy.pi * F**2)) * 
-                (numpy.cross(F * Q, r_0) - numpy.sum(numpy.cross(Q, r_0) *
-                (rsk * delF), axis=1)[:, numpy.newaxis]))
-
-        self.projection_matrix = numpy.sqrt(numpy.sum(B_r**2, axis=2))
+        self.projection_matrix = lead_fields.lead_field(lead_fields.spherical_meg,
+                                                        sensor_locations, r_0, Q)
 
         util.log_debug_array(LOG, self.projection_matrix, "projection_matrix",
                              owner=self.__class__.__name__)
 
-        stock_size = (self.istep, self.voi.shape[0],
-                      simulator.number_of_nodes,
-                      simulator.model.number_of_modes)
-        LOG.debug("%s: stock_size is %s" % (str(self), str(stock_size)))
-
-        self._stock = numpy.zeros(stock_size)
-        #import pdb; pdb.set_trace()
-
-
-    def record(self, step, state):
-        """
-        Records if integration step corresponds to sampling period. The 
-        projection_matrix generated by the config_for_sim method is used to map
-        activity at nodes of the simulation to a set of MEG sensors.
-
-        """
-        self._stock[((step % self.istep) - 1), :] = state[self.voi, :]
-        if step % self.istep == 0:
-            time = (step - self.istep / 2.0) * self.dt
-            avg_stock = numpy.mean(self._stock, axis=0)
-            #If there are multiple variables or modes we assume they can be 
-            #sensibly summed to form a single source...
-            avg_stock = avg_stock.sum(axis=0)[numpy.newaxis,:,:] #state-variables
-            avg_stock = avg_stock.sum(axis=2)[:,:,numpy.newaxis] #modes
-            meg = numpy.dot(self.projection_matrix, avg_stock)
-            return [time, meg.transpose((1, 0, 2))]
-
 
 
 #NOTE: It's probably best to do voxelisation as an offline "analysis" style
@@ -1010,6 +1055,17 @@ class Bold(Monitor):
     .. note:: CONSIDERATIONS: It is  sensible to use this monitor if your 
               simulation length is > 30s (30000ms)
 
+    The variables of interest and modes are summed, at each integration step,
+    into an interim running sum, the average of which is taken every interim
+    period (4ms) as the input to the haemodynamic response function. With the
+    'direct' convolution the inputs of the HRF's length (~15s) are kept in a
+    ring buffer, ``_stock``, which is convolved with the HRF at each sampling
+    period. The HRF being a damped sinusoid, the 'recursive' convolution 
+    instead applies it as the equivalent second order IIR filter, updated at
+    every interim period, ``_stock`` only holding the filter's state. Its 
+    output differs from the direct convolution by the HRF's truncation, a 
+    relative difference ~1e-4.
+
     .. warning:: Not yet tested, debugged, generalised etc...
     .. wisdom and plagiarism
 
@@ -1048,6 +1104,18 @@ class Bold(Monitor):
         default = 0.02,
         order = -1)
 
+    convolution = basic.Enumerate(
+        label = "HRF convolution",
+        options = ["direct", "recursive"],
+        default = ["direct"],
+        select_multiple = False,
+        order = -1, #Hidden, a performance option rather than a scientific one.
+        doc = """How the haemodynamic response function is applied. 'direct'
+        convolves a ring buffer of the last ~15s of the input with the 
+        truncated HRF at each sampling period, 'recursive' applies the 
+        untruncated HRF as a second order recursive filter updated every 
+        interim period, at a cost independent of the HRF's length.""")
+
 
 
     def __init__(self, **kwargs):
@@ -1069,6 +1137,9 @@ class Bold(Monitor):
         self._interim_istep = None
         self._interim_stock = None #I hate bold.
         self._stock_steps = None
+        self._hrf_step = None
+        self._number_of_sources = None
+        self._filter = None
 
         self.hemodynamic_response_function = None
 
@@ -1109,7 +1180,8 @@ class Bold(Monitor):
         #Length of history needed for convolution in ms
         required_history_length = magic_sample_rate * magic_number 
         self._stock_steps = numpy.ceil(required_history_length).astype(int)
-        stock_time = numpy.arange(0.0, magic_number/1000.0, magic_number/1000.0/self._stock_steps) #TODO: neaten
+        self._hrf_step = magic_number / 1000.0 / self._stock_steps #s
+        stock_time = numpy.arange(0.0, magic_number/1000.0, self._hrf_step) #TODO: neaten
 
         # The Heamodynamic response function.
         sqrt_tfts = numpy.sqrt(1.0/self.tau_f - 1.0/(4.0*self.tau_s**2))
@@ -1130,6 +1202,25 @@ class Bold(Monitor):
 
 
 
+    def compute_filter(self):
+        """
+        Compute the coefficients of the second order recursive filter whose
+        impulse response is the haemodynamic response function sampled every
+        interim period, G[n] = r**n sin(n theta) / omega, which follows
+
+        .. math::
+            G[n] = 2 r \cos(\theta) G[n-1] - r^2 G[n-2] + 
+                   \frac{r \sin(\theta)}{\omega} \delta[n-1]
+
+        Returns (a1, a2, b) of y[n] = a1 y[n-1] + a2 y[n-2] + b x[n-1].
+
+        """
+        omega = numpy.sqrt(1.0/self.tau_f - 1.0/(4.0*self.tau_s**2))
+        r = numpy.exp(-0.5 * self._hrf_step / self.tau_s)
+        theta = omega * self._hrf_step
+        return (2.0 * r * numpy.cos(theta), -r**2, r * numpy.sin(theta) / omega)
+
+
     def config_for_sim(self, simulator):
         """
         Set up stock arrays
@@ -1139,26 +1230,39 @@ class Bold(Monitor):
 
         self.compute_hrf() # now we have self.hemodynamic_response_function
 
-        interim_stock_size = (self._interim_istep, self.voi.shape[0],
-                              simulator.number_of_nodes,
-                              simulator.model.number_of_modes) 
+        #The convolution being linear, the variables of interest and modes are
+        #summed ahead of it, as they are in the BOLD signal.
+        self._number_of_sources = self.voi.shape[0] * simulator.model.number_of_modes
+
+        #Set the inital _stock based on the mean of the simulator's initial
+        #history, of which simulator.history only keeps the coupling variables.
+        initial_state = self.reduce(simulator.initial_history_mean)
+        interim_stock_size = initial_state.shape
         LOG.debug("%s: interim_stock_size is %s" % (str(self), str(interim_stock_size)))
 
         self._interim_stock = numpy.zeros(interim_stock_size)
-
-        #Stock configuration
-        stock_size = (self._stock_steps, self.voi.shape[0],
-                      simulator.number_of_nodes,
-                      simulator.model.number_of_modes)
-        LOG.debug("%s: stock_size is %s" % (str(self), str(stock_size)))
-
-        #Set the inital _stock based on simulator.history
-        mean_history = numpy.mean(simulator.history[:, self.voi, :, :], axis=0)
-        self._stock = mean_history[numpy.newaxis,:] * numpy.ones(stock_size)
         #NOTE: BOLD can have a long (~15s) transient that is mainly due to the
         #      initial dynamic transient from simulations that are started with 
         #      imperfect initlial conditions.
-        #import pdb; pdb.set_trace()
+
+        if self.convolution[0] == "recursive":
+            #The filter's state, (y[n-1], y[n-2], x[n-1], x[n-2]), that of its
+            #steady response to the initial state.
+            self._filter = self.compute_filter()
+            a1, a2, b = self._filter
+            gain = b / (1.0 - a1 - a2)
+            stock_size = (4,) + interim_stock_size
+            self._stock = numpy.array([gain, gain, 1.0, 1.0]).reshape((4,) + (1,) * len(interim_stock_size)) * initial_state
+        else:
+            #Ring buffer of the inputs, time along its first axis.
+            stock_size = (self._stock_steps,) + interim_stock_size
+            self._stock = initial_state[numpy.newaxis, :] * numpy.ones(stock_size)
+        LOG.debug("%s: stock_size is %s" % (str(self), str(stock_size)))
+
+
+    def reduce(self, state):
+        """The sum over the variables of interest and modes."""
+        return state[self.voi].sum(axis=0).sum(axis=1)
 
 
     def record(self, step, state):
@@ -1169,26 +1273,41 @@ class Bold(Monitor):
 
         """
         #Update the interim-stock at every step
-        self._interim_stock[((step % self._interim_istep) - 1), :] = state[self.voi, :]
+        self._interim_stock += self.reduce(state)
 
         #At stock's period update it with the temporal average of interim-stock
         if step % self._interim_istep == 0:
-            #import pdb; pdb.set_trace()
-            avg_interim_stock = numpy.mean(self._interim_stock, axis=0)
-            self._stock[((step/self._interim_istep % self._stock_steps) - 1), :] = avg_interim_stock
+            avg_interim_stock = self._interim_stock / self._interim_istep
+            self._interim_stock[:] = 0.0
+            if self.convolution[0] == "recursive":
+                a1, a2, b = self._filter
+                y1, y2, x1, x2 = self._stock
+                y2 *= a2
+                y2 += a1 * y1
+                y2 += b * x2
+                self._stock[:] = self._stock[[1, 0, 3, 2]]
+                self._stock[2] = avg_interim_stock
+            else:
+                self._stock[((step/self._interim_istep % self._stock_steps) - 1), :] = avg_interim_stock
 
         #At the monitor's period, apply the heamodynamic response function to
         #the stock and return the resulting BOLD signal.
         if step % self.istep == 0:
             time = step * self.dt
-            hrf = numpy.roll(self.hemodynamic_response_function,
-                             ((step/self._interim_istep % self._stock_steps) - 1),
-                             axis=1)
-            bold = (numpy.dot(hrf, self._stock.transpose((1, 2, 0, 3))) - 1.0) * (self.k1 * self.V0 / 3.0)
-            bold = bold.reshape(self._stock.shape[1:])
-            bold = bold.sum(axis=0)[numpy.newaxis,:,:] #state-variables
-            bold = bold.sum(axis=2)[:,:,numpy.newaxis] #modes
-            return [time, bold]
+            if self.convolution[0] == "recursive":
+                response = self._stock[0].copy()
+            else:
+                #The reversed HRF is aligned with its first element on the 
+                #latest input, so G[0] falls on the one before it, the response
+                #lagging by an interim period. Rather than rolling the HRF, the
+                #ring buffer is split at the latest input. The time axis is the
+                #stock's first, ahead of the nodes and of any ensemble's.
+                latest = (step/self._interim_istep - 1) % self._stock_steps
+                hrf = self.hemodynamic_response_function[0]
+                response = numpy.tensordot(hrf[:self._stock_steps - latest], self._stock[latest:], axes=(0, 0))
+                response += numpy.tensordot(hrf[self._stock_steps - latest:], self._stock[:latest], axes=(0, 0))
+            bold = (response - self._number_of_sources) * (self.k1 * self.V0 / 3.0)
+            return [time, bold[numpy.newaxis, :, numpy.newaxis]]
 
 
 class BoldRegionROI(Bold):
@@ -1201,19 +1320,46 @@ class BoldRegionROI(Bold):
     region level simulation with that of an otherwise identical surface
     simulation.
 
+    The convolution with the haemodynamic response function being linear, it
+    gives the same regional signals applied after the spatial average as 
+    before it, at the cost of the regions rather than of the vertices, which
+    is what region_resolution does.
+
     """
     _ui_name = "BOLD Region ROI (only with surface)"
 
+    region_resolution = basic.Bool(
+        label = "Convolve at region resolution",
+        default = False,
+        order = -1, #Hidden, a performance option rather than a scientific one.
+        doc = """Average the activity of the vertices of each region before,
+        rather than after, the convolution with the haemodynamic response 
+        function.""")
+
+
     def config_for_sim(self, simulator):
+        """As for the Bold monitor, with the region mapping of the surface."""
+        self.region_mapping = simulator.surface.region_mapping_operator
         super(BoldRegionROI, self).config_for_sim(simulator)
-        self.region_mapping = simulator.surface.region_mapping
 
-    def record(self, step, state, array=numpy.array):
+
+    def reduce(self, state):
+        """As for the Bold monitor, averaged over regions with region_resolution."""
+        sources = super(BoldRegionROI, self).reduce(state)
+        if self.region_resolution:
+            sources = self.region_mapping.average(sources, axis=0)
+        return sources
+
+
+    def record(self, step, state):
         result = super(BoldRegionROI, self).record(step, state)
         if result:
             t, data = result
-            return [t, array([data.flat[self.region_mapping==i].mean()
-                              for i in xrange(self.region_mapping.max())])]
+            if self.region_resolution:
+                #Like the average at vertex resolution, zero for empty regions.
+                data[:, self.region_mapping.nodes_per_region == 0] = 0.0
+                return [t, data]
+            return [t, self.region_mapping.average(data, axis=1)]
         else:
             return None
 
@@ -1266,9 +1412,9 @@ class BoldMultithreaded(Bold):
         stock_size = (self._stock_steps, ) + self._interim_stock.shape[1:]
         LOG.debug("%s: stock_size is %s" % (str(self), str(stock_size)))
 
-        #Set the inital _stock based on simulator.history
-        mean_history = numpy.mean(simulator.history[:, self.voi], axis=0)
-        self._stock = mean_history[numpy.newaxis,:] * numpy.ones(stock_size)
+        #Set the inital _stock based on the mean of the simulator's initial history
+        initial_state = simulator.initial_history_mean[self.voi]
+        self._stock = initial_state[numpy.newaxis,:] * numpy.ones(stock_size)
         #NOTE: BOLD can have a long (~15s) transient that is mainly due to the
         #      initial dynamic transient from simulations that are started with 
         #      imperfect initlial conditions.
@@ -1311,7 +1457,7 @@ class BoldMultithreaded(Bold):
 
 
 class BalloonWindkesselAccordingToKJFristonEtAl2003NeuroImage(Monitor):
-    """
+    r"""
 
     The full Balloon-Windkessel model, following Friston et al's paper
     detailing the equations describing hemodynamic state. 
@@ -1322,103 +1468,175 @@ class BalloonWindkesselAccordingToKJFristonEtAl2003NeuroImage(Monitor):
     .. [F_2003] Friston, K., Harrison, L., and Penny, W., *Dynamic causal
         modeling*, NeuroImage, 19, 1273 - 1302, 2003.
 
+    The neurovascular coupling variable, summed over modes and averaged over
+    an interim period of 4ms, is the input z of the haemodynamic state of each
+    node, the vasodilatory signal s, the inflow f, the volume v and the 
+    deoxyhemoglobin content q, following
+
+    .. math::
+        \dot{s} &= z - \kappa s - \gamma (f - 1) \\
+        \dot{f} &= s \\
+        \tau \dot{v} &= f - v^{1/\alpha} \\
+        \tau \dot{q} &= \frac{f}{\rho} (1 - (1 - \rho)^{1/f}) - 
+                        v^{1/\alpha} \frac{q}{v}
+
+    with time in seconds, and the BOLD signal being
+
+    .. math::
+        y = V_0 (7 \rho (1 - q) + 2 (1 - q/v) + (2 \rho - 0.2) (1 - v))
+
+    The state is integrated every interim period by Heun's method, with f, v
+    and q log-transformed to keep them positive, and is all the monitor keeps,
+    in ``_stock``, so its memory is that of a few arrays of the nodes, rather
+    than the ~15s history of the Bold monitor's convolution. It starts at rest,
+    s = 0 and f = v = q = 1, where y = 0.
+
+    .. #Currently there seems to be a clash betwen traits and autodoc, autodoc
+    .. #can't find the methods of the class, the class specific names below get
+    .. #us around this...
+    .. automethod:: BalloonWindkesselAccordingToKJFristonEtAl2003NeuroImage.__init__
+    .. automethod:: BalloonWindkesselAccordingToKJFristonEtAl2003NeuroImage.config_for_sim
+    .. automethod:: BalloonWindkesselAccordingToKJFristonEtAl2003NeuroImage.dfun
+    .. automethod:: BalloonWindkesselAccordingToKJFristonEtAl2003NeuroImage.bold
+    .. automethod:: BalloonWindkesselAccordingToKJFristonEtAl2003NeuroImage.record
+
     """
     _ui_name = "Balloon-Windkessel"
 
-    class config:
-
-        period = basic.Float(
-            label = "Sampling period (ms)",
-            default = 1000.0,
-            doc = """Sampling period of the Balloon""")
-
-        nvcvar = basic.Integer(
-            label = "Neurovascular coupling variable index",
-            default = 0,
-            doc = ""
-            )
-
-        #                                   prior mean          prior variance
-
-        kappa = basic.Float(
-            label="",
-            default=                        0.65, # per/s       0.015
-            doc="Rate of signal decay"
-            )
-
-        gamma = basic.Float(
-            label="",
-            default=                        0.41, # per/s       0.002
-            doc="Rate of flow-dependent elimination"
-            )
-
-        tau = basic.Float(
-            label="",
-            default=                        0.98, # s           0.0568
-            doc="Haemodynamic transit time"
-            )
-
-        alpha = basic.Float(
-            label="",
-            default=                        0.32, #             0.0015
-            doc="Grubb's exponent"
-            )
-
-        rho = basic.Float(
-            label="",
-            default=                        0.34, #             0.0024
-            doc="Resting oxygen extraction fraction"
-            )
+    #Over-ride the Monitor baseclass period...
+    period = basic.Float(
+        label = "Sampling period (ms)",
+        default = 1000.0,
+        doc = """Sampling period of the Balloon""")
+
+    nvcvar = basic.Integer(
+        label = "Neurovascular coupling variable index",
+        default = 0,
+        doc = """The index of the Model's state variable driving the 
+        vasodilatory signal.""")
+
+    #                                   prior mean          prior variance
+
+    kappa = basic.Float(
+        label = "Rate of signal decay (1/s)",
+        default =                       0.65, # per/s       0.015
+        doc = "Rate of signal decay")
+
+    gamma = basic.Float(
+        label = "Rate of flow-dependent elimination (1/s)",
+        default =                       0.41, # per/s       0.002
+        doc = "Rate of flow-dependent elimination")
+
+    tau = basic.Float(
+        label = "Haemodynamic transit time (s)",
+        default =                       0.98, # s           0.0568
+        doc = "Haemodynamic transit time")
+
+    alpha = basic.Float(
+        label = "Grubb's exponent",
+        default =                       0.32, #             0.0015
+        doc = "Grubb's exponent")
+
+    rho = basic.Float(
+        label = "Resting oxygen extraction fraction",
+        default =                       0.34, #             0.0024
+        doc = "Resting oxygen extraction fraction")
 
-    """
-    class state:
+    V0 = basic.Float(
+        label = "Resting blood volume fraction",
+        default = 0.02,
+        order = -1)
 
-        z_i = FloatArray()
-        s_i = FloatArray()
-        f_i = FloatArray()
-        v_i = FloatArray()
-        q_i = FloatArray()
-        y_i = FloatArray()
 
-    class ddt:
-        pass
 
-    """
-        
-    def __init__(self, *args, **kwds):
-        raise NotImplementedError
-    
+    def __init__(self, **kwargs):
+        """
+        Initialise from the base Monitor class.
+
+        """
+        LOG.info("%s: initing..." % str(self))
+        super(BalloonWindkesselAccordingToKJFristonEtAl2003NeuroImage, self).__init__(**kwargs)
+
+        self._interim_istep = None
+        self._interim_stock = None
+        self._h = None
+
+        LOG.debug("%s: inited." % repr(self))
+
+
+    def config_for_sim(self, simulator):
+        """
+        Set up the interim running sum of the input and the haemodynamic state,
+        at rest, of each node.
+
+        """
+        super(BalloonWindkesselAccordingToKJFristonEtAl2003NeuroImage, self).config_for_sim(simulator)
+
+        self._interim_istep = max(1, int(round(4.0 / self.dt)))
+        self._h = self._interim_istep * self.dt / 1000.0 #s
+
+        interim_stock_size = (simulator.number_of_nodes,) + simulator.ensemble_shape
+        self._interim_stock = numpy.zeros(interim_stock_size)
+
+        #The state (s, ln(f), ln(v), ln(q)), all of them zero at rest.
+        stock_size = (4,) + interim_stock_size
+        LOG.debug("%s: stock_size is %s" % (str(self), str(stock_size)))
+        self._stock = numpy.zeros(stock_size)
+
+
+    def dfun(self, state, z):
+        """
+        The derivatives of the haemodynamic state (s, ln(f), ln(v), ln(q)), 
+        given the input z.
+
+        """
+        s = state[0]
+        f, v, q = numpy.exp(state[1:])
+        outflow = numpy.exp(state[2] / self.alpha)
+        extraction = 1.0 - numpy.exp(numpy.log(1.0 - self.rho) / f)
+
+        derivative = numpy.empty_like(state)
+        derivative[0] = z - self.kappa * s - self.gamma * (f - 1.0)
+        derivative[1] = s / f
+        derivative[2] = (f - outflow) / (self.tau * v)
+        derivative[3] = (f * extraction / self.rho - outflow * q / v) / (self.tau * q)
+        return derivative
+
+
+    def bold(self, state):
+        """The BOLD signal of the haemodynamic state."""
+        v, q = numpy.exp(state[2:])
+        return self.V0 * (7.0 * self.rho * (1.0 - q) + 2.0 * (1.0 - q / v) + 
+                          (2.0 * self.rho - 0.2) * (1.0 - v))
+
+
     def record(self, step, state):
         """
         Returns a result if integration step corresponds to sampling period.
-        Updates the interim-stock on every step and updates the stock if the 
-        step corresponds to the interim period.
+        Adds the neurovascular coupling variable to the interim running sum on 
+        every step, and integrates the haemodynamic state, driven by its 
+        average, every interim period.
 
         """
-        #Update the interim-stock at every step
-        self._interim_stock[((step % self._interim_istep) - 1), :] = state[self.voi, :]
+        self._interim_stock += state[self.nvcvar].sum(axis=1)
 
-        #At stock's period update it with the temporal average of interim-stock
         if step % self._interim_istep == 0:
-            #import pdb; pdb.set_trace()
-            avg_interim_stock = numpy.mean(self._interim_stock, axis=0)
-            self._stock[((step/self._interim_istep % self._stock_steps) - 1), :] = avg_interim_stock
+            z = self._interim_stock / self._interim_istep
+            self._interim_stock[:] = 0.0
+            #Heun's method, the input held over the interim period.
+            derivative = self.dfun(self._stock, z)
+            predictor = self._stock + self._h * derivative
+            derivative += self.dfun(predictor, z)
+            self._stock += (0.5 * self._h) * derivative
 
-        #At the monitor's period, apply the heamodynamic response function to
-        #the stock and return the resulting BOLD signal.
         if step % self.istep == 0:
             time = step * self.dt
-            hrf = numpy.roll(self.hemodynamic_response_function,
-                             ((step/self._interim_istep % self._stock_steps) - 1),
-                             axis=1)
-            bold = numpy.dot(hrf, self._stock.transpose((1, 2, 0, 3)))
-            bold = bold.reshape(self._stock.shape[1:])
-            bold = bold.sum(axis=0)[numpy.newaxis,:,:] #state-variables
-            bold = bold.sum(axis=2)[:,:,numpy.newaxis] #modes
-            return [time, bold]
+            bold = self.bold(self._stock)
+            return [time, bold[numpy.newaxis, :, numpy.newaxis]]
 
 
-class SEEG(Monitor):
+
+class SEEG(ProjectionMonitor):
     """
     Monitors electrophysiological signals from depth electrodes (intended for stereo-EEG).
     """
@@ -1450,6 +1668,7 @@ class SEEG(Monitor):
         Compute the projection matrix -- simple distance weight for now.
         Equation 12 from sarvas1987basic (point dipole in homogeneous space): 
           V(r) = 1/(4*pi*\sigma)*Q*(r-r_0)/|r-r_0|^3
+        see lead_fields.point_dipole_eeg().
         """
         super(SEEG, self).config_for_sim(simulator)
 
@@ -1469,37 +1688,10 @@ class SEEG(Monitor):
             r_0 = simulator.surface.vertices
             Q = simulator.surface.vertex_normals
 
-        V_r = numpy.zeros((self.sensors.locations.shape[0], r_0.shape[0]))
-        for sensor_k in numpy.arange(self.sensors.locations.shape[0]):
-            a = self.sensors.locations[sensor_k, :] - r_0
-            na = numpy.sqrt(numpy.sum(a**2, axis=1))[:, numpy.newaxis]
-            V_r[sensor_k, :] = numpy.sum(Q * (a / na**3), axis=1 ) / (4.0 * numpy.pi * self.sigma)
-
-        self.projection_matrix = V_r
+        self.projection_matrix = lead_fields.lead_field(lead_fields.point_dipole_eeg,
+                                                        self.sensors.locations, r_0, Q,
+                                                        sigma=self.sigma)
 
         util.log_debug_array(LOG, self.projection_matrix, "projection_matrix",
                              owner=self.__class__.__name__)
 
-        stock_size = (self.istep, self.voi.shape[0],
-                      simulator.number_of_nodes,
-                      simulator.model.number_of_modes)
-        LOG.debug("%s: stock_size is %s" % (str(self), str(stock_size)))
-
-        self._stock = numpy.zeros(stock_size)
-
-
-    def record(self, step, state):
-        """
-        Same as the EEG monitor:
-        """
-        self._stock[((step % self.istep) - 1), :] = state[self.voi, :]
-        if step % self.istep == 0:
-            time = (step - self.istep / 2.0) * self.dt
-            avg_stock = numpy.mean(self._stock, axis=0)
-            #If there are multiple variables or modes we assume they can be 
-            #sensibly summed to form a single source...
-            avg_stock = avg_stock.sum(axis=0)[numpy.newaxis,:,:] #state-variables
-            avg_stock = avg_stock.sum(axis=2)[:,:,numpy.newaxis] #modes
-            eeg = numpy.dot(self.projection_matrix, avg_stock)
-            return [time, eeg.transpose((1, 0, 2))]
-
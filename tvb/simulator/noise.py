@@ -178,6 +178,7 @@ class Noise(core.Type):
     .. automethod:: Noise.generate
     .. automethod:: Noise.white
     .. automethod:: Noise.coloured
+    .. automethod:: Noise.time_integral
 
     """
     _base_classes = ['Noise']
@@ -321,6 +322,27 @@ class Noise(core.Type):
         return noise
 
 
+    def time_integral(self, noise):
+        r"""
+        Return the integral over the step of the noise process, given its
+        increment ``noise`` as returned by generate(), which the stochastic
+        Runge-Kutta schemes need along with the increment. For white noise
+        it's the double integral :math:`I_{(1,0)}` of [KloedenPlaten_1995]_,
+        drawn jointly with the increment :math:`\Delta W` (page 352):
+
+        .. math::
+            I_{(1,0)} = \frac{1}{2} dt (\Delta W + \sqrt{dt / 3} \, \zeta)
+
+        with :math:`\zeta` a further standard normal variate. Coloured noise,
+        being smooth, is taken to vary linearly over the step.
+
+        """
+        if self.ntau > 0.0:
+            return 0.5 * self.dt * noise
+        return 0.5 * self.dt * (noise + numpy.sqrt(self.dt / 3.0) *
+                                self.random_stream.normal(size=noise.shape))
+
+
 class Additive(Noise):
     """
     Additive noise which, assuming the source noise is Gaussian with unit 
@@ -46,14 +46,34 @@ while others are not, e.g.
 - model dynamics
 - etc.
 
+Parameter sweeps with NumPy
+---------------------------
+
+Without a device, the same split applies to the Simulator itself: in "numpy
+mode" the streamable parameters of a batch are given to a single Simulator as
+arrays, one value per configuration, which then advances all of them together
+as an ensemble (see Simulator.ensemble_size).
+
+Given a number of processes, the batches are instead run by a pool of worker
+processes, each with its own copy of the baseline simulator, while the large
+read-only inputs (connectivity weights and tract lengths, the surface's local
+connectivity) are shared through memory-mapped files, which each worker maps
+in place of its copies of them.
+
 .. moduleauthor:: Marmaduke Woodman <mw@eml.cc>
 
 """
 
+import os
 import time
+import shutil
+import tempfile
 import itertools
 import functools
 import collections
+import multiprocessing
+
+import numpy
 
 from tvb.simulator import lab as l
 
@@ -72,6 +92,28 @@ def logged(fn):
 # path rel to self. where self is the simulation. eg. integrator.dt
 Par = collections.namedtuple('Par', 'path, streamable, values')
 
+# the sweep run by a worker process, set by the pool's initializer
+_pool_sweep = None
+
+def _pool_init(sweep, shared):
+    """
+    Set up a pool worker to run batches of the sweep, replacing the inputs
+    shared with it, given as (path rel to the simulator, file), by read-only
+    memory maps of their files.
+
+    """
+    global _pool_sweep
+    for path, filename in shared:
+        ary = numpy.load(filename, mmap_mode='r')
+        exec "sim.%s = ary" % (path, ) in {'sim': sweep.sim, 'ary': ary}
+    _pool_sweep = sweep
+
+def _pool_run(batch):
+    """Run a batch (row, start, stop) of configurations in a pool worker."""
+    r, start, stop = batch
+    sim = _pool_sweep.build_ensemble(_pool_sweep.ndconf_split[r, start:stop])
+    return _pool_sweep.run_ensemble(sim)
+
 class par_sweep(object):
     """
     The par_sweep class manages parameter variations and their mapping
@@ -86,6 +128,14 @@ class par_sweep(object):
     2. reorder pars so that streamable parameters at end
     3. generate all pars configurations (itertools.product(*pars))
 
+    next(), in numpy mode
+    4. while simulations remain to be run
+        1. pop the configurations that do not vary a non streamable parameter
+        2. set the non streamable parameters, and the streamable ones as
+           arrays with one value per configuration
+        3. run the simulator as an ensemble of these configurations
+        4. yield results of this simulation batch
+
     next()
     4. while simulations remain to be run
         1. pop first parameter configuration
@@ -114,13 +164,25 @@ class par_sweep(object):
         so it's necessary to provide baseline configuration that can 
         successfully initialize the simulator.
 
+        The keyword numpy_mode=True runs the sweep with the NumPy simulator,
+        rather than a device handler, as an ensemble per batch of streamable 
+        configurations. The keyword processes=n runs the sweep with the NumPy
+        simulator in a pool of n worker processes, a configuration at a time
+        or, in numpy mode, as ensembles of up to a 1/n-th of the streamable
+        configurations.
+
         """
 
 
+        self.numpy_mode = kwds.pop('numpy_mode', False)
+        self.processes = kwds.pop('processes', None)
+        self.pool = None
+        self.share_dir = None
+        self.par_values = {}
         self.kwds = kwds
         if 'stimulus' in kwds:
             raise NotImplementedError('it will take 5 minutes, plz send patch')
-        self.sim = simulator.Simulator(**kwds)
+        self.sim = l.simulator.Simulator(**kwds)
 
         # does it stream?
         yes, no = [], []
@@ -138,12 +200,12 @@ class par_sweep(object):
 
         # make ndarray of configurations
         ndconf_shape = [len(p.values) for p in self.pars]
-        self.ndconf = empty(ndconf_shape, dtype=object)
+        self.ndconf = numpy.empty(ndconf_shape, dtype=object)
         for i, conf in enumerate(itertools.product(*(p.values for p in self.pars))):
             self.ndconf.flat[i] = conf
 
-        self.split_shape = (int(prod(ndconf_shape[:self.part])),
-                            int(prod(ndconf_shape[self.part:])))
+        self.split_shape = (int(numpy.prod(ndconf_shape[:self.part])),
+                            int(numpy.prod(ndconf_shape[self.part:])))
         self.ndconf_split = self.ndconf.reshape(self.split_shape)
         self.split_idx = (0, 0)
 
@@ -151,7 +213,9 @@ class par_sweep(object):
 
         self.n_msik = 1
 
-        if 'drv' in kwds:
+        if self.numpy_mode or self.processes:
+            self.drv = None
+        elif 'drv' in kwds:
             self.drv = kwds['drv']
         else:
             LOG.info('initializing backend driver, may take a moment...')
@@ -203,8 +267,21 @@ class par_sweep(object):
         if self.results:
             return self.results.pop()
 
-        # TODO add a 'numpy mode' so that we just use the simulator itself
-        # and return the "correct" results
+        if self.processes:
+            if self.pool is None:
+                self.start_pool()
+            try:
+                batch = self.pool_results.next()
+            except StopIteration:
+                self.stop_pool()
+                raise
+            self.results = batch[::-1]
+            return self.results.pop()
+
+        if self.numpy_mode:
+            # results are popped from the end, so reverse the batch's 
+            self.results = self.run_ensemble(self.next_ensemble())[::-1]
+            return self.results.pop()
 
         sim = self.next_sim()
         sim.current_step = 0
@@ -272,6 +349,183 @@ class par_sweep(object):
         self.results = per_thread
         LOG.info('reorganizing done')
 
+    @logged
+    def next_ensemble(self):
+        """
+        The next_ensemble method takes the remaining configurations that share
+        the current non-streamable parameters, and sets up the simulator to 
+        run them as an ensemble: the non-streamable parameters are set as for
+        a single simulation, the streamable ones as arrays with a value per
+        configuration.
+
+        """
+
+        r, c = self.split_idx
+
+        if r == self.split_shape[0]:
+            raise StopIteration
+
+        configs = self.ndconf_split[r, c:]
+        self.split_idx = (r+1, 0)
+        return self.build_ensemble(configs)
+
+    @logged
+    def build_ensemble(self, configs):
+        """
+        The build_ensemble method sets up the simulator to run a sequence of
+        configurations, sharing their non-streamable parameters, as an 
+        ensemble.
+
+        """
+
+        sim = self.sim
+        values = []
+        for i_par, par in enumerate(self.pars):
+            if i_par < self.part:
+                values.append(configs[0][i_par])
+            else:
+                # one scalar value per configuration, along the ensemble axis,
+                # shaped (1, ensemble_size) as the simulator expects of them
+                column = numpy.array([config[i_par] for config in configs])
+                values.append(column.reshape((1, -1)) if len(configs) > 1 else column)
+        changed = self.set_pars(values)
+
+        if sim.ensemble_size != len(configs):
+            sim.ensemble_size = len(configs)
+            changed.append('ensemble_size')
+        sim.current_step = 0
+        # the model's initial conditions are drawn afresh for each batch, 
+        # whichever process runs it and whatever ran there before
+        sim.model.noise.trait["random_stream"].reset()
+        sim.reconfigure(*changed)
+        return sim
+
+    def set_pars(self, values):
+        """
+        The set_pars method sets the swept parameters of the simulator to the
+        values given, returning the paths of those that changed since the 
+        last configuration, so that only what depends on them needs to be
+        reconfigured.
+
+        """
+
+        changed = []
+        for par, val in zip(self.pars, values):
+            old = self.par_values.get(par.path, self)
+            try:
+                same = old is val or (numpy.shape(old) == numpy.shape(val) and
+                                      bool(numpy.all(old == val)))
+            except Exception:
+                same = False
+            if not same:
+                code = "sim.%s = val" % (par.path, )
+                exec code in {'sim': self.sim, 'val': val}
+                self.par_values[par.path] = val
+                changed.append(par.path)
+        return changed
+
+    @logged
+    def run_ensemble(self, sim):
+        """
+        The run_ensemble method runs a simulator configured by next_ensemble,
+        and splits the monitors' output, shaped 
+        
+            [mon][time, svar, node, mode, thr]
+
+        per configuration as
+
+            [thr][monitor][time, svar, node, mode]
+
+        """
+
+        outputs = [[] for mon in sim.monitors]
+        for output in sim():
+            for i_mon, out in enumerate(output):
+                if out is not None:
+                    outputs[i_mon].append(out[1])
+
+        n_thr = sim.ensemble_size
+        outputs = [numpy.array(out) for out in outputs]
+        if not sim.ensemble_shape:
+            outputs = [out[..., numpy.newaxis] for out in outputs]
+        return [[out[..., i_thr] for out in outputs] for i_thr in xrange(n_thr)]
+
+    @logged
+    def start_pool(self):
+        """
+        The start_pool method configures the baseline simulator, so that the 
+        work common to all configurations, such as a surface's local 
+        connectivity, is done once, shares its large read-only inputs and
+        starts the worker processes, each then reconfiguring its copy of the
+        simulator for the parameters of its batches. The batches of configurations are then 
+        mapped over the pool, their results coming back in order.
+
+        """
+
+        self.sim.configure()
+        shared = self.share_inputs()
+
+        if self.numpy_mode:
+            n_ens = -(-self.split_shape[1] // self.processes)
+        else:
+            n_ens = 1
+        r, c = self.split_idx
+        batches = []
+        for i_row in xrange(r, self.split_shape[0]):
+            for start in xrange(c if i_row == r else 0, self.split_shape[1], n_ens):
+                batches.append((i_row, start, min(start + n_ens, self.split_shape[1])))
+        self.split_idx = (self.split_shape[0], 0)
+
+        msg = '%r running %d batches on %d processes'
+        LOG.info(msg, self, len(batches), self.processes)
+        self.pool = multiprocessing.Pool(self.processes, initializer=_pool_init,
+                                         initargs=(self, shared))
+        self.pool_results = self.pool.imap(_pool_run, batches)
+
+    @logged
+    def stop_pool(self):
+        """
+        The stop_pool method waits for the worker processes to exit and 
+        removes the files shared with them.
+
+        """
+
+        self.pool.close()
+        self.pool.join()
+        self.pool = None
+        if self.share_dir is not None:
+            shutil.rmtree(self.share_dir, ignore_errors=True)
+            self.share_dir = None
+
+    @logged
+    def share_inputs(self):
+        """
+        The share_inputs method saves the large read-only arrays of the 
+        baseline simulator to files, returning their (path rel to the 
+        simulator, file) pairs, which the worker processes map into memory in
+        place of their own copies, so that they all read the same pages. The 
+        baseline simulator keeps its arrays.
+
+        """
+
+        self.share_dir = tempfile.mkdtemp(prefix='tvb-parsweep-')
+        shared = []
+
+        def share(path):
+            ary = eval('sim.%s' % (path, ), {'sim': self.sim})
+            if ary is None or numpy.size(ary) == 0:
+                return
+            filename = os.path.join(self.share_dir, '%d-%s.npy' % (len(shared), path))
+            numpy.save(filename, ary)
+            shared.append((path, filename))
+
+        share('connectivity.weights')
+        share('connectivity.tract_lengths')
+        if self.sim.surface is not None:
+            for name in ('data', 'indices', 'indptr'):
+                share('surface.local_connectivity.matrix.' + name)
+        return shared
+
     @logged
     def setup_monitors(self, sim, dh, n_rthr):
         """
@@ -381,12 +635,11 @@ class par_sweep(object):
 
         """
 
-        # update with parameter configuration
-        for (path, _, _), val in zip(self.pars, config):
-            code = "sim.%s = val" % (path, )
-            exec code in {'sim': self.sim, 'val': val}
-
-        self.sim.configure()
+        # update with parameter configuration, reconfiguring only what the
+        # parameters that changed invalidate
+        changed = self.set_pars(config)
+        self.sim.current_step = 0
+        self.sim.reconfigure(*changed)
         return self.sim
 
 
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+
+"""
+Benchmark the accuracy of the deterministic integrators of region simulations
+of the shipped models against their integration step.
+
+For each model, each scheme is run at a range of steps and compared with a
+reference, integrated by the Dormand-Prince scheme at a far smaller step. The
+table printed gives, for each scheme, the largest step at which the error
+stays within TOLERANCE, relative to the range of each state variable, and the
+time the simulation takes at that step.
+
+The tract lengths are rounded so that the delays are whole multiples of the
+largest step, and the initial history is constant, so that the delays are the
+same at all the steps and the runs differ only by their integration. The
+delayed coupling being constant over each step, all the schemes are first
+order in its variation.
+
+The semi-linear schemes are run on the models exposing their linear operator,
+and, when no model is named, also on the STIFF_MODELS, whose parameters make
+their linear terms stiff.
+
+Usage: python integrator_accuracy.py [model names...]
+
+``Run time``: approximately 10 min (workstation circa 2012).
+
+"""
+
+# Standard python libraries
+import sys
+import time
+
+# Third party python libraries
+import numpy
+
+# Try and import from "The Virtual Brain"
+try:
+    from tvb.basic.logger.builder import get_logger
+    LOG = get_logger(__name__)
+except ImportError:
+    import logging
+    logging.basicConfig(level=logging.DEBUG)
+    LOG = logging.getLogger(__name__)
+    LOG.warning("Failed to import TVB logger, using Python logging directly...")
+
+#Import from tvb.simulator modules:
+import tvb.simulator.simulator as simulator
+import tvb.simulator.models as models
+import tvb.simulator.coupling as coupling
+import tvb.simulator.integrators as integrators
+import tvb.simulator.monitors as monitors
+
+import tvb.datatypes.connectivity as connectivity
+
+
+MODELS = ["Generic2dOscillator", "WilsonCowan", "JansenRit", "WongWang", "Kuramoto",
+          "ReducedSetFitzHughNagumo", "ReducedSetHindmarshRose", "BrunelWang"]
+
+#JansenRit with synaptic kernels ten times faster.
+STIFF_MODELS = [("JansenRit", {"a": numpy.array([1.0]), "b": numpy.array([0.5])})]
+
+SCHEMES = [integrators.EulerDeterministic,
+           integrators.HeunDeterministic,
+           integrators.RungeKutta4thOrderDeterministic,
+           integrators.DormandPrince5thOrderDeterministic,
+           integrators.ExponentialEulerDeterministic,
+           integrators.ExponentialRungeKutta2ndOrderDeterministic,
+           integrators.ImplicitExplicitEulerDeterministic]
+
+#The steps compared, in ms, and that of the reference, which must divide them.
+DTS = [1.6, 0.8, 0.4, 0.2, 0.1, 0.05, 0.025, 0.0125]
+REFERENCE_DT = max(DTS) / 256
+
+SIMULATION_LENGTH = 100.0 #ms
+TOLERANCE = 1e-3
+
+
+
+def simulate(model, white_matter, scheme, dt, initial_state):
+    """
+    The states of the simulation at the multiples of the largest step, and
+    the time the simulation took.
+    """
+    sim = simulator.Simulator(model=model, connectivity=white_matter,
+                              coupling=coupling.Linear(a=0.0042),
+                              integrator=scheme(dt=dt),
+                              monitors=(monitors.Raw(),))
+    sim.configure()
+    sim.configure_history(initial_state[numpy.newaxis] *
+                          numpy.ones((sim.horizon,) + initial_state.shape))
+    sim.configure_monitors()
+    stride = int(round(max(DTS) / dt))
+    states = []
+    tic = time.time()
+    for step, ((t, state),) in enumerate(sim(simulation_length=SIMULATION_LENGTH), 1):
+        if step % stride == 0:
+            states.append(state)
+    return numpy.array(states), time.time() - tic
+
+
+def relative_error(model, states, reference):
+    """The largest error relative to the range of each state variable."""
+    if states.shape != reference.shape or not numpy.all(numpy.isfinite(states)):
+        return numpy.inf
+    difference = states - reference
+    if isinstance(model, models.Kuramoto):
+        difference = numpy.mod(difference + numpy.pi, 2.0 * numpy.pi) - numpy.pi
+    axes = (0,) + tuple(range(2, reference.ndim))
+    scale = reference.max(axis=axes) - reference.min(axis=axes)
+    return numpy.max(numpy.abs(difference).max(axis=axes) / numpy.maximum(scale, 1e-12))
+
+
+def benchmark(model_name, **parameters):
+    model = getattr(models, model_name)(**parameters)
+    white_matter = connectivity.Connectivity()
+    white_matter.configure()
+    delay_step = white_matter.speed[0] * max(DTS)
+    white_matter.tract_lengths = numpy.round(white_matter.tract_lengths / delay_step) * delay_step
+
+    #Per node initial conditions, the same for all the runs
+    model.configure()
+    random_state = numpy.random.RandomState(42)
+    lo, hi = numpy.array([model.state_variable_range[name]
+                          for name in model.state_variables]).T
+    initial_state = (lo + (hi - lo) * random_state.rand(white_matter.number_of_regions,
+                                                        model.number_of_modes, len(lo))).transpose((2, 0, 1))
+
+    LOG.info("%s: computing the reference at dt=%s" % (model_name, REFERENCE_DT))
+    reference, reference_time = simulate(model, white_matter,
+                                         integrators.DormandPrince5thOrderDeterministic,
+                                         REFERENCE_DT, initial_state)
+
+    label = model_name + "".join(" %s=%g" % (name, numpy.ravel(value)[0])
+                                 for name, value in sorted(parameters.items()))
+    print "\n%s, tolerance %g, reference %.1f s" % (label, TOLERANCE, reference_time)
+    print "    %-42s %8s %8s %10s" % ("scheme", "dt (ms)", "time (s)", "error")
+    for scheme in SCHEMES:
+        if (issubclass(scheme, integrators.IntegratorSemiLinear) and
+            model.linear_operator() is None):
+            continue
+        best = None
+        for dt in DTS:
+            states, elapsed = simulate(model, white_matter, scheme, dt, initial_state)
+            error = relative_error(model, states, reference)
+            LOG.info("%s %s dt=%s: error %g in %.2f s" % (model_name, scheme.__name__, dt, error, elapsed))
+            if error <= TOLERANCE:
+                best = (dt, elapsed, error)
+                break
+        if best is None:
+            print "    %-42s %8s %8s %10s" % (scheme.__name__, "-", "-", "> %g" % TOLERANCE)
+        else:
+            print "    %-42s %8g %8.2f %10.2e" % ((scheme.__name__,) + best)
+
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or MODELS:
+        benchmark(name)
+    if not sys.argv[1:]:
+        for name, parameters in STIFF_MODELS:
+            benchmark(name, **parameters)
+
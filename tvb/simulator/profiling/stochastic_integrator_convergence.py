@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+
+"""
+Benchmark the strong convergence of the stochastic integrators.
+
+A set of uncoupled Generic2dOscillator nodes, each a realisation of the noise,
+is integrated by each scheme at a range of steps, with additive and with
+multiplicative noise, and compared with a reference integrated at a far
+smaller step. All the runs are driven by the same Wiener paths, drawn at the
+reference's step and summed to the step of each run, so their difference is
+that of their integration only. For each scheme and step the table printed
+gives
+
+    - the strong error, the mean over the realisations of the largest error
+      of the state variables at the end of the run,
+    - the weak error, the largest error of the mean and standard deviation
+      over the realisations of the state variables, and
+    - the time each run took,
+
+and for each scheme, the order of the strong error estimated over the steps.
+
+Usage: python stochastic_integrator_convergence.py [additive|multiplicative]
+
+``Run time``: approximately 1 min (workstation circa 2012).
+
+"""
+
+# Standard python libraries
+import sys
+import time
+
+# Third party python libraries
+import numpy
+
+# Try and import from "The Virtual Brain"
+try:
+    from tvb.basic.logger.builder import get_logger
+    LOG = get_logger(__name__)
+except ImportError:
+    import logging
+    logging.basicConfig(level=logging.DEBUG)
+    LOG = logging.getLogger(__name__)
+    LOG.warning("Failed to import TVB logger, using Python logging directly...")
+
+#Import from tvb.simulator modules:
+import tvb.simulator.models as models
+import tvb.simulator.integrators as integrators
+import tvb.simulator.noise as noise
+
+import tvb.datatypes.equations as equations
+
+
+SCHEMES = [integrators.EulerStochastic,
+           integrators.HeunStochastic,
+           integrators.RungeKuttaAdditiveStochastic,
+           integrators.MilsteinStochastic]
+
+#The diffusion coefficients, b of Multiplicative noise, and the scheme
+#computing the reference for each.
+NOISES = {"additive": (equations.Linear(parameters={"a": 0.0, "b": 1.0}),
+                       integrators.RungeKuttaAdditiveStochastic),
+          "multiplicative": (equations.Linear(parameters={"a": 1.0, "b": 0.0}),
+                             integrators.MilsteinStochastic)}
+
+#The steps compared, in ms, and that of the reference, which must divide them.
+DTS = [0.2, 0.1, 0.05, 0.025, 0.0125]
+REFERENCE_DT = max(DTS) / 256
+
+SIMULATION_LENGTH = 10.0 #ms
+REALISATIONS = 128
+NSIG = 0.01
+
+
+
+class WienerPath(noise.Multiplicative):
+    """
+    Multiplicative noise whose increments, and their integrals over the step,
+    are those of given Wiener paths rather than drawn.
+    """
+
+    def replay(self, dW, dZ, dt):
+        """
+        Sum the increments dW of the paths, and their integrals over the step
+        dZ, drawn at REFERENCE_DT, to the step dt.
+        """
+        substeps = int(round(dt / REFERENCE_DT))
+        shape = (dW.shape[0] // substeps, substeps) + dW.shape[1:]
+        dW, dZ = dW.reshape(shape), dZ.reshape(shape)
+        #W at the start of each substep, relative to the start of the step
+        W = numpy.cumsum(dW, axis=1) - dW
+        self._increments = dW.sum(axis=1)
+        self._integrals = (dZ + REFERENCE_DT * W).sum(axis=1)
+        self._step = -1
+
+
+    def generate(self, shape):
+        self._step += 1
+        return self._increments[self._step].copy()
+
+
+    def time_integral(self, noise):
+        return self._integrals[self._step]
+
+
+
+def integrate(scheme, b, dt, dW, dZ, initial_state):
+    """The final states of the realisations, and the time the run took."""
+    model = models.Generic2dOscillator()
+    model.configure()
+    integrator = scheme(dt=dt, noise=WienerPath(nsig=numpy.array([NSIG]), b=b))
+    integrator.configure()
+    integrator.noise.configure_white(dt)
+    integrator.noise.replay(dW, dZ, dt)
+
+    X = initial_state.copy()
+    coupling = numpy.zeros((len(model.cvar),) + X.shape[1:])
+    tic = time.time()
+    for step in xrange(int(round(SIMULATION_LENGTH / dt))):
+        X = integrator.scheme(X, model.dfun, coupling, 0.0, 0.0)
+    return X, time.time() - tic
+
+
+def benchmark(noise_name):
+    b, reference_scheme = NOISES[noise_name]
+    random_state = numpy.random.RandomState(42)
+    shape = (int(round(SIMULATION_LENGTH / REFERENCE_DT)), 2, REALISATIONS, 1)
+    dW = numpy.sqrt(REFERENCE_DT) * random_state.normal(size=shape)
+    dZ = 0.5 * REFERENCE_DT * (dW + numpy.sqrt(REFERENCE_DT / 3.0) *
+                               random_state.normal(size=shape))
+    initial_state = numpy.array([1.0, -1.0])[:, numpy.newaxis, numpy.newaxis] * numpy.ones(shape[1:])
+
+    LOG.info("%s noise: computing the reference at dt=%s" % (noise_name, REFERENCE_DT))
+    reference, reference_time = integrate(reference_scheme, b, REFERENCE_DT, dW, dZ, initial_state)
+    statistics = numpy.array([reference.mean(axis=1), reference.std(axis=1)])
+
+    print "\n%s noise, %d realisations, reference %s %.1f s" % (noise_name, REALISATIONS,
+                                                              reference_scheme.__name__, reference_time)
+    print "    %-30s %8s %10s %10s %8s" % ("scheme", "dt (ms)", "strong", "weak", "time (s)")
+    for scheme in SCHEMES:
+        strong_errors = []
+        for dt in DTS:
+            X, elapsed = integrate(scheme, b, dt, dW, dZ, initial_state)
+            strong = numpy.abs(X - reference).max(axis=0).mean()
+            weak = numpy.abs(numpy.array([X.mean(axis=1), X.std(axis=1)]) - statistics).max()
+            strong_errors.append(strong)
+            print "    %-30s %8g %10.2e %10.2e %8.2f" % (scheme.__name__, dt, strong, weak, elapsed)
+        order = numpy.polyfit(numpy.log(DTS), numpy.log(strong_errors), 1)[0]
+        print "    %-30s strong order %.2f" % (scheme.__name__, order)
+
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or sorted(NOISES):
+        benchmark(name)
+
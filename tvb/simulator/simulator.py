@@ -31,6 +31,10 @@ simulation and the method for running the simulation.
 """
 
 # From standard python libraries
+import os
+import json
+import shutil
+import fnmatch
 
 # Third party python libraries
 import numpy
@@ -46,6 +50,7 @@ import tvb.simulator.models as models_module
 import tvb.simulator.integrators as integrators_module
 import tvb.simulator.monitors as monitors_module
 import tvb.simulator.coupling as coupling_module
+from tvb.simulator.local_coupling import LocalCouplingOperator
 
 import tvb.datatypes.arrays as arrays_dtype
 import tvb.datatypes.surfaces as surfaces_dtype
@@ -53,10 +58,32 @@ import tvb.datatypes.connectivity as connectivity_dtype
 #import tvb.datatypes.coupling as coupling_dtype
 import tvb.datatypes.patterns as patterns_dtype
 
-from tvb.simulator.common import psutil, get_logger
+from tvb.simulator.common import psutil, get_logger, Struct
 LOG = get_logger(__name__)
 
 
+#What a change to an attribute of a Simulator, given by its path, invalidates
+#of a previous configuration, see Simulator.reconfigure(). The first pattern
+#matching the path applies, anything unmatched requiring a full configure().
+RECONFIGURE_DEPENDENCIES = (
+    ("simulation_length", ()),
+    ("coupling", ("coupling", "history")),
+    ("coupling.*", ()),
+    ("model.state_variable_range", ("model", "history")),
+    ("model.variables_of_interest", ("model", "monitors")),
+    ("model.cvar", ("all",)),
+    ("model.number_of_modes", ("all",)),
+    ("model.*", ("model",)),
+    ("integrator.noise.*", ("noise",)),
+    ("monitors*", ("monitors",)),
+    ("stimulus*", ("stimulus",)),
+    ("initial_conditions", ("history",)),
+    ("coupling_engine", ("coupling", "history")),
+    ("history_layout", ("coupling", "history")),
+    ("local_coupling_*", ("local_coupling",)),
+)
+
+
 #from tvb.simulator.common import iround
 
 class Simulator(core.Type):
@@ -80,9 +107,16 @@ class Simulator(core.Type):
     .. #us around this...
     .. automethod:: Simulator.__init__
     .. automethod:: Simulator.configure
+    .. automethod:: Simulator.reconfigure
     .. automethod:: Simulator.__call__
+    .. automethod:: Simulator.configure_model_parameters
     .. automethod:: Simulator.configure_history
+    .. automethod:: Simulator.configure_history_packing
+    .. automethod:: Simulator.configure_coupling
+    .. automethod:: Simulator.configure_local_coupling
     .. automethod:: Simulator.configure_integrator_noise
+    .. automethod:: Simulator.save_checkpoint
+    .. automethod:: Simulator.load_checkpoint
     .. automethod:: Simulator.memory_requirement
     .. automethod:: Simulator.runtime
     .. automethod:: Simulator.storage_requirement
@@ -188,12 +222,14 @@ class Simulator(core.Type):
         order = -1, #Hidden until UI support exists.
         required = False,
         doc = """Initial conditions from which the simulation will begin. By 
-        default, random initial conditions are provided. Needs to be the same shape
-        as simulator 'history', ie, initial history function which defines the 
-        minimal initial state of the network with time delays before time t=0. 
-        If the number of time points in the provided array is insufficient the 
-        array will be padded with random values based on the 'state_variables_range'
-        attribute.""")
+        default, random initial conditions are provided. Needs to be of shape
+        (time-points, state-variables, nodes, modes), ie, initial history 
+        function which defines the minimal initial state of the network with 
+        time delays before time t=0. Only the coupling variables are kept as
+        the simulator's 'history', the last time point providing the full 
+        'current_state'. If the number of time points in the provided array 
+        is insufficient the array will be padded with random values based on
+        the 'state_variables_range' attribute.""")
 
     monitors = monitors_module.Monitor(
         label = "Monitor(s)",
@@ -216,6 +252,70 @@ class Simulator(core.Type):
         order = 9,
         doc = """The length of a simulation in milliseconds (ms).""")
 
+    coupling_engine = basic.Enumerate(
+        label = "Coupling engine",
+        options = ["auto", "dense", "sparse", "lags"],
+        default = ["auto"],
+        select_multiple = False,
+        order = -1, #Hidden, a performance option rather than a scientific one.
+        doc = """How the delayed long-range coupling is evaluated at each
+        integration step. 'dense' gathers the delayed state over every pair of
+        regions, while 'sparse' builds a list of the non-zero connections,
+        ordered by target region, when the Simulator is configured and only
+        gathers and sums over those. 'lags', which requires a Coupling with a
+        factorised form (see Coupling.sources()), splits the weights by delay
+        and computes the input as a sum of sparse matrix products with the 
+        history at each delay. 'auto' selects 'lags' where possible and 
+        'dense' otherwise. All produce the same result, up to floating point
+        rounding.""")
+
+    history_layout = basic.Enumerate(
+        label = "History layout",
+        options = ["uniform", "per-node"],
+        default = ["uniform"],
+        select_multiple = False,
+        order = -1, #Hidden, a performance option rather than a scientific one.
+        doc = """How the history of the coupling variables is stored. 'uniform'
+        keeps a ring buffer as deep as the longest delay for every node, while 
+        'per-node' keeps for each node a ring buffer only as deep as the 
+        longest delay of its own outgoing connections, all of them packed into
+        a single array. For a surface simulation the depth of a vertex is that
+        of its region. The 'per-node' layout can only be read by the 'sparse'
+        and 'lags' coupling engines, with the 'dense' engine the 'uniform' 
+        layout is used.""")
+
+    ensemble_size = basic.Integer(
+        label = "Ensemble size",
+        default = 1,
+        order = -1, #Hidden, used by parameter sweeps.
+        doc = """The number of simulations advanced together, sharing the
+        connectivity, delays, integrator and monitors. When greater than one,
+        the history, state and monitored data gain a trailing axis of this 
+        length, and any parameter of the Model, Coupling or noise given with 
+        shape (1, ensemble_size) takes one value per simulation, a shape that 
+        can't be mistaken for one value per node or state variable. Only region 
+        simulations with a Model whose dfun acts element-wise over nodes and 
+        modes, and the Raw, SubSample, TemporalAverage and Bold monitors, 
+        support ensembles.""")
+
+    local_coupling_precision = basic.Enumerate(
+        label = "Local coupling precision",
+        options = ["float64", "float32"],
+        default = ["float64"],
+        select_multiple = False,
+        order = -1, #Hidden, a performance option rather than a scientific one.
+        doc = """The precision the local coupling of a surface simulation is
+        stored and computed in, 'float32' halving its memory traffic at the 
+        cost of precision.""")
+
+    local_coupling_threads = basic.Integer(
+        label = "Local coupling threads",
+        default = 0,
+        order = -1, #Hidden, a performance option rather than a scientific one.
+        doc = """The number of threads the local coupling of a surface 
+        simulation is computed by, each applying blocks of rows of the local
+        connectivity, 0 for one thread for each CPU.""")
+
 
     def __init__(self, **kwargs): 
         """
@@ -229,11 +329,22 @@ class Simulator(core.Type):
 
         self.calls = 0
         self.current_step = 0
+        self.stimulus_start = None
+        self.monitor_reductions = {}
 
         self.number_of_nodes = None
         self.horizon = None
         self.good_history_shape = None
         self.history = None
+        self.current_state = None
+        self.initial_history_mean = None
+        self.coupling_edges = None
+        self.coupling_lags = None
+        self.coupling_delay = None
+        self.history_packing = None
+        self.local_coupling_operator = None
+        self.ensemble_shape = ()
+        self._configured_history = None
         self._memory_requirement_guess = None
         self._memory_requirement_census = None
         self._storage_requirement = None
@@ -290,19 +401,13 @@ class Simulator(core.Type):
             #    msg = "%s: Surface needs region mapping defined... "
             #    LOG.error(msg % (repr(self)))
 
-        #Make sure spatialised model parameters have the right shape (number_of_nodes, 1)
-        excluded_checks = ("state_variable_range", "variables_of_interest", "noise", "psi_table", "nerf_table")
-        params = self.model.trait.keys()
-        for param in excluded_checks:
-            if param in params:
-                params.remove(param)
-        for param in params:
-            #If it's a surface sim and model parameters were provided at the region level
-            if self.surface is not None:#TODO: Once traits are working properly again, the evals and execs here shouldn't be necessary...
-                if eval("self.model." + param + ".size") == self.connectivity.number_of_regions:
-                    exec("self.model." + param + " = self.model." + param + "[self.surface.region_mapping].reshape((-1, 1))")
-            if eval("self.model." + param + ".size") == self.number_of_nodes:
-                exec("self.model." + param + " = self.model." + param + ".reshape((-1, 1))")
+        #An ensemble of simulations is advanced along a trailing axis.
+        self.ensemble_shape = (self.ensemble_size,) if self.ensemble_size > 1 else ()
+        if self.ensemble_shape and self.surface is not None:
+            msg = "%s: ensembles of surface simulations are not supported."
+            LOG.error(msg % str(self))
+            raise NotImplementedError(msg % str(self))
+        self.configure_model_parameters()
 
         # Estimate of memory usage
         self._guesstimate_memory_requirement()
@@ -313,20 +418,35 @@ class Simulator(core.Type):
         #Set delays, provided in physical units, in integration steps.
         self.connectivity.set_idelays(self.integrator.dt)
 
-        self.horizon = numpy.max(self.connectivity.idelays) + 1
+        #When all connections share a delay, as with no delays (eg, an infinite
+        #conduction speed), the coupling takes a fast path needing only that
+        #much history, otherwise the history spans the longest delay.
+        self.coupling_delay = self._uniform_coupling_delay()
+        if self.coupling_delay is not None:
+            self.horizon = self.coupling_delay + 1
+        else:
+            self.horizon = numpy.max(self.connectivity.idelays) + 1
         LOG.info("horizon is %d steps" % self.horizon)
 
-        # workspace -- minimal state of network with delays
+        # workspace -- minimal state of network with delays, of which only
+        # the coupling variables are kept as history.
         self.good_history_shape = (self.horizon, self.model.nvar,
                                    self.number_of_nodes,
-                                   self.model.number_of_modes)
+                                   self.model.number_of_modes) + self.ensemble_shape
         msg = "%s: History shape will be: %s"
-        LOG.debug(msg % (repr(self), str(self.good_history_shape)))
+        LOG.debug(msg % (repr(self), str((self.horizon, len(self.model.cvar)) +
+                                         self.good_history_shape[2:])))
 
         #Reshape integrator.noise.nsig, if neccessary.
         if isinstance(self.integrator, integrators_module.IntegratorStochastic):
             self.configure_integrator_noise()
 
+        #Precompute what's needed by the selected coupling engine, which
+        #determines the layout of the history.
+        self.configure_coupling()
+
+        self.configure_local_coupling()
+
         self.configure_history(self.initial_conditions)
 
         #Configure Monitors to work with selected Model, etc...
@@ -335,6 +455,106 @@ class Simulator(core.Type):
         #Estimate of memory usage. 
         self._census_memory_requirement()
 
+        #The step and history reconfigure() returns to.
+        self._configured_history = (self.current_step, self.current_state.copy(),
+                                    self.history.copy())
+        self.stimulus_start = None
+
+
+    def reconfigure(self, *changed):
+        """
+        Update the configuration after a change to the attributes given, by
+        their paths relative to the Simulator (eg, "coupling.a", 
+        "model.tau"), redoing only what depends on them, according to 
+        RECONFIGURE_DEPENDENCIES, rather than all of configure(). A change to
+        the parameters of the Coupling, for example, requires nothing beyond 
+        returning to the initial history, while one to the connectivity, or to
+        an attribute without a known dependency, requires a full configure().
+
+        Either way, the Simulator is returned to the step and history it had 
+        when configured, with its monitors reset, ready for another run. 
+
+        """
+        stages = set()
+        for path in changed:
+            for pattern, invalidated in RECONFIGURE_DEPENDENCIES:
+                if fnmatch.fnmatchcase(path, pattern):
+                    stages.update(invalidated)
+                    break
+            else:
+                stages.add("all")
+
+        if "all" in stages or self._configured_history is None:
+            self.configure()
+        else:
+            msg = "%s: reconfiguring %s for changes to %s."
+            LOG.info(msg % (str(self), ", ".join(sorted(stages)) or "nothing", 
+                            ", ".join(changed)))
+            if "model" in stages:
+                self.model.configure()
+                self.configure_model_parameters()
+
+            if "stimulus" in stages:
+                self.stimulus.configure()
+                self.configure_stimuli()
+
+            if isinstance(self.integrator, integrators_module.IntegratorStochastic):
+                #As on configure(), the noise restarts from its seed.
+                self.integrator.noise.configure()
+                self.configure_integrator_noise()
+
+            if "coupling" in stages:
+                self.configure_coupling()
+
+            if "local_coupling" in stages:
+                self.configure_local_coupling()
+
+            if "history" in stages:
+                self.current_step = self._configured_history[0]
+                self.configure_history(self.initial_conditions)
+            else:
+                step, current_state, history = self._configured_history
+                self.current_step = step
+                self.current_state = current_state.copy()
+                self.history = history.copy()
+
+            if "monitors" in stages:
+                for monitor in self.monitors:
+                    monitor.configure()
+            self.configure_monitors()
+
+            self._configured_history = (self.current_step, self.current_state.copy(),
+                                        self.history.copy())
+        self.stimulus_start = None
+
+
+    def configure_model_parameters(self):
+        """
+        Make sure spatialised model parameters have the right shape, 
+        (number_of_nodes, 1), expanding region level parameters of a surface
+        simulation to its vertices, while parameters varying over an ensemble,
+        shape (1, ensemble_size), are left to broadcast along its trailing axis.
+
+        """
+        ensemble_axes = (1,) * len(self.ensemble_shape)
+
+        #Make sure spatialised model parameters have the right shape (number_of_nodes, 1)
+        excluded_checks = ("state_variable_range", "variables_of_interest", "noise", "psi_table", "nerf_table")
+        params = self.model.trait.keys()
+        for param in excluded_checks:
+            if param in params:
+                params.remove(param)
+        for param in params:
+            #Parameters varying over an ensemble broadcast along its axis.
+            if self.ensemble_shape and eval("self.model." + param + ".shape") == (1,) + self.ensemble_shape:
+                continue
+            #If it's a surface sim and model parameters were provided at the region level
+            if self.surface is not None:#TODO: Once traits are working properly again, the evals and execs here shouldn't be necessary...
+                if eval("self.model." + param + ".size") == self.connectivity.number_of_regions:
+                    exec("self.model." + param + " = self.model." + param + "[self.surface.region_mapping].reshape((-1, 1))")
+            if eval("self.model." + param + ".size") == self.number_of_nodes:
+                exec("self.model." + param + " = self.model." + param + ".reshape((-1, 1) + ensemble_axes)")
+
 
     def __call__(self, simulation_length=None, random_state=None):
         """
@@ -364,7 +584,7 @@ class Simulator(core.Type):
         self._calculate_storage_requirement()
 
         if random_state is not None:
-            if self.integrator is integrators_module.IntegratorStochastic:
+            if isinstance(self.integrator, integrators_module.IntegratorStochastic):
                 self.integrator.noise.random_stream.set_state(random_state)
             else:
                 msg = "%s: random_state supplied for non-stochastic integration"
@@ -386,62 +606,116 @@ class Simulator(core.Type):
         ncvar = len(self.model.cvar)
         number_of_regions = self.connectivity.number_of_regions
         nsn = (number_of_regions, 1, number_of_regions)
+        ensemble_axes = (1,) * len(self.ensemble_shape)
         #import pdb; pdb.set_trace()
 
-        #Create cvar index array of shape ...
-        cvar = numpy.tile(numpy.ones(nsn, dtype=numpy.int32), (1, ncvar, 1))
-        for k in range(0, ncvar):
-            cvar[:, k, :] = self.model.cvar[k] * cvar[:, k, :]
-        LOG.debug("%s: cvar shape is: %s" % (str(self), str(cvar.shape)))
-        LOG.debug("%s: cvars are : %s" % (str(self), str(numpy.unique(cvar))))
-
-        #reshaped connectivity.idelays for ...
-        idelays = self.connectivity.idelays.reshape(nsn)
-        idelays = numpy.tile(idelays, (1, ncvar, 1))
-        #print idelays
-        LOG.debug("%s: idelays shape is: %s" % (str(self), str(idelays.shape)))
-
-        #reshaped connectivity.weights for ...
-        weights = self.connectivity.weights.reshape(nsn + (1,))
-        weights = numpy.tile(weights, (1, ncvar, 1, self.model.number_of_modes))
-        LOG.debug("%s: weights shape is: %s" % (str(self), str(weights.shape)))
-
-        #Create node index array of shape ...
-        node_ids = numpy.tile(numpy.arange(number_of_regions)[:, numpy.newaxis],
-                              (1, number_of_regions)).reshape(nsn)
-        node_ids = numpy.tile(node_ids, (1, ncvar, 1))
-        LOG.debug("%s: node_ids shape is: %s"%(str(self), str(node_ids.shape)))
+        edges = self.coupling_edges
+        lags = self.coupling_lags
+        uniform_delay = self.coupling_delay
+        if edges is None and uniform_delay is None:
+            #Create cvar index array of shape ...
+            cvar = numpy.tile(numpy.ones(nsn, dtype=numpy.int32), (1, ncvar, 1))
+            for k in range(0, ncvar):
+                cvar[:, k, :] = k * cvar[:, k, :]
+            LOG.debug("%s: cvar shape is: %s" % (str(self), str(cvar.shape)))
+            LOG.debug("%s: cvars are : %s" % (str(self), str(numpy.unique(cvar))))
+
+            #reshaped connectivity.idelays for ...
+            idelays = self.connectivity.idelays.reshape(nsn)
+            idelays = numpy.tile(idelays, (1, ncvar, 1))
+            #print idelays
+            LOG.debug("%s: idelays shape is: %s" % (str(self), str(idelays.shape)))
+
+            #reshaped connectivity.weights for ...
+            weights = self.connectivity.weights.reshape(nsn + (1,))
+            weights = numpy.tile(weights, (1, ncvar, 1, self.model.number_of_modes))
+            weights = weights.reshape(weights.shape + ensemble_axes)
+            LOG.debug("%s: weights shape is: %s" % (str(self), str(weights.shape)))
+
+            #Create node index array of shape ...
+            node_ids = numpy.tile(numpy.arange(number_of_regions)[:, numpy.newaxis],
+                                  (1, number_of_regions)).reshape(nsn)
+            node_ids = numpy.tile(node_ids, (1, ncvar, 1))
+            LOG.debug("%s: node_ids shape is: %s"%(str(self), str(node_ids.shape)))
+        elif edges is None:
+            #All connections share a delay, so rather than gathering, the 
+            #delayed state of each source is broadcast over targets, as are
+            #the weights over coupling variables and modes.
+            weights = self.connectivity.weights[:, numpy.newaxis, :, numpy.newaxis]
+            weights = weights.reshape(weights.shape + ensemble_axes)
+        else:
+            #Coupling variable indices, shape (1, ncvar), broadcast against the
+            #per connection delays, sources and targets, shape (edges, 1).
+            cvar = numpy.arange(ncvar, dtype=numpy.int32)[numpy.newaxis, :]
+            edge_idelays = edges.idelays[:, numpy.newaxis]
+            edge_source = edges.source[:, numpy.newaxis]
+            edge_target = edges.target[:, numpy.newaxis]
+            edge_weights = edges.weights
+            edge_shape = (edges.number_of_edges, -1)
+            region_shape = (number_of_regions, ncvar, self.model.number_of_modes) + self.ensemble_shape
+
+        packing = self.history_packing
+        if packing is not None:
+            #Each node's ring buffer starts at its offset, the slot of a step 
+            #being offset + step % depth, for regions, connections' sources 
+            #and connections' targets.
+            node_offsets, node_depths = packing.offsets, packing.depths
+            region_offsets, region_depths = packing.region_offsets, packing.region_depths
+            edge_offsets = region_offsets[edges.source]
+            edge_depths = region_depths[edges.source]
+            target_offsets = region_offsets[edges.target]
+            target_depths = region_depths[edges.target]
 
         #import pdb; pdb.set_trace()
         if self.surface is None:
             local_coupling = 0.0
         else:
-            region_average = self.surface.region_average
-            region_history = npdot(region_average, history) 
-            region_history = region_history.transpose((1, 2, 0, 3))
-            if self.surface.coupling_strength.size == 1:
-                local_coupling = (self.surface.coupling_strength[0] *
-                                  self.surface.local_connectivity.matrix)
-            elif self.surface.coupling_strength.size == self.surface.number_of_vertices:
-                ind = numpy.arange(self.number_of_nodes, dtype=int)
-                vec_cs = numpy.zeros((self.number_of_nodes,))
-                vec_cs[:self.surface.number_of_vertices] = self.surface.coupling_strength
-                sp_cs = sparse.csc_matrix((vec_cs, (ind, ind)),
-                                           shape=(self.number_of_nodes,
-                                                  self.number_of_nodes))
-                local_coupling = sp_cs * self.surface.local_connectivity.matrix
+            region_mapping = self.surface.region_mapping_operator
+            if packing is None:
+                region_history = region_mapping.average(history, axis=2)
+            else:
+                #The vertices of a region share its depth, so slot by slot the
+                #vertices' history averages into that of their regions.
+                region_history = numpy.empty((region_depths.sum(),) + history.shape[1:])
+                for slot in range(region_depths.max()):
+                    regions = region_depths > slot
+                    vertex_slots = node_offsets + numpy.minimum(slot, node_depths - 1)
+                    region_history[region_offsets[regions] + slot] = region_mapping.average(
+                        history[vertex_slots], axis=0)[regions]
+            local_coupling = self.local_coupling_operator
+
+        #The history the long-range coupling is computed from.
+        if self.surface is None:
+            coupled_history = history
+        else:
+            coupled_history = region_history
+
+        if lags is not None:
+            #The Coupling's sources() over the history, (horizon, regions, terms)
+            #or, per-node, each slot as a lone node, (slots, terms).
+            if packing is None:
+                source_history = self._coupling_sources(coupled_history)
+            else:
+                source_history = self._coupling_sources(coupled_history[:, :, numpy.newaxis])[:, 0]
+            sources_shape = (number_of_regions, source_history.shape[-1])
+            terms_shape = (number_of_regions, -1, ncvar, self.model.number_of_modes) + self.ensemble_shape
 
         if self.stimulus is None:
             stimulus = 0.0
-        else: #TODO: Consider changing to absolute time...
+        else:
+            #The stimulus' time starts with the first call, and carries on
+            #through continuations, including from a checkpoint.
+            if self.stimulus_start is None:
+                self.stimulus_start = self.current_step + 1
             time = numpy.arange(0, simulation_length, self.integrator.dt)
+            time = time + (self.current_step + 1 - self.stimulus_start) * self.integrator.dt
             time = time[numpy.newaxis, :]
             self.stimulus.configure_time(time)
-            stimulus = numpy.zeros((self.model.nvar, self.number_of_nodes, 1))
+            stimulus = numpy.zeros((self.model.nvar, self.number_of_nodes, 1) + ensemble_axes)
             LOG.debug("%s: stimulus shape is: %s" % (str(self), str(stimulus.shape)))
 
-        # initial state, history[timepoint[0], state_variables, nodes, modes]
-        state = history[self.current_step % horizon, :]
+        # initial state, [state_variables, nodes, modes]
+        state = self.current_state
         LOG.debug("%s: state shape is: %s" % (str(self), str(state.shape)))
         #print state[0, ]
         
@@ -451,7 +725,47 @@ class Simulator(core.Type):
         #    yield output
 
         for step in range(self.current_step+1, self.current_step+int_steps+1):
-            if self.surface is None:
+            if lags is not None:
+                #Weighted sums of the sources, first over the bucket of rare
+                #delays, then with a sparse matrix product per common delay.
+                source_sums = numpy.zeros(sources_shape)
+                if packing is None:
+                    if edges.number_of_edges:
+                        delayed_sources = source_history[(step-1-edges.idelays) % horizon, edges.source]
+                        source_sums += edge_weights * delayed_sources
+                    for lag, lag_weights in lags:
+                        source_sums += lag_weights * source_history[(step-1-lag) % horizon]
+                    current_state = coupled_history[(step-1) % horizon]
+                else:
+                    #Regions without connections at a lag have a shallower
+                    #buffer, but also no weights in its matrix.
+                    if edges.number_of_edges:
+                        delayed_sources = source_history[edge_offsets + (step-1-edges.idelays) % edge_depths]
+                        source_sums += edge_weights * delayed_sources
+                    for lag, lag_weights in lags:
+                        source_sums += lag_weights * source_history[region_offsets + (step-1-lag) % region_depths]
+                    current_state = coupled_history[region_offsets + (step-1) % region_depths]
+                    current_state = current_state.swapaxes(0, 1)
+                source_sums = numpy.rollaxis(source_sums.reshape(terms_shape), 0, 3)
+                region_coupling = coupling.combine(current_state, source_sums, edges.row_sums)
+            elif edges is not None:
+                #Gather only the connections, shape (edges, ncvar, modes)...
+                if packing is None:
+                    delayed_state = coupled_history[(step-1-edge_idelays) % horizon, cvar, edge_source, :]
+                    current_state = coupled_history[(step-1) % horizon, cvar, edge_target, :]
+                else:
+                    delayed_state = coupled_history[edge_offsets + (step-1-edges.idelays) % edge_depths]
+                    current_state = coupled_history[target_offsets + (step-1) % target_depths]
+                #...then weight and sum them into their targets in one product.
+                region_coupling = edge_weights * coupling.pre(current_state, delayed_state).reshape(edge_shape)
+                region_coupling = coupling.post(region_coupling.reshape(region_shape).swapaxes(0, 1))
+            elif uniform_delay is not None:
+                #(ncvar, regions, modes) -> (regions, ncvar, 1, modes)
+                delayed_state = coupled_history[(step-1-uniform_delay) % horizon]
+                delayed_state = delayed_state.swapaxes(0, 1)[:, :, numpy.newaxis]
+                current_state = coupled_history[(step-1) % horizon]
+                region_coupling = coupling(weights, current_state, delayed_state)
+            elif self.surface is None:
                 delayed_state = history[(step-1-idelays) % horizon, cvar, node_ids, :]
                 #coupling._set_pattern(npsum(delayed_state * weights, axis=0))
                 #node_coupling = coupling.pattern
@@ -461,19 +775,36 @@ class Simulator(core.Type):
                 #coupling._set_pattern(npsum(delayed_state * weights, axis=0))
                 #region_coupling = coupling.pattern
                 region_coupling = coupling(weights, state[self.model.cvar], delayed_state)
-                node_coupling = npdot(self.surface.vertex_mapping, region_coupling)
-                node_coupling = node_coupling.transpose((1, 0, 2))
+                node_coupling = region_mapping.expand(region_coupling, axis=1)
                 #import pdb; pdb.set_trace()
+            if edges is not None or uniform_delay is not None:
+                if self.surface is None:
+                    node_coupling = region_coupling
+                else:
+                    node_coupling = region_mapping.expand(region_coupling, axis=1)
             if self.stimulus is not None:
-                stimulus[self.model.cvar, :, :] = numpy.reshape(self.stimulus(step - (self.current_step+1)), (1, -1, 1))
+                stimulus[self.model.cvar, :, :] = numpy.reshape(self.stimulus(step - (self.current_step+1)), (1, -1, 1) + ensemble_axes)
                 #import pdb; pdb.set_trace()
 
             #import pdb; pdb.set_trace()
             state = scheme(state, dfun, node_coupling, local_coupling, stimulus)
-            history[step % horizon, :] = state
+            if packing is None:
+                history[step % horizon, :] = state[self.model.cvar]
 
-            if self.surface is not None:
-                region_history[step % horizon, :] = npdot(region_average, state).transpose((1, 0, 2))
+                if self.surface is not None:
+                    region_history[step % horizon, :] = region_mapping.average(state[self.model.cvar], axis=1)
+
+                if lags is not None:
+                    source_history[step % horizon] = self._coupling_sources(coupled_history[step % horizon])
+            else:
+                history[node_offsets + step % node_depths] = state[self.model.cvar].swapaxes(0, 1)
+
+                region_slots = region_offsets + step % region_depths
+                if self.surface is not None:
+                    region_history[region_slots] = region_mapping.average(state[self.model.cvar], axis=1).swapaxes(0, 1)
+
+                if lags is not None:
+                    source_history[region_slots] = self._coupling_sources(coupled_history[region_slots][:, :, numpy.newaxis])[:, 0]
 
             # monitor.things e.g. raw, average, eeg, meg, fmri...
             output = [monitor.record(step, state) for monitor in self.monitors]
@@ -483,8 +814,9 @@ class Simulator(core.Type):
             #TODO: Need to be able to pause and resume a running simulation.
 
         #import pdb; pdb.set_trace()
-        #Update to support continuation
-        self.current_step = self.current_step + int_steps - 1 #TODO: Don't think this -1 should be here, check...
+        #Update to support continuation, the next call picks up from state.
+        self.current_step = self.current_step + int_steps
+        self.current_state = state
         self.history = history#
 
 
@@ -500,9 +832,21 @@ class Simulator(core.Type):
         inital_conditions are shorter in time (dim=0) than the required history
         the model's initial() method is called to make up the difference.
 
+        As only the coupling variables are ever read back through the delays,
+        the ``history`` kept is a ring buffer of just those, with shape 
+        (horizon, len(model.cvar), nodes, modes), indexed by step modulo 
+        horizon. The full state at ``current_step`` is kept separately as 
+        ``current_state``, shape (nvar, nodes, modes). The mean over time of
+        the initial history of all the state variables, with which the Bold
+        monitors start their stocks, is kept as ``initial_history_mean``.
+
+        With the 'per-node' ``history_layout``, and a coupling engine able to
+        read it, the ring buffers of the nodes are instead packed one after the
+        other into a ``history`` of shape (slots, len(model.cvar), modes), see
+        configure_history_packing().
+
         """
 
-        history = self.history
         if initial_conditions is None:
             msg = "%s: Setting default history using model's initial() method."
             LOG.info(msg % str(self))
@@ -514,11 +858,14 @@ class Simulator(core.Type):
                 msg = "%s: bad initial_conditions[1:] shape %s, should be %s"
                 LOG.error(msg % (str(self), str(ic_shape[1:]), 
                                  str(self.good_history_shape[1:])))
+                return
             else:
                 if ic_shape[0] >= self.horizon:
                     msg = "%s: Using last %s time-steps for history."
                     LOG.info(msg % (str(self), self.horizon))
                     history = initial_conditions[-self.horizon:, :, :, :].copy()
+                    #Align with the ring buffer, last time-point at current_step
+                    history = numpy.roll(history, (self.current_step + ic_shape[0]) % self.horizon, axis=0)
                 else:
                     msg = "%s: initial_conditions shorter than required."
                     LOG.info(msg % str(self))
@@ -530,9 +877,218 @@ class Simulator(core.Type):
                     history[:ic_shape[0], :, :, :] = initial_conditions
                     history = numpy.roll(history, csmh, axis=0)
                 self.current_step += ic_shape[0] - 1
-            msg = "%s: history shape is: %s"
-            LOG.debug(msg % (str(self), str(history.shape)))
-        self.history = history
+        self.current_state = history[self.current_step % self.horizon].copy()
+        self.initial_history_mean = history.mean(axis=0)
+        self.configure_history_packing()
+        if self.history_packing is None:
+            self.history = history[:, self.model.cvar].copy()
+        else:
+            self.history = self._pack_history(history[:, self.model.cvar],
+                                              self.history_packing.depths,
+                                              self.history_packing.offsets)
+        msg = "%s: history shape is: %s"
+        LOG.debug(msg % (str(self), str(self.history.shape)))
+
+
+    def configure_history_packing(self):
+        """
+        For the 'per-node' ``history_layout``, work out how deep each node's 
+        ring buffer needs to be, one more than the longest delay, in 
+        integration steps, of the connections leaving its region, and where in
+        the packed history it starts. The result is kept in 
+        ``history_packing``, None for the 'uniform' layout.
+
+        """
+        self.history_packing = None
+        if self.history_layout[0] != "per-node":
+            return
+        if self.coupling_edges is None:
+            msg = "%s: the dense coupling engine needs a uniform history layout."
+            LOG.warning(msg % str(self))
+            return
+
+        #NOTE: idelays are indexed [source, target]
+        weights = self.connectivity.weights
+        idelays = numpy.where(weights != 0.0, self.connectivity.idelays, 0)
+        region_depths = idelays.max(axis=1) + 1
+        region_offsets = numpy.cumsum(region_depths) - region_depths
+        if self.surface is None:
+            depths, offsets = region_depths, region_offsets
+        else:
+            depths = region_depths[self.surface.region_mapping]
+            offsets = numpy.cumsum(depths) - depths
+
+        self.history_packing = Struct(depths=depths, offsets=offsets,
+                                      region_depths=region_depths,
+                                      region_offsets=region_offsets)
+        msg = "%s: per-node history of %d slots, rather than %d."
+        LOG.info(msg % (str(self), depths.sum(), self.horizon * depths.size))
+
+
+    def _pack_history(self, history, depths, offsets):
+        """
+        Pack a uniform history, shape (horizon, ncvar, nodes, modes), into the
+        per-node ring buffers given by depths and offsets, keeping the last
+        depth steps up to ``current_step`` of each node.
+
+        """
+        horizon = history.shape[0]
+        packed = numpy.empty((depths.sum(),) + history.shape[1:2] + history.shape[3:])
+        for lag in range(depths.max()):
+            step = self.current_step - lag
+            nodes = numpy.nonzero(depths > lag)[0]
+            packed[offsets[nodes] + step % depths[nodes]] = history[step % horizon][:, nodes].swapaxes(0, 1)
+        return packed
+
+
+    def configure_coupling(self):
+        """
+        Precompute the structures used by the selected ``coupling_engine``.
+
+        For the 'sparse' engine, the non-zero entries of the connectivity's
+        weights are turned into a list of connections ordered by target region
+        (ie, the compressed sparse row layout of weights.T), keeping for each
+        its source, target and delay in integration steps. At each step only 
+        the delayed state of these connections is gathered, the Coupling's 
+        pre() is evaluated on them and the result is weighted and summed into 
+        the target regions with a single sparse matrix product, before 
+        applying the Coupling's post().
+
+        For the 'lags' engine, the Coupling's factorised form is used: its 
+        sources() are evaluated once per node as the history is written, and
+        it is the weighted sums of these that are delayed. Each delay shared by
+        at least as many connections as there are regions gets its own sparse
+        weights matrix, W_d, so that its contribution is W_d times the sources
+        d steps back. The connections with rarer delays are merged into a 
+        single bucket, which is gathered as for the 'sparse' engine.
+
+        A Coupling which doesn't provide the form needed by the requested 
+        engine is evaluated with the 'dense' engine.
+
+        When all connections have the same delay, as when there are no delays,
+        this is noted in ``coupling_delay`` by configure(). The 'dense' engine 
+        then broadcasts the delayed state of each region rather than gathering
+        it for every pair of regions, and the 'lags' engine reduces to a single
+        sparse matrix product per step.
+
+        """
+        self.coupling_edges = None
+        self.coupling_lags = None
+
+        weights = self.connectivity.weights
+        coupling_type = type(self.coupling)
+        def provides(*methods):
+            base = coupling_module.Coupling
+            return all(getattr(coupling_type, name).im_func is not
+                       getattr(base, name).im_func for name in methods)
+
+        engine = self.coupling_engine[0]
+        if engine == "auto":
+            engine = "lags" if provides("sources", "combine") else "dense"
+        if engine == "dense":
+            return
+
+        if ((engine == "sparse" and not provides("pre", "post")) or
+            (engine == "lags" and not provides("sources", "combine"))):
+            msg = "%s: %s has no form suited to the %s engine, using dense coupling."
+            LOG.warning(msg % (str(self), coupling_type.__name__, engine))
+            return
+
+        number_of_regions = self.connectivity.number_of_regions
+        #NOTE: nonzero() of the transpose sorts connections by target and then
+        #      source, so the sum over each target's sources is done in the
+        #      same order as for the dense engine.
+        target, source = numpy.nonzero(weights.T)
+        idelays = self.connectivity.idelays[source, target]
+
+        if engine == "lags":
+            self.coupling_lags = []
+            counts = numpy.bincount(idelays)
+            bucket = numpy.ones(idelays.shape, dtype=bool)
+            common = counts >= number_of_regions
+            if self.coupling_delay is not None:
+                common = counts > 0 #No point in a bucket for a single delay.
+            for lag in numpy.nonzero(common)[0]:
+                at_lag = idelays == lag
+                bucket &= ~at_lag
+                lag_weights = sparse.csr_matrix((weights[source[at_lag], target[at_lag]],
+                                                 (target[at_lag], source[at_lag])),
+                                                shape=(number_of_regions, number_of_regions))
+                self.coupling_lags.append((lag, lag_weights))
+            target, source, idelays = target[bucket], source[bucket], idelays[bucket]
+            msg = "%s: %d of %d distinct delays have their own weights matrix."
+            LOG.info(msg % (str(self), len(self.coupling_lags), numpy.count_nonzero(counts)))
+
+        number_of_edges = target.shape[0]
+        reduction = sparse.csr_matrix((weights[source, target],
+                                       (target, numpy.arange(number_of_edges))),
+                                      shape=(number_of_regions, number_of_edges))
+
+        self.coupling_edges = Struct(number_of_edges=number_of_edges,
+                                     source=source.astype(numpy.int32),
+                                     target=target.astype(numpy.int32),
+                                     idelays=idelays,
+                                     weights=reduction,
+                                     row_sums=weights.sum(axis=0).reshape((1, -1, 1) + (1,) * len(self.ensemble_shape)))
+        msg = "%s: sparse coupling over %d of %d possible connections."
+        LOG.info(msg % (str(self), number_of_edges, number_of_regions**2))
+
+
+    def configure_local_coupling(self):
+        """
+        Build the operator applying the surface's local connectivity, scaled
+        by its coupling strength, in the Model's dfun, see 
+        local_coupling.LocalCouplingOperator, once for all runs.
+
+        The coupling strength scales the rows of the products, rather than the
+        matrix, so that the operator uses the local connectivity's arrays as 
+        they are.
+
+        """
+        self.local_coupling_operator = None
+        if self.surface is None:
+            return
+        if self.surface.coupling_strength.size == 1:
+            local_coupling_strength = self.surface.coupling_strength[0]
+        elif self.surface.coupling_strength.size == self.surface.number_of_vertices:
+            local_coupling_strength = numpy.zeros((self.number_of_nodes,))
+            local_coupling_strength[:self.surface.number_of_vertices] = self.surface.coupling_strength
+        self.local_coupling_operator = LocalCouplingOperator(self.surface.local_connectivity.matrix,
+                                                             scale=local_coupling_strength,
+                                                             dtype=self.local_coupling_precision[0],
+                                                             threads=self.local_coupling_threads)
+
+
+    def _uniform_coupling_delay(self):
+        """
+        The delay, in integration steps, shared by all connections with 
+        non-zero weight, or None if their delays differ.
+
+        """
+        connected_idelays = self.connectivity.idelays[self.connectivity.weights != 0.0]
+        if numpy.unique(connected_idelays).size > 1:
+            return None
+        delay = int(connected_idelays.max()) if connected_idelays.size else 0
+        msg = "%s: all connections have a delay of %d integration steps."
+        LOG.info(msg % (str(self), delay))
+        return delay
+
+
+    def _coupling_sources(self, state):
+        """
+        Evaluate the Coupling's sources() on the coupling variables, state, 
+        shape (..., ncvar, nodes, modes[, ensemble]), returning them laid out
+        by node as (..., nodes, terms * ncvar * modes[ * ensemble]) for the 
+        'lags' coupling engine.
+
+        """
+        terms = numpy.array(self.coupling.sources(state))
+        ndim = terms.ndim
+        node_axis = ndim - 2 - len(self.ensemble_shape)
+        #(terms, ..., ncvar, nodes, modes) -> (..., nodes, terms, ncvar, modes)
+        axes = (tuple(range(1, node_axis - 1)) + (node_axis, 0, node_axis - 1) +
+                tuple(range(node_axis + 1, ndim)))
+        return terms.transpose(axes).reshape(terms.shape[1:node_axis - 1] + (terms.shape[node_axis], -1))
 
     def configure_integrator_noise(self):
         """
@@ -548,6 +1104,9 @@ class Simulator(core.Type):
 
             3) (number_of_state_variables, number_of_nodes).
 
+        For an ensemble, nsig may also have shape (1, ensemble_size), one value
+        per simulation.
+
         """
 
         noise = self.integrator.noise
@@ -569,8 +1128,12 @@ class Simulator(core.Type):
                            self.model.number_of_modes)
         nsig = self.integrator.noise.nsig
         LOG.debug("Simulator.integrator.noise.nsig shape: %s" % str(nsig.shape))
-        if nsig.shape in (good_nsig_shape, (1,)):
-            return
+        if self.ensemble_shape and nsig.shape == (1,) + self.ensemble_shape:
+            nsig = nsig.reshape((1, 1, 1) + self.ensemble_shape)
+        elif nsig.ndim == 3 + len(self.ensemble_shape):
+            pass #Already configured, eg before a reconfigure().
+        elif nsig.shape in (good_nsig_shape, (1,)):
+            pass
         elif nsig.shape == (self.model.nvar, ):
             nsig = nsig.reshape((self.model.nvar, 1, 1))
         elif nsig.shape == (self.number_of_nodes, ):
@@ -580,6 +1143,8 @@ class Simulator(core.Type):
         else:
             msg = "Bad Simulator.integrator.noise.nsig shape: %s"
             LOG.error(msg % str(nsig.shape))
+        if self.ensemble_shape and nsig.ndim == 3:
+            nsig = nsig[..., numpy.newaxis]
 
         LOG.debug("Simulator.integrator.noise.nsig shape: %s" % str(nsig.shape))
         self.integrator.noise.nsig = nsig
@@ -590,6 +1155,9 @@ class Simulator(core.Type):
         if not isinstance(self.monitors, (list, tuple)):
             self.monitors = [self.monitors]
 
+        #Reductions of the state shared by monitors, see ProjectionMonitor.
+        self.monitor_reductions = {}
+
         # Configure monitors 
         for monitor in self.monitors:
             monitor.config_for_sim(self)
@@ -636,6 +1204,110 @@ class Simulator(core.Type):
 #            self.stimulus.configure_space(distance)
 
 
+    def save_checkpoint(self, path):
+        """
+        Save all that's needed to continue this simulation, from its 
+        ``current_step``, to the directory path, replacing any checkpoint
+        already there. This is the ``history`` and ``current_state``, the 
+        state of a stochastic integrator's noise (its random stream and, for 
+        coloured noise, ``_eta``), the stocks of the monitors and the step the
+        stimulus started on.
+
+        The arrays are each saved in NumPy's binary .npy format, alongside a
+        checkpoint.json holding the remaining scalars, and are written to a 
+        temporary directory first, so that an interrupted save doesn't spoil 
+        the previous checkpoint.
+
+        """
+        tmp_path = path.rstrip(os.sep) + ".tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+
+        def save(name, array):
+            numpy.save(os.path.join(tmp_path, name + ".npy"), array)
+
+        save("history", self.history)
+        save("current_state", self.current_state)
+        checkpoint = {"current_step": int(self.current_step),
+                      "calls": self.calls,
+                      "stimulus_start": self.stimulus_start,
+                      "monitors": []}
+
+        if isinstance(self.integrator, integrators_module.IntegratorStochastic):
+            noise = self.integrator.noise
+            kind, keys, pos, has_gauss, cached_gaussian = noise.random_stream.get_state()
+            save("random_stream", keys)
+            checkpoint["random_stream"] = [kind, int(pos), int(has_gauss), float(cached_gaussian)]
+            if noise._eta is not None:
+                save("noise_eta", noise._eta)
+
+        for k, monitor in enumerate(self.monitors):
+            stocks = []
+            for stock in ("_stock", "_interim_stock"):
+                if getattr(monitor, stock, None) is not None:
+                    save("monitor_%d%s" % (k, stock), getattr(monitor, stock))
+                    stocks.append(stock)
+            checkpoint["monitors"].append([monitor.__class__.__name__, stocks])
+
+        with open(os.path.join(tmp_path, "checkpoint.json"), "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file, indent=1)
+
+        old_path = path.rstrip(os.sep) + ".old"
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+        LOG.info("%s: checkpoint at step %d saved to %s" % (str(self), self.current_step, path))
+
+
+    def load_checkpoint(self, path):
+        """
+        Continue the simulation from a checkpoint made by save_checkpoint(). 
+        The Simulator must already be configured as it was when the checkpoint
+        was saved, the next call then picking up from the checkpoint's step.
+
+        The history and the monitors' stocks, which dominate the size of a 
+        checkpoint, are memory-mapped copy-on-write from their files, rather
+        than read into memory, so that only the parts the simulation goes on
+        to update take up memory of their own.
+
+        """
+        with open(os.path.join(path, "checkpoint.json")) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+
+        def load(name, mmap_mode=None):
+            return numpy.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode)
+
+        history = load("history", mmap_mode="c")
+        monitors = [monitor.__class__.__name__ for monitor in self.monitors]
+        if (history.shape != self.history.shape or 
+            monitors != [name for name, stocks in checkpoint["monitors"]]):
+            msg = "%s: checkpoint in %s doesn't match this simulator's configuration."
+            LOG.error(msg % (str(self), path))
+            raise ValueError(msg % (str(self), path))
+
+        self.history = history
+        self.current_state = load("current_state")
+        self.current_step = checkpoint["current_step"]
+        self.calls = checkpoint["calls"]
+        self.stimulus_start = checkpoint["stimulus_start"]
+
+        if "random_stream" in checkpoint:
+            noise = self.integrator.noise
+            kind, pos, has_gauss, cached_gaussian = checkpoint["random_stream"]
+            noise.random_stream.set_state((str(kind), load("random_stream"), pos,
+                                           has_gauss, cached_gaussian))
+            if os.path.exists(os.path.join(path, "noise_eta.npy")):
+                noise._eta = load("noise_eta")
+
+        for k, (monitor, (name, stocks)) in enumerate(zip(self.monitors, checkpoint["monitors"])):
+            for stock in stocks:
+                setattr(monitor, stock, load("monitor_%d%s" % (k, stock), mmap_mode="c"))
+        LOG.info("%s: continuing from checkpoint at step %d" % (str(self), self.current_step))
+
+
     def memory_requirement(self):
         """
         Return an estimated of the memory requirements (Bytes) for this
@@ -694,13 +1366,15 @@ class Simulator(core.Type):
         #      partially resolves calling of this method with a non-configured
         #     connectivity, there remains the less common issue if no tract_lengths...
         hist_shape = (self.connectivity.tract_lengths.max() / (self.conduction_speed or self.connectivity.speed or 3.0) / self.integrator.dt, #self.connectivity.delays.max() 
-                      self.model.nvar, number_of_nodes, 
+                      len(self.model.cvar), number_of_nodes, 
                       self.model.number_of_modes)
         memreq = numpy.prod(hist_shape) * bits_64
+        memreq += self.model.nvar * number_of_nodes * self.model.number_of_modes * bits_64 #current_state
+        memreq *= self.ensemble_size
         if self.surface:
             memreq += self.surface.number_of_triangles * 3 * bits_32 * 2 # normals
             memreq += self.surface.number_of_vertices * 3 * bits_64 * 2 # normals
-            memreq += number_of_nodes * number_of_regions * bits_64 * 4 #vertex_mapping, region_average, region_sum
+            memreq += (number_of_nodes + number_of_regions) * bits_64 #region_mapping_operator
             #???memreq += self.surface.local_connectivity.matrix.nnz * 8
 
         if not isinstance(self.monitors, (list, tuple)):
@@ -709,10 +1383,16 @@ class Simulator(core.Type):
             monitors = self.monitors
         for monitor in monitors:
             if not isinstance(monitor, monitors_module.Bold):
-                stock_shape = (monitor.period / self.integrator.dt, 
-                               self.model.variables_of_interest.shape[0], 
-                               number_of_nodes,
-                               self.model.number_of_modes)
+                if isinstance(monitor, monitors_module.ProjectionMonitor):
+                    stock_shape = (number_of_nodes,)
+                elif isinstance(monitor, monitors_module.AveragingMonitor):
+                    stock_shape = (self.model.variables_of_interest.shape[0], 
+                                   number_of_nodes,
+                                   self.model.number_of_modes)
+                elif isinstance(monitor, monitors_module.BalloonWindkesselAccordingToKJFristonEtAl2003NeuroImage):
+                    stock_shape = (5, number_of_nodes) #state and interim sum
+                else:
+                    stock_shape = (0,)
                 memreq += numpy.prod(stock_shape) * bits_64
                 if hasattr(monitor, "sensors"):
                     try:
@@ -722,14 +1402,12 @@ class Simulator(core.Type):
                         memreq += number_of_nodes * 62.0 * bits_64
 
             else:
-                stock_shape = (19200.0 * monitor.tau_s * 2.0**-2, 
-                               self.model.variables_of_interest.shape[0],
-                               number_of_nodes,
-                               self.model.number_of_modes)
-                interim_stock_shape = (1.0 / (2.0**-2 * self.integrator.dt), 
-                                       self.model.variables_of_interest.shape[0],
-                                       number_of_nodes,
-                                       self.model.number_of_modes)
+                if monitor.convolution[0] == "recursive":
+                    stock_shape = (4, number_of_nodes)
+                else:
+                    stock_shape = (19200.0 * monitor.tau_s * 2.0**-2, 
+                                   number_of_nodes)
+                interim_stock_shape = (number_of_nodes,)
                 memreq += numpy.prod(stock_shape) * bits_64
                 memreq +=  numpy.prod(interim_stock_shape) * bits_64
 
@@ -758,12 +1436,12 @@ class Simulator(core.Type):
         """
         magic_number = 2.42 # Current guesstimate is low by about a factor of 2, seems safer to over estimate...
         #magic_number = 8.0 # Bytes
-        memreq = self.history.nbytes
+        memreq = self.history.nbytes + self.current_state.nbytes
         #LOG.info("Memory required by this simulatin will be approximately %s Bytes" % (memreq))
         try:
             memreq += self.surface.triangles.nbytes * 2 # normals
             memreq += self.surface.vertices.nbytes * 2 # normals
-            memreq += self.surface.vertex_mapping.nbytes * 4 #vertex_mapping, region_average, region_sum
+            memreq += self.surface.region_mapping_operator.mapping.nbytes #region_mapping_operator
             memreq += self.surface.eeg_projection.nbytes
             memreq += self.surface.local_connectivity.matrix.nnz * 8
         except AttributeError:
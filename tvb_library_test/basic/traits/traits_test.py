@@ -38,6 +38,7 @@ from tvb.basic.traits.types_basic import MapAsJson
 from tvb.basic.traits.types_mapped import MappedType
 from tvb.basic.traits import types_basic as basic
 from tvb.simulator.models import WilsonCowan, ReducedSetHindmarshRose
+from tvb.simulator.simulator import Simulator
 from tvb_library_test.base_testcase import BaseTestCase
 
 
@@ -90,6 +91,22 @@ class TraitsTest(BaseTestCase):
         model2.number_of_modes = 15
         self.assertNotEqual(model1.number_of_modes, model2.number_of_modes)
         self.assertNotEqual(model1.a[0], model2.a[0])
+        
+        
+    def test_modifying_single_select(self):
+        """
+        An option selected on an instance doesn't become the default of the
+        instances created after it.
+        """
+        sim1 = Simulator(coupling_engine=["sparse"])
+        sim2 = Simulator()
+        sim2.history_layout = ["per-node"]
+        sim3 = Simulator()
+        self.assertEqual("sparse", sim1.coupling_engine[0])
+        self.assertEqual("auto", sim2.coupling_engine[0])
+        self.assertEqual("per-node", sim2.history_layout[0])
+        self.assertEqual("auto", sim3.coupling_engine[0])
+        self.assertEqual("uniform", sim3.history_layout[0])
       
       
     def test_array_populated(self):
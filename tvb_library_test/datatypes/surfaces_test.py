@@ -29,16 +29,34 @@ if __name__ == "__main__":
     
 import os
 import sys
+import shutil
+import tempfile
 try:
     import unittest2 as unittest
 except Exception, _:
     import unittest
+import mock
 
+from tvb.basic.config.settings import TVBSettings as cfg
 from tvb.datatypes import surfaces
+from tvb.datatypes import surfaces_scientific
 from tvb_library_test.base_testcase import BaseTestCase
         
 class SurfacesTest(BaseTestCase):
     
+    def setUp(self):
+        super(SurfacesTest, self).setUp()
+        #Keep what the tests compute out of the user's own cache.
+        self.cache_folder = tempfile.mkdtemp(prefix="tvb-cache-test-")
+        self.cache_patch = mock.patch.object(cfg, "TVB_CACHE_FOLDER", self.cache_folder)
+        self.cache_patch.start()
+    
+    
+    def tearDown(self):
+        self.cache_patch.stop()
+        shutil.rmtree(self.cache_folder, ignore_errors=True)
+    
+    
     def test_surface(self):
         dt = surfaces.Surface()
         dt.configure()
@@ -138,6 +156,34 @@ class SurfacesTest(BaseTestCase):
         self.assertEqual(dt.get_data_shape('triangles'), (32760, 3))
         
         
+    @unittest.skipIf(sys.maxsize <= 2147483647, "Cannot compute local connectivity on 32-bit machine.")    
+    def test_cortex_geodesic_distance(self):
+        """
+        The geodesic distances are set whether or not the local connectivity
+        is read from the cache.
+        """
+        loaded = []
+        load = surfaces_scientific.load_cached_matrix
+        def load_cached_matrix(name):
+            matrix = load(name)
+            loaded.append(matrix is not None)
+            return matrix
+        
+        first, second = surfaces.Cortex(), surfaces.Cortex()
+        with mock.patch.object(surfaces_scientific, "load_cached_matrix", side_effect=load_cached_matrix):
+            first.configure()
+            self.assertEqual(loaded, [False, False])
+            del loaded[:]
+            with mock.patch.object(surfaces_scientific, "blocked_geodesic_distance_matrix") as compute:
+                second.configure()
+            self.assertFalse(compute.called)
+            self.assertEqual(loaded, [True, True])
+        for dt in (first, second):
+            self.assertEqual(dt.geodesic_distance_matrix.shape, (16384, 16384))
+        self.assertEqual(first.geodesic_distance_matrix.nnz, second.geodesic_distance_matrix.nnz)
+        self.assertEqual(abs(first.local_connectivity.matrix - second.local_connectivity.matrix).max(), 0.0)
+        
+        
 def suite():
     """
     Gather all the tests in a test suite.
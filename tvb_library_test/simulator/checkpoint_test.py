@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Tests of the continuation of simulations from checkpoints.
+
+"""
+if __name__ == "__main__":
+    from tvb_library_test import setup_test_console_env
+    setup_test_console_env()
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+
+from tvb.simulator import simulator, models, coupling, integrators, monitors, noise
+from tvb.datatypes import connectivity
+from tvb_library_test.base_testcase import BaseTestCase
+
+
+class CheckpointTest(BaseTestCase):
+
+    def setUp(self):
+        super(CheckpointTest, self).setUp()
+        self.path = tempfile.mkdtemp(prefix="tvb-checkpoint-test-")
+
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+    def _simulator(self, **kwds):
+        sim = simulator.Simulator(model=models.Generic2dOscillator(),
+                                  connectivity=connectivity.Connectivity(speed=numpy.array([4.0])),
+                                  coupling=coupling.Linear(a=numpy.array([0.0152])),
+                                  integrator=integrators.HeunStochastic(dt=2**-4,
+                                      noise=noise.Additive(nsig=numpy.array([2**-10]))),
+                                  monitors=(monitors.Raw(), monitors.TemporalAverage(period=1.0)),
+                                  **kwds)
+        sim.configure()
+        return sim
+
+
+    def _run(self, sim, simulation_length):
+        """The output of each monitor over a run, as arrays."""
+        outputs = [[] for _ in sim.monitors]
+        for output in sim(simulation_length=simulation_length):
+            for i_mon, out in enumerate(output):
+                if out is not None:
+                    outputs[i_mon].append(out[1])
+        return [numpy.array(out) for out in outputs]
+
+
+    def _round_trip(self, first_length, second_length, **kwds):
+        """
+        A run continued from a checkpoint by a Simulator configured like the
+        one that saved it must give the same output as the uninterrupted run.
+        """
+        reference = self._run(self._simulator(**kwds), first_length + second_length)
+
+        sim = self._simulator(**kwds)
+        first = self._run(sim, first_length)
+        sim.save_checkpoint(os.path.join(self.path, "checkpoint"))
+        sim = self._simulator(**kwds)
+        sim.load_checkpoint(os.path.join(self.path, "checkpoint"))
+        second = self._run(sim, second_length)
+
+        for whole, part_1, part_2 in zip(reference, first, second):
+            self.assertTrue(numpy.all(whole == numpy.concatenate((part_1, part_2))))
+
+
+    def test_round_trip(self):
+        self._round_trip(3.0, 5.0)
+
+
+    def test_round_trip_per_node_history(self):
+        self._round_trip(2.0, 2.0, history_layout=["per-node"])
+
+
+    def test_mismatched_configuration(self):
+        sim = self._simulator()
+        self._run(sim, 1.0)
+        sim.save_checkpoint(os.path.join(self.path, "checkpoint"))
+        sim = self._simulator(history_layout=["per-node"])
+        self.assertRaises(ValueError, sim.load_checkpoint, os.path.join(self.path, "checkpoint"))
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(CheckpointTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this module individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Tests of the factorised form of the Couplings, evaluated by the 'lags' engine
+of the Simulator, against their dense form.
+
+"""
+if __name__ == "__main__":
+    from tvb_library_test import setup_test_console_env
+    setup_test_console_env()
+
+import unittest
+import numpy
+
+from tvb.simulator import simulator, models, coupling, integrators, monitors
+from tvb.datatypes import connectivity
+from tvb_library_test.base_testcase import BaseTestCase
+
+
+class CouplingTest(BaseTestCase):
+
+    def _run(self, model, coupling_function, engine):
+        sim = simulator.Simulator(model=model,
+                                  connectivity=connectivity.Connectivity(speed=numpy.array([4.0])),
+                                  coupling=coupling_function,
+                                  coupling_engine=[engine],
+                                  integrator=integrators.HeunDeterministic(dt=2**-6),
+                                  monitors=monitors.Raw())
+        sim.configure()
+        return numpy.array([x for ((t, x),) in sim(simulation_length=2.0)])
+
+
+    def _compare(self, model_class, coupling_class, **parameters):
+        """
+        The 'lags' engine, evaluating the factorised form, against the dense
+        reference of the same Coupling.
+        """
+        dense = self._run(model_class(), coupling_class(**parameters), "dense")
+        lags = self._run(model_class(), coupling_class(**parameters), "lags")
+        self.assertEqual(dense.shape, lags.shape)
+        self.assertTrue(numpy.allclose(dense, lags, rtol=1e-12, atol=1e-12))
+
+
+    def test_factorised_form(self):
+        self.assertTrue(hasattr(coupling.Difference, "sources"))
+        sim = simulator.Simulator(model=models.Kuramoto(), connectivity=connectivity.Connectivity(),
+                                  coupling=coupling.Kuramoto(), monitors=monitors.Raw())
+        sim.configure()
+        self.assertTrue(sim.coupling_lags is not None)
+
+
+    def test_difference(self):
+        self._compare(models.Generic2dOscillator, coupling.Difference, a=numpy.array([0.1]))
+
+
+    def test_difference_multiple_cvar_modes(self):
+        self._compare(models.ReducedSetFitzHughNagumo, coupling.Difference, a=numpy.array([0.005]))
+
+
+    def test_kuramoto(self):
+        self._compare(models.Kuramoto, coupling.Kuramoto, a=numpy.array([1.0]))
+
+
+    def test_kuramoto_multiple_cvar_modes(self):
+        self._compare(models.ReducedSetFitzHughNagumo, coupling.Kuramoto, a=numpy.array([0.005]))
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(CouplingTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this module individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
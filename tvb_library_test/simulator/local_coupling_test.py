@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Tests of the local coupling operator of surface simulations.
+
+"""
+if __name__ == "__main__":
+    from tvb_library_test import setup_test_console_env
+    setup_test_console_env()
+
+import unittest
+import multiprocessing
+import numpy
+import scipy.sparse as sparse
+
+from tvb.simulator.local_coupling import LocalCouplingOperator
+from tvb_library_test.base_testcase import BaseTestCase
+
+
+MATRIX = sparse.random(500, 500, density=0.02, format="csr",
+                       random_state=numpy.random.RandomState(42))
+STATE = numpy.random.RandomState(42).normal(size=(500, 3))
+
+
+def _forked_product(operator):
+    return operator * STATE
+
+
+
+class LocalCouplingTest(BaseTestCase):
+
+    def test_product(self):
+        scale = numpy.linspace(0.0, 1.0, 500)
+        for threads in (1, 4):
+            operator = LocalCouplingOperator(MATRIX, scale=scale, threads=threads)
+            self.assertTrue(numpy.allclose(operator * STATE, (sparse.diags(scale) * MATRIX) * STATE,
+                                           rtol=1e-12, atol=1e-12))
+            operator = LocalCouplingOperator(MATRIX, scale=0.5, threads=threads)
+            self.assertTrue(numpy.allclose(operator * STATE[:, :1], 0.5 * MATRIX * STATE[:, :1],
+                                           rtol=1e-12, atol=1e-12))
+
+
+    def test_new_products(self):
+        operator = LocalCouplingOperator(MATRIX, threads=2)
+        products = [operator * STATE for _ in range(3)]
+        for product in products:
+            self.assertTrue(numpy.allclose(product, MATRIX * STATE, rtol=1e-12, atol=1e-12))
+
+
+    def test_buffers_in_use(self):
+        operator = LocalCouplingOperator(MATRIX, threads=2, buffers=2)
+        first, second = operator * STATE, operator * STATE
+        self.assertRaises(RuntimeError, operator.__mul__, STATE)
+        del first
+        third = operator * STATE
+        self.assertTrue(numpy.allclose(third, MATRIX * STATE, rtol=1e-12, atol=1e-12))
+
+
+    def test_forked_process(self):
+        """
+        A forked process, eg a worker of a parameter sweep, applies an
+        operator its parent has already applied with a pool of threads.
+        """
+        operator = LocalCouplingOperator(MATRIX, threads=4)
+        operator * STATE
+        pool = multiprocessing.Pool(1)
+        try:
+            product = pool.apply_async(_forked_product, (operator,)).get(timeout=60)
+        finally:
+            pool.terminate()
+        self.assertTrue(numpy.allclose(product, MATRIX * STATE, rtol=1e-12, atol=1e-12))
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(LocalCouplingTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this module individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Tests of the monitors against the straightforward computations they replace.
+
+"""
+if __name__ == "__main__":
+    from tvb_library_test import setup_test_console_env
+    setup_test_console_env()
+
+import unittest
+import numpy
+
+from tvb.simulator import simulator, models, coupling, integrators, monitors
+from tvb.datatypes import connectivity
+from tvb_library_test.base_testcase import BaseTestCase
+
+
+class RolledBold(monitors.Bold):
+    """
+    The Bold monitor as it was before its ring buffer was indexed, keeping
+    every variable of interest and mode in its stock and rolling the HRF to
+    the latest input.
+    """
+
+    def config_for_sim(self, simulator):
+        monitors.Monitor.config_for_sim(self, simulator)
+        self.compute_hrf()
+        interim_stock_size = (self._interim_istep, self.voi.shape[0],
+                              simulator.number_of_nodes,
+                              simulator.model.number_of_modes) + simulator.ensemble_shape
+        self._interim_stock = numpy.zeros(interim_stock_size)
+        initial_state = simulator.initial_history_mean[self.voi]
+        self._stock = initial_state[numpy.newaxis] * numpy.ones((self._stock_steps,) + interim_stock_size[1:])
+
+
+    def record(self, step, state):
+        self._interim_stock[((step % self._interim_istep) - 1), :] = state[self.voi, :]
+        if step % self._interim_istep == 0:
+            avg_interim_stock = numpy.mean(self._interim_stock, axis=0)
+            self._stock[((step/self._interim_istep % self._stock_steps) - 1), :] = avg_interim_stock
+        if step % self.istep == 0:
+            hrf = numpy.roll(self.hemodynamic_response_function,
+                             ((step/self._interim_istep % self._stock_steps) - 1),
+                             axis=1)
+            stock = numpy.rollaxis(self._stock, 0, self._stock.ndim - 1)
+            bold = (numpy.dot(hrf, stock) - 1.0) * (self.k1 * self.V0 / 3.0)
+            bold = bold.reshape(self._stock.shape[1:])
+            bold = bold.sum(axis=0)[numpy.newaxis]
+            bold = bold.sum(axis=2)[:, :, numpy.newaxis]
+            return [step * self.dt, bold]
+
+
+
+class MonitorsTest(BaseTestCase):
+
+    def _simulator(self, monitors, **kwds):
+        sim = simulator.Simulator(model=models.Generic2dOscillator(),
+                                  connectivity=connectivity.Connectivity(speed=numpy.array([4.0])),
+                                  coupling=coupling.Linear(a=numpy.array([0.0152])),
+                                  integrator=integrators.HeunDeterministic(dt=0.5),
+                                  monitors=monitors, **kwds)
+        return sim
+
+
+    def _run(self, sim, simulation_length):
+        """The output of each monitor over a run, as arrays."""
+        outputs = [[] for _ in sim.monitors]
+        for output in sim(simulation_length=simulation_length):
+            for i_mon, out in enumerate(output):
+                if out is not None:
+                    outputs[i_mon].append(out[1])
+        return [numpy.array(out) for out in outputs]
+
+
+    def _check_bold(self, sim, shape):
+        sim.configure()
+        rolled, direct, recursive = self._run(sim, 4000.0)
+        self.assertEqual(shape, rolled.shape)
+        self.assertEqual(shape, direct.shape)
+        self.assertEqual(shape, recursive.shape)
+        self.assertTrue(numpy.allclose(direct, rolled, rtol=1e-12, atol=1e-12 * abs(rolled).max()))
+        #The recursive filter's HRF isn't truncated.
+        self.assertTrue(abs(recursive - rolled).max() < 1e-3 * abs(rolled).max())
+
+
+    def test_bold(self):
+        """
+        The direct and recursive convolutions give the output of the HRF rolled
+        over a stock of every variable of interest and mode.
+        """
+        sim = self._simulator((RolledBold(period=500.0), monitors.Bold(period=500.0),
+                               monitors.Bold(period=500.0, convolution=["recursive"])))
+        self._check_bold(sim, (8, 1, 74, 1))
+
+
+    def test_bold_ensemble(self):
+        sim = self._simulator((RolledBold(period=500.0), monitors.Bold(period=500.0),
+                               monitors.Bold(period=500.0, convolution=["recursive"])),
+                              ensemble_size=3)
+        sim.model.I = numpy.array([[0.0, 0.5, 1.0]])
+        self._check_bold(sim, (8, 1, 74, 1, 3))
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(MonitorsTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this module individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
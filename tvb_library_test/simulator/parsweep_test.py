@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Tests of parameter sweeps run with the NumPy simulator.
+
+"""
+if __name__ == "__main__":
+    from tvb_library_test import setup_test_console_env
+    setup_test_console_env()
+
+import unittest
+import numpy
+
+from tvb.simulator import parsweep, models, coupling, integrators, monitors
+from tvb.datatypes import connectivity
+from tvb_library_test.base_testcase import BaseTestCase
+
+
+class ParSweepTest(BaseTestCase):
+
+    def _sweep(self, **kwds):
+        return parsweep.par_sweep(('model.I', True, [0.0, 0.5, 1.0]),
+                                  model=models.Generic2dOscillator(),
+                                  connectivity=connectivity.Connectivity(speed=numpy.array([4.0])),
+                                  coupling=coupling.Linear(),
+                                  integrator=integrators.HeunDeterministic(dt=2**-4),
+                                  monitors=monitors.TemporalAverage(period=1.0),
+                                  simulation_length=4.0, numpy_mode=True, **kwds)
+
+
+    def test_pool(self):
+        """
+        The processes of a pool run the sweep, sharing the connectivity with
+        them through files, without replacing the caller's arrays.
+        """
+        ps = self._sweep(processes=2)
+        weights = ps.sim.connectivity.weights
+        results = [result[0] for result in ps]
+        self.assertEqual(3, len(results))
+        self.assertEqual((4, 1, 74, 1), results[0].shape)
+        self.assertTrue(ps.sim.connectivity.weights is weights)
+        self.assertTrue(ps.sim.connectivity.weights.flags.writeable)
+        self.assertTrue(ps.share_dir is None)
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(ParSweepTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this module individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2013, Baycrest Centre for Geriatric Care ("Baycrest")
+#
+# This program is free software; you can redistribute it and/or modify it under 
+# the terms of the GNU General Public License version 2 as published by the Free
+# Software Foundation. This program is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public
+# License for more details. You should have received a copy of the GNU General 
+# Public License along with this program; if not, you can download it here
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0
+#
+#
+"""
+Tests of the configuration of a Simulator and of the results of its runs.
+
+"""
+if __name__ == "__main__":
+    from tvb_library_test import setup_test_console_env
+    setup_test_console_env()
+
+import unittest
+import numpy
+
+from tvb.simulator import simulator, models, coupling, integrators, monitors
+from tvb.datatypes import connectivity
+from tvb_library_test.base_testcase import BaseTestCase
+
+
+class DenseLinear(coupling.Coupling):
+    """A linear Coupling with only the dense form."""
+
+    a = coupling.Linear.a
+
+    def __call__(self, g_ij, x_i, x_j):
+        return self.a * (g_ij * x_j).sum(axis=0)
+
+
+
+class SimulatorTest(BaseTestCase):
+
+    def _simulator(self, speed=4.0):
+        return simulator.Simulator(model=models.Generic2dOscillator(),
+                                   connectivity=connectivity.Connectivity(speed=numpy.array([speed])),
+                                   coupling=coupling.Linear(a=numpy.array([0.0152])),
+                                   integrator=integrators.HeunDeterministic(dt=2**-4),
+                                   monitors=monitors.Raw())
+
+
+    def test_default_history(self):
+        """
+        The default initial conditions depend on the length of the history, so
+        with delays differing between connections the results must be those
+        of a horizon spanning all delays, as computed before the fast paths.
+        """
+        sim = self._simulator()
+        sim.configure()
+        self.assertEqual(570, sim.horizon)
+        data = numpy.array([x for ((t, x),) in sim(simulation_length=8.0)])
+        self.assertEqual((128, 2, 74, 1), data.shape)
+        self.assertTrue(numpy.allclose(data.sum(), -59891.34604050989, rtol=1e-12, atol=0.0))
+        self.assertTrue(numpy.allclose(data[-1, 0, :4, 0], [1.9150056004586173, 2.233592087625572,
+                                                            0.8081843900612915, 3.0703859652112953],
+                                       rtol=1e-12, atol=0.0))
+        self.assertTrue(numpy.allclose(data[-1, 1, -3:, 0], [-16.61047786922252, -12.396354564297868,
+                                                             -16.82641549300335], rtol=1e-12, atol=0.0))
+
+
+    def test_bold_initial_stock(self):
+        """
+        Bold starts its stock from the mean of the initial history, which in a
+        run shorter than the haemodynamic response dominates its output.
+        """
+        sim = self._simulator()
+        sim.integrator = integrators.HeunDeterministic(dt=0.5)
+        sim.monitors = monitors.Bold(period=250.0)
+        sim.configure()
+        data = numpy.array([output[0][1] for output in sim(simulation_length=1000.0)
+                            if output[0] is not None])
+        self.assertEqual((4, 1, 74, 1), data.shape)
+        self.assertTrue(numpy.allclose(data.sum(), 3980.3131322908916, rtol=1e-12, atol=0.0))
+        self.assertTrue(numpy.allclose(data[:, 0, 0, 0], [20.143906014418544, 16.28185728226543,
+                                                          11.25727038104968, 5.920267043247673],
+                                       rtol=1e-12, atol=0.0))
+
+
+    def test_ensemble_parameters(self):
+        """
+        With as many simulations in the ensemble as there are nodes, parameters
+        per node and per simulation must each be told apart by their shapes.
+        """
+        number_of_nodes = 74
+        a = numpy.linspace(-2.5, -1.5, number_of_nodes)
+        I = numpy.linspace(0.0, 1.0, number_of_nodes)
+        initial_conditions = numpy.ones((1, 2, number_of_nodes, 1))
+
+        sim = self._simulator(speed=numpy.inf)
+        sim.model.a = a.copy()
+        sim.model.I = I.reshape((1, -1))
+        sim.ensemble_size = number_of_nodes
+        sim.initial_conditions = initial_conditions[..., numpy.newaxis] * numpy.ones(number_of_nodes)
+        sim.configure()
+        ensemble = numpy.array([x for ((t, x),) in sim(simulation_length=2.0)])
+        self.assertEqual((32, 2, number_of_nodes, 1, number_of_nodes), ensemble.shape)
+
+        for k in (0, number_of_nodes - 1):
+            sim = self._simulator(speed=numpy.inf)
+            sim.model.a = a.copy()
+            sim.model.I = I[k:k + 1]
+            sim.initial_conditions = initial_conditions
+            sim.configure()
+            data = numpy.array([x for ((t, x),) in sim(simulation_length=2.0)])
+            self.assertTrue(numpy.allclose(data, ensemble[..., k], rtol=1e-12, atol=1e-12))
+
+
+    def test_reconfigure(self):
+        """
+        A change to the Coupling's parameters is taken up without another
+        configure(), the run matching that of a Simulator configured with it.
+        """
+        sim = self._simulator()
+        sim.configure()
+        sim.coupling.a = numpy.array([0.0304])
+        configure = simulator.Simulator.configure
+        calls = []
+        simulator.Simulator.configure = lambda self: calls.append(self)
+        try:
+            sim.reconfigure("coupling.a")
+        finally:
+            simulator.Simulator.configure = configure
+        self.assertEqual(0, len(calls))
+        data = numpy.array([x for ((t, x),) in sim(simulation_length=2.0)])
+
+        sim = self._simulator()
+        sim.coupling.a = numpy.array([0.0304])
+        sim.configure()
+        self.assertTrue(numpy.all(data == numpy.array([x for ((t, x),) in sim(simulation_length=2.0)])))
+
+
+    def test_reconfigure_coupling(self):
+        """
+        Replacing the Coupling may change the coupling engine, and with it the
+        layout of the history.
+        """
+        sim = self._simulator()
+        sim.history_layout = ["per-node"]
+        sim.configure()
+        self.assertEqual(3, sim.history.ndim)
+        sim.coupling = DenseLinear(a=numpy.array([0.0152]))
+        sim.reconfigure("coupling")
+        self.assertTrue(sim.history_packing is None)
+        self.assertEqual((sim.horizon, 1, 74, 1), sim.history.shape)
+        data = numpy.array([x for ((t, x),) in sim(simulation_length=2.0)])
+        self.assertTrue(numpy.isfinite(data).all())
+
+
+    def test_zero_delay_history(self):
+        sim = self._simulator(speed=numpy.inf)
+        sim.configure()
+        self.assertEqual(0, sim.coupling_delay)
+        self.assertEqual(1, sim.horizon)
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(SimulatorTest))
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this module individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)